@@ -3,51 +3,54 @@ do2done Application Factory
 """
 from datetime import timedelta
 import os
-import logging
-from logging.handlers import RotatingFileHandler
-from flask import Flask, g, redirect, render_template, request, session, current_app, url_for
+from flask import Flask, g, redirect, render_template, request, current_app, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_babel import Babel, lazy_gettext, get_translations, refresh, gettext as _, ngettext
 from flask_wtf.csrf import CSRFProtect
+from app.cache import FragmentCache
+from app.assets import Assets
+from app.events import EventBroker
+from app.nplusone import NPlusOneDetector
+from app.idempotency import IdempotencyStore
+from app.sms_providers import SMSProviders
+from app.sessions import SessionStore
+from app.tracing import Tracer
+from app.health import HealthChecks
 
 # Initialize extensions
 db = SQLAlchemy()
 migrate = Migrate()
 csrf = CSRFProtect()
 login_manager = LoginManager()
+fragment_cache = FragmentCache()
+assets = Assets()
+events = EventBroker()
+n_plus_one = NPlusOneDetector()
+idempotency = IdempotencyStore()
+sms_providers = SMSProviders()
+session_store = SessionStore()
+tracer = Tracer()
+health = HealthChecks()
 login_manager.login_view = 'users.login'
 login_manager.login_message = _('Please log in to access this page.')
 
-# Twilio client (initialized in create_app)
-client = None
-TWILIO_PHONE_NUMBER = None
-
 
 def configure_logging(app):
     """Configure application logging"""
     if not app.debug and not app.testing:
-        # Create logs directory if it doesn't exist
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-
-        # File handler
-        file_handler = RotatingFileHandler(
-            app.config.get('LOG_FILE', 'logs/do2done.log'),
-            maxBytes=10240000,  # 10MB
-            backupCount=10
-        )
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-        ))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-
-        # Set app log level
-        log_level = app.config.get('LOG_LEVEL', 'INFO')
-        app.logger.setLevel(getattr(logging, log_level))
-        app.logger.info('do2done application startup')
+        from app.logs import configure_logging as configure_log_pipeline
+        configure_log_pipeline(app)
+
+
+def configure_jinja_cache(app):
+    """Configure a filesystem Jinja bytecode cache shared by all workers"""
+    cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if cache_dir:
+        from jinja2 import FileSystemBytecodeCache
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
 
 
 def create_app(config_name=None):
@@ -70,24 +73,20 @@ def create_app(config_name=None):
     # Configure logging
     configure_logging(app)
 
-    # Initialize extensions
+    # Initialize extensions (the tracer first, so request spans cover the other hooks)
+    tracer.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
     csrf.init_app(app)
     login_manager.init_app(app)
-
-    # Initialize Twilio client if enabled
-    global client, TWILIO_PHONE_NUMBER
-    if app.config.get('TWILIO_ENABLED'):
-        from twilio.rest import Client
-        client = Client(
-            app.config['TWILIO_ACCOUNT_SID'],
-            app.config['TWILIO_AUTH_TOKEN']
-        )
-        TWILIO_PHONE_NUMBER = app.config['TWILIO_PHONE_NUMBER']
-        app.logger.info('Twilio SMS service initialized')
-    else:
-        app.logger.warning('Twilio SMS service is disabled (missing credentials)')
+    fragment_cache.init_app(app)
+    assets.init_app(app)
+    events.init_app(app)
+    n_plus_one.init_app(app)
+    idempotency.init_app(app)
+    sms_providers.init_app(app)
+    session_store.init_app(app)
+    health.init_app(app)
 
     # Configure Babel for i18n
     def get_locale():
@@ -96,8 +95,6 @@ def create_app(config_name=None):
                 return request.args.get('lang')
             if request.cookies.get('lang'):
                 return request.cookies.get('lang')
-            if 'lang' in session:
-                return session['lang']
             return app.config.get('BABEL_DEFAULT_LOCALE', 'en')
         except RuntimeError:
             return app.config.get('BABEL_DEFAULT_LOCALE', 'en')
@@ -130,11 +127,15 @@ def create_app(config_name=None):
         app.jinja_env.add_extension('jinja2.ext.i18n')
         app.jinja_env.install_gettext_translations(translations)
 
+    configure_jinja_cache(app)
+
     # Register blueprints
     from app.routes.tasks import tasks_bp
     from app.routes.users import users_bp
+    from app.routes.admin import admin_bp
     app.register_blueprint(tasks_bp, url_prefix='/tasks')
     app.register_blueprint(users_bp)
+    app.register_blueprint(admin_bp)
 
     # Register error handlers
     from app.errors import register_error_handlers
@@ -158,13 +159,11 @@ def create_app(config_name=None):
     @app.route('/set-language/<lang>')
     def set_language(lang):
         if lang in app.config['LANGUAGES']:
-            session['lang'] = lang
-            session.permanent = True
-
-            # Clear caches
+            # The locale is kept in its own cookie only, not also in the session
+            # Clear cached translations. Compiled templates look up gettext
+            # from the environment globals at render time, so they stay valid.
             if hasattr(current_app, 'babel_translations'):
                 delattr(current_app, 'babel_translations')
-            current_app.jinja_env.cache.clear()
 
             # Force reload translations
             with app.app_context():
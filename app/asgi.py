@@ -0,0 +1,330 @@
+"""
+ASGI entry point.
+
+Run with an ASGI server, e.g.
+
+    uvicorn --factory app.asgi:create_asgi_app --workers 4
+
+The views registered in app.routes.async_views (signup, phone
+verification and the JSON calendar) run natively on the event loop, using
+an asyncio SQLAlchemy engine and the SMS providers' aiohttp sessions, so a
+worker waiting on the database or the SMS provider keeps serving other
+requests. Every other request runs the regular Flask app on a worker
+thread (ASGI_THREADS of them); create_app and WSGI deployments are
+unchanged.
+"""
+import asyncio
+import contextvars
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+from flask.signals import request_started
+from werkzeug.exceptions import HTTPException
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Async drivers for the synchronous database URI schemes we support
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_uri(uri: str) -> str:
+    """
+    Derive the asyncio engine URI from SQLALCHEMY_DATABASE_URI
+
+    Args:
+        uri: Synchronous database URI, e.g. postgresql://... or sqlite:///...
+
+    Returns:
+        The same database with its async driver, e.g. postgresql+asyncpg://...
+
+    Raises:
+        ValueError: If the database has no supported async driver
+    """
+    scheme, separator, rest = uri.partition('://')
+    dialect = scheme.split('+')[0]
+    if not separator or dialect not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver for database URI scheme {scheme!r}; set ASYNC_DATABASE_URI')
+    return f'{ASYNC_DRIVERS[dialect]}://{rest}'
+
+
+def build_environ(scope: dict, body: bytes) -> dict:
+    """Build a WSGI environ from an ASGI HTTP scope and its request body"""
+    script_name = scope.get('root_path', '').encode('utf-8').decode('latin-1')
+    path_info = scope['path'].encode('utf-8').decode('latin-1')
+    if script_name and path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'asgi.scope': scope,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = f"HTTP_{name.upper().replace('-', '_')}"
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def read_body(receive) -> bytes:
+    """Read the whole request body from an ASGI receive channel"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+class AsyncApp:
+    """
+    ASGI application wrapping a Flask app
+
+    Requests for an endpoint with a registered async view are dispatched on
+    the event loop inside a regular Flask request context, so sessions,
+    flash messages, CSRF checks and before/after request hooks behave as
+    they do under WSGI; the view is awaited on the loop, while those
+    (possibly blocking) steps run on the worker threads. Everything else is passed to the Flask WSGI app on
+    a worker thread, streaming its response back chunk by chunk.
+    """
+
+    def __init__(self, flask_app: Flask):
+        """
+        Wrap a Flask app created by create_app
+
+        Args:
+            flask_app: Flask application instance
+        """
+        from app.routes.async_views import async_views
+
+        self.flask_app = flask_app
+        self.views = async_views
+        self.executor = ThreadPoolExecutor(max_workers=flask_app.config.get('ASGI_THREADS', 32),
+                                           thread_name_prefix='wsgi')
+        self.engine = None
+        self.sessionmaker = None
+        flask_app.extensions['asgi'] = self
+
+    def start(self) -> None:
+        """
+        Create the asyncio engine
+
+        Uses ASYNC_DATABASE_URI, or SQLALCHEMY_DATABASE_URI with its async
+        driver, and the same SQLALCHEMY_ENGINE_OPTIONS as the sync engine.
+        """
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        config = self.flask_app.config
+        uri = config.get('ASYNC_DATABASE_URI') or async_database_uri(config['SQLALCHEMY_DATABASE_URI'])
+        self.engine = create_async_engine(uri, **config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        # Views use loaded objects after committing, without lazy (blocking) refreshes
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        logger.info(f'ASGI app started with {len(self.views)} async views')
+
+    async def close(self) -> None:
+        """Dispose of the engine pool, the SMS providers' async sessions and the worker threads"""
+        self.executor.shutdown(wait=False)
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+            self.sessionmaker = None
+        await self.flask_app.extensions['sms_providers'].close_async()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+        body = await read_body(receive)
+        view, view_args = self._match(scope)
+        if view is None or not await self._dispatch(view, view_args, scope, body, send):
+            await self._call_wsgi(scope, body, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _match(self, scope):
+        """Find the async view registered for a request's endpoint and method"""
+        root_path = scope.get('root_path', '')
+        path = scope['path']
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        adapter = self.flask_app.url_map.bind('localhost', script_name=root_path or None)
+        try:
+            endpoint, view_args = adapter.match(path, method=scope['method'])
+        except HTTPException:
+            # 404, 405 and redirects are answered by Flask
+            return None, None
+        view = self.views.get(endpoint)
+        if view is None or scope['method'] not in view.methods:
+            return None, None
+        return view, view_args
+
+    async def _dispatch(self, view, view_args, scope, body, send) -> bool:
+        """Run an async view; returns False if it declined the request"""
+        app = self.flask_app
+        if self.sessionmaker is None:
+            # The server didn't send lifespan events
+            self.start()
+
+        # Mirrors Flask.wsgi_app and full_dispatch_request, awaiting the view.
+        # Every other step can block (opening and saving a server-side
+        # session, before/after request hooks, teardown), so they run on the
+        # worker threads. All steps share one context, which holds the
+        # request context, so each sees what the previous one set up.
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+
+        def blocking(func, *args):
+            return loop.run_in_executor(self.executor, context.run, func, *args)
+
+        request_context = app.request_context(build_environ(scope, body))
+        await blocking(request_context.push)
+        error = None
+        try:
+            if view.handles is not None and not await blocking(view.handles):
+                response = None
+            else:
+                try:
+                    try:
+                        rv = await blocking(self._preprocess_request)
+                        if rv is None:
+                            rv = await asyncio.create_task(view.view(**view_args), context=context)
+                    except Exception as e:
+                        rv = await blocking(self._reraise_into, app.handle_user_exception, e)
+                    response = await blocking(app.finalize_request, rv)
+                except Exception as e:
+                    response = await blocking(self._reraise_into, app.handle_exception, e)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await blocking(request_context.pop, error)
+
+        if response is None:
+            # Not ours after all (e.g. an HTML request to a JSON view)
+            return False
+
+        await send(response_start(response.status, response.headers.items()))
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+        response.close()
+        return True
+
+    def _preprocess_request(self):
+        app = self.flask_app
+        request_started.send(app, _async_wrapper=app.ensure_sync)
+        return app.preprocess_request()
+
+    @staticmethod
+    def _reraise_into(handler, error: Exception):
+        """Call a Flask exception handler on a worker thread with `error` as the active exception"""
+        # Flask's handlers read sys.exc_info() and re-raise unhandled errors with a bare `raise`
+        try:
+            raise error
+        except Exception:
+            return handler(error)
+
+    async def _call_wsgi(self, scope, body, receive, send):
+        """Run the Flask app on a worker thread, sending its response as it is produced"""
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, body)
+        disconnected = asyncio.Event()
+        started = []
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [response_start(status, headers)]
+
+        def run():
+            iterable = self.flask_app(environ, start_response)
+            try:
+                sent_start = False
+                for chunk in iterable:
+                    # Stop long-lived streams (e.g. /tasks/stream) once the client has gone
+                    if disconnected.is_set():
+                        return
+                    if not sent_start:
+                        send_from_thread(started[0])
+                        sent_start = True
+                    if chunk:
+                        send_from_thread({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if not sent_start:
+                    send_from_thread(started[0])
+                send_from_thread({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await loop.run_in_executor(self.executor, run)
+        finally:
+            watcher.cancel()
+
+
+def response_start(status: str, headers) -> dict:
+    """Build the ASGI response start message for a WSGI status line and headers"""
+    return {
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+
+
+def create_asgi_app(config_name=None) -> AsyncApp:
+    """
+    ASGI application factory
+
+    Args:
+        config_name: Configuration name, as for create_app
+    """
+    from app import create_app
+    return AsyncApp(create_app(config_name))
@@ -0,0 +1,229 @@
+"""
+Static asset fingerprinting and HTTP compression for do2done application.
+
+Static URLs carry a content hash (css/style.css -> css/style.1a2b3c4d.css)
+so fingerprinted responses can be cached forever. Precompressed gzip/brotli
+variants written by `flask cli build-assets` are served when the client
+accepts them, and large dynamic responses are gzipped on the fly.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from typing import Dict, Optional
+from flask import current_app, request, send_from_directory
+import logging
+
+logger = logging.getLogger(__name__)
+
+# File extensions worth compressing (images are already compressed)
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.html', '.json', '.txt', '.map'}
+
+# Precompressed variant suffixes, in order of preference
+ENCODING_SUFFIXES = [('br', '.br'), ('gzip', '.gz')]
+
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def _file_hash(path: str, length: int = 8) -> str:
+    """Get a short content hash for a file"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def _hashed_name(filename: str, file_hash: str) -> str:
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{file_hash}{ext}'
+
+
+def _iter_static_files(static_folder: str):
+    """Yield static file paths relative to the static folder"""
+    for dirpath, _, filenames in os.walk(static_folder):
+        for name in filenames:
+            if name == MANIFEST_FILENAME or name.endswith(('.gz', '.br')):
+                continue
+            full_path = os.path.join(dirpath, name)
+            yield os.path.relpath(full_path, static_folder).replace(os.sep, '/')
+
+
+def _fresh_encodings(static_folder: str, filename: str) -> list:
+    """List precompressed variants on disk that are not older than the source"""
+    source = os.path.join(static_folder, filename)
+    source_mtime = os.path.getmtime(source)
+    encodings = []
+    for encoding, suffix in ENCODING_SUFFIXES:
+        variant = source + suffix
+        if os.path.exists(variant) and os.path.getmtime(variant) >= source_mtime:
+            encodings.append(encoding)
+    return encodings
+
+
+def build_manifest(static_folder: str) -> Dict[str, dict]:
+    """
+    Build an asset manifest by hashing every static file
+
+    Args:
+        static_folder: Path to the static folder
+
+    Returns:
+        Dict mapping filename to {'hashed': str, 'encodings': list}
+    """
+    manifest = {}
+    for filename in _iter_static_files(static_folder):
+        file_hash = _file_hash(os.path.join(static_folder, filename))
+        manifest[filename] = {
+            'hashed': _hashed_name(filename, file_hash),
+            'encodings': _fresh_encodings(static_folder, filename),
+        }
+    return manifest
+
+
+def build_assets(static_folder: str, level: int = 9) -> Dict[str, dict]:
+    """
+    Write precompressed variants and the manifest for deployment
+
+    Brotli variants are only written when the optional `brotli` package
+    is installed.
+
+    Args:
+        static_folder: Path to the static folder
+        level: gzip compression level
+
+    Returns:
+        The manifest that was written
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        logger.warning("brotli is not installed. Only gzip variants will be built.")
+
+    for filename in _iter_static_files(static_folder):
+        if os.path.splitext(filename)[1] not in COMPRESSIBLE_EXTENSIONS:
+            continue
+        source = os.path.join(static_folder, filename)
+        with open(source, 'rb') as f:
+            data = f.read()
+
+        with open(source + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=level, mtime=0))
+        if brotli is not None:
+            with open(source + '.br', 'wb') as f:
+                f.write(brotli.compress(data))
+
+    manifest = build_manifest(static_folder)
+    with open(os.path.join(static_folder, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def _accepts(encoding: str) -> bool:
+    """Check whether the client accepts a content encoding"""
+    return request.accept_encodings[encoding] > 0
+
+
+class Assets:
+    """Flask extension for fingerprinted, precompressed static assets"""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self._originals = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Load or build the manifest and hook static URLs and responses
+
+        Uses STATIC_MANIFEST_ENABLED, STATIC_CACHE_MAX_AGE,
+        COMPRESS_ENABLED, COMPRESS_MIN_SIZE and COMPRESS_LEVEL.
+        """
+        if app.config.get('STATIC_MANIFEST_ENABLED', True):
+            self.load_manifest(app.static_folder)
+            app.url_defaults(self._inject_hashed_filename)
+            app.view_functions['static'] = self._serve_static
+
+        if app.config.get('COMPRESS_ENABLED', True):
+            app.after_request(self._compress_response)
+
+        app.extensions['assets'] = self
+
+    def load_manifest(self, static_folder: str) -> None:
+        """Load manifest.json if it was built, otherwise hash files now"""
+        manifest_path = os.path.join(static_folder, MANIFEST_FILENAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = build_manifest(static_folder)
+        self._originals = {entry['hashed']: filename for filename, entry in self.manifest.items()}
+
+    def hashed_filename(self, filename: str) -> str:
+        """Get the fingerprinted name for a static file"""
+        entry = self.manifest.get(filename)
+        return entry['hashed'] if entry else filename
+
+    def _inject_hashed_filename(self, endpoint: str, values: dict) -> None:
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.hashed_filename(values['filename'])
+
+    def _pick_encoding(self, filename: str) -> Optional[str]:
+        entry = self.manifest.get(filename)
+        if not entry:
+            return None
+        for encoding in entry['encodings']:
+            if _accepts(encoding):
+                return encoding
+        return None
+
+    def _serve_static(self, filename):
+        """Serve a static file, preferring precompressed variants"""
+        original = self._originals.get(filename)
+        path = original or filename
+        static_folder = current_app.static_folder
+
+        encoding = self._pick_encoding(path)
+        if encoding:
+            suffix = dict(ENCODING_SUFFIXES)[encoding]
+            response = send_from_directory(
+                static_folder, path + suffix,
+                mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            )
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response = send_from_directory(static_folder, path)
+
+        if path in self.manifest:
+            response.vary.add('Accept-Encoding')
+
+        # Fingerprinted URLs never change content, so cache them forever
+        if original is not None:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config.get('STATIC_CACHE_MAX_AGE', 31536000)
+            response.cache_control.immutable = True
+        return response
+
+    def _compress_response(self, response):
+        """Gzip large text responses on the fly"""
+        config = current_app.config
+        if (response.status_code < 200 or response.status_code >= 300
+                or response.direct_passthrough
+                or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in config.get('COMPRESS_MIMETYPES', ())
+                or not _accepts('gzip')):
+            return response
+
+        data = response.get_data()
+        if len(data) < config.get('COMPRESS_MIN_SIZE', 1024):
+            return response
+
+        response.set_data(gzip.compress(data, compresslevel=config.get('COMPRESS_LEVEL', 6)))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,282 @@
+"""
+Rendered fragment cache for do2done application.
+
+Caches rendered HTML fragments (such as the task list) keyed by user,
+locale and a per-user version counter. Mutations bump the version, so
+stale fragments are never served and simply age out of the LRU.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NullFragmentBackend:
+    """Backend that never stores anything (caching disabled)"""
+
+    def get(self, key: str) -> Optional[str]:
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        pass
+
+    def get_version(self, namespace: str) -> Optional[int]:
+        return None
+
+    def set_version(self, namespace: str, version: int) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryFragmentBackend:
+    """
+    In-process LRU cache bounded by a byte budget
+
+    Fragments and version counters are private to the worker process, so a
+    version bumped by one worker is not seen by the others. Use it with a
+    single worker only (development, tests).
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, max_versions: int = 10000):
+        """
+        Initialize memory backend
+
+        Args:
+            max_bytes: Maximum total size of cached fragments in bytes
+            max_versions: Maximum number of version counters kept (least
+                recently used are dropped and reseeded from the clock)
+        """
+        self.max_bytes = max_bytes
+        self.max_versions = max_versions
+        self._entries = OrderedDict()
+        self._versions = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                return None
+            self._entries.move_to_end(key)
+            return data.decode('utf-8')
+
+    def set(self, key: str, value: str) -> None:
+        data = value.encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+
+            # Evict least recently used entries until within budget
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_version(self, namespace: str) -> Optional[int]:
+        with self._lock:
+            version = self._versions.get(namespace)
+            if version is not None:
+                self._versions.move_to_end(namespace)
+            return version
+
+    def set_version(self, namespace: str, version: int) -> None:
+        with self._lock:
+            self._versions[namespace] = version
+            self._versions.move_to_end(namespace)
+            while len(self._versions) > self.max_versions:
+                self._versions.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._size = 0
+
+
+class FilesystemFragmentBackend:
+    """
+    Filesystem LRU cache bounded by a byte budget.
+
+    Shared by every worker on the host. Recency is tracked through file
+    modification times, which are refreshed on every hit.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize filesystem backend
+
+        Args:
+            cache_dir: Directory to store fragments in
+            max_bytes: Maximum total size of cached fragments in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._fragments_dir = os.path.join(cache_dir, 'fragments')
+        self._versions_dir = os.path.join(cache_dir, 'versions')
+        os.makedirs(self._fragments_dir, exist_ok=True)
+        os.makedirs(self._versions_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = self._scan_size()
+
+    def _path(self, directory: str, key: str) -> str:
+        return os.path.join(directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def _scan_size(self) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(self._fragments_dir)
+                   if entry.is_file())
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(self._fragments_dir, key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data.decode('utf-8')
+
+    def set(self, key: str, value: str) -> None:
+        data = value.encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+
+        try:
+            self._write_atomic(self._path(self._fragments_dir, key), data)
+        except OSError as e:
+            logger.warning(f"Failed to write fragment cache entry: {e}")
+            return
+
+        with self._lock:
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._prune()
+
+    def _prune(self) -> None:
+        """Evict least recently used files until within budget"""
+        entries = []
+        for entry in os.scandir(self._fragments_dir):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self._size = total
+
+    def get_version(self, namespace: str) -> Optional[int]:
+        try:
+            with open(self._path(self._versions_dir, namespace), 'rb') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def set_version(self, namespace: str, version: int) -> None:
+        try:
+            self._write_atomic(self._path(self._versions_dir, namespace), str(version).encode())
+        except OSError as e:
+            logger.warning(f"Failed to write fragment cache version: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            for directory in (self._fragments_dir, self._versions_dir):
+                for entry in os.scandir(directory):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+            self._size = 0
+
+
+class FragmentCache:
+    """Flask extension wrapping a fragment cache backend"""
+
+    def __init__(self, app=None):
+        self.backend = NullFragmentBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the cache backend from app config
+
+        Uses FRAGMENT_CACHE_TYPE ('filesystem', 'memory' or 'null'),
+        FRAGMENT_CACHE_DIR and FRAGMENT_CACHE_MAX_BYTES.
+        """
+        cache_type = app.config.get('FRAGMENT_CACHE_TYPE', 'filesystem')
+        max_bytes = app.config.get('FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024)
+
+        if cache_type == 'filesystem':
+            self.backend = FilesystemFragmentBackend(
+                app.config.get('FRAGMENT_CACHE_DIR', os.path.join(app.instance_path, 'cache')),
+                max_bytes=max_bytes
+            )
+        elif cache_type == 'memory':
+            self.backend = MemoryFragmentBackend(max_bytes=max_bytes)
+        else:
+            self.backend = NullFragmentBackend()
+
+        app.extensions['fragment_cache'] = self
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached fragment, or None on a miss"""
+        return self.backend.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        """Store a rendered fragment"""
+        self.backend.set(key, value)
+
+    def clear(self) -> None:
+        """Drop every cached fragment and version counter"""
+        self.backend.clear()
+
+    def get_tasks_version(self, user_id: int) -> int:
+        """
+        Get the current tasks version for a user
+
+        Missing versions are seeded from the clock rather than zero, so a
+        restarted worker never matches fragments written before it lost
+        track of the counter.
+        """
+        namespace = f'tasks:{user_id}'
+        version = self.backend.get_version(namespace)
+        if version is None:
+            version = time.time_ns()
+            self.backend.set_version(namespace, version)
+        return version
+
+    def bump_tasks_version(self, user_id: int) -> None:
+        """Invalidate every cached task fragment for a user"""
+        namespace = f'tasks:{user_id}'
+        current = self.backend.get_version(namespace) or 0
+        self.backend.set_version(namespace, max(current + 1, time.time_ns()))
+
+    def task_list_key(self, user_id: int, locale: str) -> str:
+        """Build the cache key for a user's rendered task list"""
+        return f'task_list:{user_id}:{locale}:{self.get_tasks_version(user_id)}'
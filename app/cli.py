@@ -4,7 +4,8 @@ CLI commands for do2done application.
 import click
 from flask import current_app
 from flask.cli import with_appcontext
-from app import db
+from sqlalchemy import func, select
+from app import db, fragment_cache
 from app.models.users import User
 from app.models.tasks import Task
 
@@ -50,17 +51,16 @@ def reset_db():
 @with_appcontext
 @click.option('--first-name', prompt=True, help='First name')
 @click.option('--last-name', prompt=True, help='Last name')
-@click.option('--phone', prompt=True, help='Phone number (10 digits)')
+@click.option('--phone', prompt=True, help='Phone number (10 digits, or international with +)')
 @click.option('--password', prompt=True, hide_input=True, confirmation_prompt=True, help='Password')
 def create_user(first_name, last_name, phone, password):
     """Create a new user"""
-    # Format phone number
-    phone_digits = ''.join(filter(str.isdigit, phone))
-    if len(phone_digits) != 10:
-        click.echo('Error: Phone number must be 10 digits')
-        return
+    from app.phone import normalize_phone_number
 
-    formatted_phone = f"+1{phone_digits}"
+    formatted_phone = normalize_phone_number(phone)
+    if not formatted_phone:
+        click.echo('Error: Invalid phone number')
+        return
 
     # Check if user exists
     if User.query.filter_by(phone_number=formatted_phone).first():
@@ -81,29 +81,122 @@ def create_user(first_name, last_name, phone, password):
     click.echo(f'User created successfully! ID: {user.id}')
 
 
+# Verification status choices of the user directory commands
+USER_STATUSES = {'all': None, 'verified': True, 'unverified': False}
+
+
 @cli.command()
 @with_appcontext
-def list_users():
-    """List all users"""
-    users = User.query.all()
-    if not users:
+@click.option('--phone', help='Phone number prefix, country code first (e.g. +1555)')
+@click.option('--name', help='First or last name prefix')
+@click.option('--status', type=click.Choice(list(USER_STATUSES)), default='all', help='Verification status')
+@click.option('--after-id', default=0, help='Start after this user ID (the previous page\'s last)')
+@click.option('--limit', default=0, help='Users per page (default: all)')
+def list_users(phone, name, status, after_id, limit):
+    """List users with their task counts, streamed in ID order"""
+    from app.services.user_admin_service import UserAdminService
+    conditions = UserAdminService.filters(phone_prefix=phone, name_prefix=name, verified=USER_STATUSES[status])
+    listed = 0
+    last_id = None
+    for user in UserAdminService.iter_users(conditions, after_id=after_id, limit=limit or None):
+        status_label = 'Verified' if user.verified else 'Not Verified'
+        click.echo(f'ID: {user.id} | {user.first_name} {user.last_name} | {user.phone_number} | '
+                   f'{status_label} | Joined: {user.created_at:%Y-%m-%d} | Tasks: {user.task_count}')
+        listed += 1
+        last_id = user.id
+
+    if not listed:
         click.echo('No users found.')
+    elif limit and listed == limit:
+        click.echo(f'\nListed {listed} users. Next page: --after-id {last_id}')
+    else:
+        click.echo(f'\nListed {listed} users.')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--phone', help='Phone number prefix, country code first (e.g. +1555)')
+@click.option('--name', help='First or last name prefix')
+@click.option('--older-than-days', type=int, help='Only accounts created at least this many days ago')
+def count_users(phone, name, older_than_days):
+    """Count users by verification status"""
+    from app.services.user_admin_service import UserAdminService
+    counts = UserAdminService.count_by_status(UserAdminService.filters(
+        phone_prefix=phone, name_prefix=name, older_than_days=older_than_days
+    ))
+    click.echo(f"Verified: {counts['verified']}")
+    click.echo(f"Not verified: {counts['unverified']}")
+    click.echo(f"Total: {counts['verified'] + counts['unverified']}")
+
+
+@cli.command()
+@with_appcontext
+@click.option('--phone', help='Phone number prefix, country code first (e.g. +1555)')
+@click.option('--name', help='First or last name prefix')
+@click.option('--id', 'user_ids', multiple=True, type=int, help='User ID (repeatable)')
+@click.option('--all', 'all_users', is_flag=True, help='Verify every unverified user')
+@click.option('--batch-size', default=1000, help='Users updated per transaction')
+@click.option('--yes', is_flag=True, help='Don\'t ask for confirmation')
+def verify_users(phone, name, user_ids, all_users, batch_size, yes):
+    """Mark unverified users as verified"""
+    from app.services.user_admin_service import UserAdminService
+    if not (phone or name or user_ids or all_users):
+        raise click.UsageError('Select users with --phone, --name or --id, or pass --all')
+
+    conditions = UserAdminService.filters(phone_prefix=phone, name_prefix=name)
+    if user_ids:
+        conditions.append(User.id.in_(user_ids))
+    matching = UserAdminService.count_by_status(conditions)['unverified']
+    if not matching:
+        click.echo('No unverified users match.')
+        return
+    if not yes and not click.confirm(f'Verify {matching} users?'):
         return
 
-    click.echo(f'Total users: {len(users)}\n')
-    for user in users:
-        status = 'Verified' if user.verified else 'Not Verified'
-        click.echo(f'ID: {user.id} | {user.full_name} | {user.phone_number} | {status}')
+    total = UserAdminService.bulk_verify(
+        conditions, batch_size=batch_size,
+        progress=lambda count: click.echo(f'  Verified {count} users')
+    )
+    click.echo(f'Verified {total} users.')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--days', default=30, help='Delete accounts created at least this many days ago')
+@click.option('--batch-size', default=1000, help='Users deleted per transaction')
+@click.option('--dry-run', is_flag=True, help='Only count the accounts that would be deleted')
+@click.option('--yes', is_flag=True, help='Don\'t ask for confirmation')
+def delete_unverified_users(days, batch_size, dry_run, yes):
+    """Delete unverified accounts that were never used"""
+    from app.services.user_admin_service import UserAdminService
+    matching = db.session.scalar(
+        select(func.count(User.id)).where(*UserAdminService.stale_unverified_conditions(days))
+    )
+    click.echo(f'{matching} unverified accounts without tasks, archived tasks or recurring series were created more than {days} days ago.')
+    if not matching or dry_run:
+        return
+    if not yes and not click.confirm(f'Delete {matching} accounts?'):
+        return
+
+    total = UserAdminService.delete_unverified(
+        days, batch_size=batch_size,
+        progress=lambda count: click.echo(f'  Deleted {count} users')
+    )
+    click.echo(f'Deleted {total} users.')
 
 
 @cli.command()
 @with_appcontext
 def db_stats():
     """Show database statistics"""
+    from app.models.tasks import UserTaskCounters
     user_count = User.query.count()
-    task_count = Task.query.count()
-    completed_count = Task.query.filter_by(completed=True).count()
-    pending_count = task_count - completed_count
+    # Summed from the per-user counters; run reconcile-counters if they drift
+    task_count, completed_count, pending_count = db.session.query(
+        func.coalesce(func.sum(UserTaskCounters.total), 0),
+        func.coalesce(func.sum(UserTaskCounters.completed), 0),
+        func.coalesce(func.sum(UserTaskCounters.pending), 0)
+    ).one()
 
     click.echo('Database Statistics:')
     click.echo(f'  Users: {user_count}')
@@ -112,6 +205,534 @@ def db_stats():
     click.echo(f'    Pending: {pending_count}')
 
 
+@cli.command()
+@with_appcontext
+@click.option('--batch-size', default=1000, help='Users counted per query')
+@click.option('--fix/--no-fix', default=True, help='Overwrite drifted counters (default: fix)')
+def reconcile_counters(batch_size, fix):
+    """Recompute per-user task counters and report drift"""
+    from app.services.counter_service import CounterService
+    click.echo('Reconciling task counters...')
+    drift = CounterService.reconcile(
+        batch_size=batch_size, fix=fix,
+        progress=lambda count: click.echo(f'  Checked {count} users')
+    )
+    for entry in drift:
+        actual = entry['actual']
+        stored = 'missing' if actual is None else \
+            f"total={actual['total']} completed={actual['completed']} pending={actual['pending']}"
+        expected = entry['expected']
+        click.echo(f"  User {entry['user_id']}: {stored}, expected total={expected['total']} "
+                   f"completed={expected['completed']} pending={expected['pending']}")
+    action = 'Fixed' if fix else 'Found'
+    click.echo(f'{action} drift for {len(drift)} users.')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--days', default=30, help='Archive tasks completed at least this many days ago')
+@click.option('--batch-size', default=1000, help='Tasks moved per transaction')
+def archive_tasks(days, batch_size):
+    """Move old completed tasks into the archive table"""
+    from app.services.archive_service import ArchiveService
+    click.echo(f'Archiving tasks completed more than {days} days ago...')
+    total = ArchiveService.archive_completed_tasks(
+        days, batch_size=batch_size,
+        progress=lambda count: click.echo(f'  Archived {count} tasks')
+    )
+    click.echo(f'Archived {total} tasks.')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--batch-size', default=500, help='Series handled per transaction')
+def materialize_recurrences(batch_size):
+    """Create the next occurrence of recurring tasks whose current one is done"""
+    from app.services.recurrence_service import RecurrenceService
+    click.echo('Materializing recurring tasks...')
+    total = RecurrenceService.materialize_completed(
+        batch_size=batch_size,
+        progress=lambda count: click.echo(f'  Created {count} occurrences')
+    )
+    click.echo(f'Created {total} occurrences.')
+
+
+@cli.command()
+@with_appcontext
+def purge_idempotency_keys():
+    """Delete expired idempotency keys"""
+    from app import idempotency
+    click.echo(f'Purged {idempotency.purge()} expired idempotency keys.')
+
+
+@cli.command()
+@with_appcontext
+def purge_sessions():
+    """Delete expired server-side sessions"""
+    from app import session_store
+    click.echo(f'Purged {session_store.purge()} expired sessions.')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--user-id', required=True, type=int, help='Owner of the archived tasks')
+@click.option('--output', type=click.File('w'), default='-', help='Output file (default: stdout)')
+def export_archive(user_id, output):
+    """Export a user's archived tasks as JSON lines"""
+    import json
+    from app.services.archive_service import ArchiveService
+    for archived in ArchiveService.iter_archived_tasks(user_id):
+        output.write(json.dumps(archived.to_dict()) + '\n')
+
+
+@cli.command()
+@with_appcontext
+def list_partitions():
+    """List task table partitions (PostgreSQL only)"""
+    from app.services.partition_service import PartitionService
+    if not PartitionService.is_partitioned():
+        click.echo('The task table is not partitioned.')
+        return
+
+    for partition in PartitionService.list_partitions():
+        click.echo(f'{partition["name"]} | {partition["bounds"]} | ~{partition["estimated_rows"]} rows')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--months-ahead', default=3, help='Number of future months to cover')
+def create_partitions(months_ahead):
+    """Create upcoming monthly task partitions ahead of time"""
+    from app.services.partition_service import PartitionService
+    if not PartitionService.is_partitioned():
+        click.echo('The task table is not partitioned.')
+        return
+
+    created = PartitionService.create_partitions(months_ahead)
+    for name in created:
+        click.echo(f'  Created {name}')
+    click.echo(f'Created {len(created)} partitions.')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--older-than-months', default=12, help='Detach partitions older than this')
+@click.option('--drop', is_flag=True, help='Drop detached partitions instead of keeping them')
+def detach_partitions(older_than_months, drop):
+    """Detach old monthly task partitions"""
+    from app.services.partition_service import PartitionService
+    if not PartitionService.is_partitioned():
+        click.echo('The task table is not partitioned.')
+        return
+
+    if drop and not click.confirm('Dropped partitions cannot be recovered. Are you sure?'):
+        return
+
+    detached = PartitionService.detach_partitions(older_than_months, drop=drop)
+    for name in detached:
+        click.echo(f'  {"Dropped" if drop else "Detached"} {name}')
+    click.echo(f'Detached {len(detached)} partitions (partitions with tasks left are skipped; '
+               f'run archive-tasks first).')
+
+
+@cli.command()
+@with_appcontext
+def clear_cache():
+    """Clear the rendered fragment cache"""
+    fragment_cache.clear()
+    click.echo('Fragment cache cleared.')
+
+
+@cli.command()
+@with_appcontext
+def build_assets():
+    """Fingerprint and precompress static assets for deployment"""
+    from app.assets import build_assets as build
+    manifest = build(current_app.static_folder)
+    for filename, entry in sorted(manifest.items()):
+        encodings = ', '.join(entry['encodings']) or 'none'
+        click.echo(f'{filename} -> {entry["hashed"]} (precompressed: {encodings})')
+    click.echo(f'Built {len(manifest)} assets.')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--measure/--no-measure', default=True,
+              help='Compare template load time with and without the bytecode cache')
+def precompile_templates(measure):
+    """Compile every template into the Jinja bytecode cache"""
+    import time
+    env = current_app.jinja_env
+    if env.bytecode_cache is None:
+        click.echo('Error: JINJA_BYTECODE_CACHE_DIR is not configured')
+        return
+
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    click.echo(f'Precompiled {len(names)} templates into {current_app.config["JINJA_BYTECODE_CACHE_DIR"]}')
+
+    if measure:
+        # Fresh environments without an in-memory cache behave like a newly started worker
+        timings = {}
+        for label, bytecode_cache in (('source', None), ('bytecode', env.bytecode_cache)):
+            cold_env = env.overlay(cache_size=0, bytecode_cache=bytecode_cache)
+            start = time.perf_counter()
+            for name in names:
+                cold_env.get_template(name)
+            timings[label] = (time.perf_counter() - start) * 1000
+
+        click.echo(f'  Cold load from source:   {timings["source"]:.1f} ms')
+        click.echo(f'  Cold load from bytecode: {timings["bytecode"]:.1f} ms')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--rows', default=50000, help='Number of synthetic tasks to serialize')
+@click.option('--repeat', default=3, help='Runs per method (best time is reported)')
+def benchmark_serializer(rows, repeat):
+    """Compare Task.to_dict with TaskService.serialize_many"""
+    import random
+    import time
+    from datetime import datetime, timedelta
+    from app.services.task_service import TaskService, _get_numpy
+
+    # Synthetic rows in SERIALIZED_COLUMNS order; nothing touches the database
+    now = datetime.now()
+    rng = random.Random(0)
+    data = []
+    for i in range(rows):
+        done = rng.random() < 0.3
+        created = now - timedelta(days=rng.randint(0, 365))
+        data.append((
+            i + 1, f'Task {i}', None, done, created + timedelta(days=1) if done else None,
+            rng.randint(1, 3), now + timedelta(days=rng.randint(-30, 30)) if rng.random() < 0.7 else None,
+            created, created, 1, None
+        ))
+    tasks = [Task(id=row[0], title=row[1], description=row[2], completed=row[3], completed_at=row[4],
+                  priority=row[5], due_date=row[6], created_at=row[7], updated_at=row[8],
+                  owner_id=row[9], recurrence_id=row[10]) for row in data]
+
+    methods = [
+        ('Task.to_dict', lambda: [task.to_dict() for task in tasks]),
+        ('serialize_many (Python)', lambda: TaskService.serialize_many(data, now=now, use_numpy=False)),
+    ]
+    if _get_numpy() is not None:
+        methods.append(('serialize_many (NumPy)',
+                        lambda: TaskService.serialize_many(data, now=now, use_numpy=True)))
+
+    click.echo(f'Serializing {rows} tasks (best of {repeat}):')
+    baseline = None
+    for label, method in methods:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            method()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        baseline = baseline or best
+        click.echo(f'  {label:<26} {best:8.1f} ms  ({baseline / best:.1f}x)')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--rows', multiple=True, type=int, default=[10000, 100000],
+              help='Task counts to measure (repeatable)')
+def benchmark_read_models(rows):
+    """Compare ORM task loading with TaskView rows (time and memory)"""
+    import time
+    import tracemalloc
+    from datetime import datetime
+    from sqlalchemy import insert
+    from app.services.task_service import TaskService
+
+    # Everything below runs in one transaction that is rolled back at the end
+    user = User(first_name='Benchmark', last_name='User', phone_number='+10000000000', verified=True)
+    db.session.add(user)
+    db.session.flush()
+    user_id = user.id
+    inserted = 0
+
+    methods = [
+        ('get_user_tasks (ORM)', TaskService.get_user_tasks),
+        ('get_task_views', TaskService.get_task_views),
+    ]
+    try:
+        for count in sorted(rows):
+            now = datetime.now()
+            db.session.execute(insert(Task), [
+                {'title': f'Task {i}', 'owner_id': user_id, 'completed': i % 3 == 0,
+                 'priority': 2, 'created_at': now, 'updated_at': now}
+                for i in range(inserted, count)
+            ])
+            inserted = max(inserted, count)
+
+            click.echo(f'{count} tasks:')
+            for label, method in methods:
+                # Timed and traced separately; tracemalloc slows allocation down
+                db.session.expunge_all()
+                start = time.perf_counter()
+                result = method(user_id)
+                elapsed = (time.perf_counter() - start) * 1000
+                del result
+
+                db.session.expunge_all()
+                tracemalloc.start()
+                result = method(user_id)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                click.echo(f'  {label:<22} {elapsed:8.1f} ms  {peak / 1024 / 1024:7.1f} MiB peak'
+                           f'  ({len(result)} rows)')
+                del result
+    finally:
+        db.session.rollback()
+
+
+@cli.command()
+@with_appcontext
+@click.option('--signups', default=40, help='Concurrent signups per run')
+@click.option('--latency', default=0.25, help='Simulated SMS provider latency in seconds')
+@click.option('--threads', default=4, help='Worker threads of the sync (WSGI) worker')
+def benchmark_signups(signups, latency, threads):
+    """Compare signups per worker under SMS latency: sync Flask vs the ASGI views"""
+    import asyncio
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from urllib.parse import urlencode
+    from app.asgi import AsyncApp
+    from app.fake_twilio import FakeTwilioServer
+    from app.models.users import VerificationCode
+    from app.sms_providers import TwilioProvider
+
+    flask_app = current_app._get_current_object()
+    if ':memory:' in flask_app.config['SQLALCHEMY_DATABASE_URI']:
+        raise click.ClickException('The benchmark needs a database shared by the sync and async engines')
+
+    # Fictional 555-01xx numbers, removed again at the end
+    phones = [f'55501{i:05d}' for i in range(2 * signups)]
+
+    def form(phone):
+        return {'first_name': 'Benchmark', 'last_name': 'User', 'phone_number': phone, 'password': 'benchmark'}
+
+    def run_sync():
+        client = flask_app.test_client()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(lambda phone: client.post('/users/signup', data=form(phone)).status_code,
+                                 phones[:signups]))
+
+    async def post(asgi_app, phone):
+        body = urlencode(form(phone)).encode()
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': 'POST', 'scheme': 'http',
+            'path': '/users/signup', 'root_path': '', 'query_string': b'',
+            'headers': [(b'host', b'localhost'),
+                        (b'content-type', b'application/x-www-form-urlencoded'),
+                        (b'content-length', str(len(body)).encode())],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await asgi_app(scope, receive, send)
+        return messages[0]['status']
+
+    async def run_async():
+        asgi_app = AsyncApp(flask_app)
+        asgi_app.start()
+        try:
+            return await asyncio.gather(*(post(asgi_app, phone) for phone in phones[signups:]))
+        finally:
+            await asgi_app.close()
+            flask_app.extensions.pop('asgi', None)
+
+    # Password hashing is CPU bound and caps throughput for both servers
+    from werkzeug.security import generate_password_hash
+    start = time.perf_counter()
+    generate_password_hash('benchmark')
+    hashing = time.perf_counter() - start
+
+    server = FakeTwilioServer(latency=latency).start()
+    sms_providers = flask_app.extensions['sms_providers']
+    saved_providers = sms_providers.providers
+    sms_providers.providers = [TwilioProvider('ACbenchmark', 'benchmark', from_number='+15550000000',
+                                              base_url=server.url, pool_size=signups)]
+    saved_csrf = flask_app.config.get('WTF_CSRF_ENABLED')
+    flask_app.config['WTF_CSRF_ENABLED'] = False
+
+    click.echo(f'{signups} concurrent signups, {latency * 1000:.0f} ms simulated SMS latency, '
+               f'{hashing * 1000:.0f} ms password hashing each:')
+    try:
+        for label, run in [(f'sync ({threads} threads)', run_sync),
+                           ('asgi (event loop)', lambda: asyncio.run(run_async()))]:
+            start = time.perf_counter()
+            statuses = run()
+            elapsed = time.perf_counter() - start
+            failed = sum(1 for status in statuses if status != 302)
+            click.echo(f'  {label:<20} {elapsed:7.2f} s  {signups / elapsed:7.1f} signups/s'
+                       + (f'  ({failed} failed)' if failed else ''))
+    finally:
+        sms_providers.close()
+        sms_providers.providers = saved_providers
+        flask_app.config['WTF_CSRF_ENABLED'] = saved_csrf
+        server.stop()
+        numbers = [f'+1{phone}' for phone in phones]
+        VerificationCode.query.filter(VerificationCode.phone_number.in_(numbers)).delete()
+        User.query.filter(User.phone_number.in_(numbers)).delete()
+        db.session.commit()
+    click.echo(f'{len(server.messages)} messages reached the fake provider')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--socket', 'socket_path', default=None, help='Unix socket to listen on (default LOG_SOCKET)')
+def log_writer(socket_path):
+    """Run the host's single log writer that worker processes send their logs to"""
+    from app.logs import LogWriter
+
+    config = current_app.config
+    socket_path = socket_path or config.get('LOG_SOCKET')
+    if not socket_path:
+        raise click.ClickException('Set LOG_SOCKET or pass --socket')
+
+    server = LogWriter(socket_path, config['LOG_FILE'], max_bytes=config.get('LOG_MAX_BYTES', 10240000),
+                       backup_count=config.get('LOG_BACKUP_COUNT', 10))
+    click.echo(f"Writing {config['LOG_FILE']} for workers logging to {socket_path} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    click.echo(f'Wrote {server.lines} lines.')
+
+
+@cli.command()
+@click.option('--host', default='127.0.0.1', help='Interface to listen on')
+@click.option('--port', default=8099, help='Port to listen on')
+@click.option('--latency', default=0.0, help='Seconds to wait before answering each message')
+@click.option('--failure-rate', default=0.0, help='Fraction of messages to reject')
+def fake_twilio(host, port, latency, failure_rate):
+    """Run a local fake Twilio API (set TWILIO_API_BASE_URL to its URL)"""
+    import time
+    from app.fake_twilio import FakeTwilioServer
+
+    server = FakeTwilioServer(host, port, latency=latency, failure_rate=failure_rate).start()
+    click.echo(f'Fake Twilio API listening on {server.url} (Ctrl+C to stop)')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        click.echo(f'{len(server.messages)} messages over {server.connections} connections')
+
+
+@cli.command()
+@with_appcontext
+@click.option('--count', default=200, help='Messages per run')
+@click.option('--concurrency', default=[1, 8, 32], multiple=True, help='Concurrency to try (repeatable)')
+@click.option('--latency', default=0.05, help='Simulated provider latency in seconds')
+@click.option('--rate-limit', default=0.0, help='Messages per second (0 for no limit)')
+def benchmark_sms_batch(count, concurrency, latency, rate_limit):
+    """Time SMSService.send_batch against a local fake Twilio API"""
+    import time
+    from app.fake_twilio import FakeTwilioServer
+    from app.services.sms_service import SMSService
+    from app.sms_providers import TwilioProvider
+
+    sms_providers = current_app.extensions['sms_providers']
+    saved_providers = sms_providers.providers
+    messages = [(f'+1555010{i % 10000:04d}', f'Benchmark message {i}') for i in range(count)]
+
+    click.echo(f'{count} messages, {latency * 1000:.0f} ms simulated provider latency:')
+    for workers in concurrency:
+        server = FakeTwilioServer(latency=latency).start()
+        sms_providers.providers = [TwilioProvider('ACbenchmark', 'benchmark', from_number='+15550000000',
+                                                  base_url=server.url, rate_limit=rate_limit,
+                                                  pool_size=workers)]
+        try:
+            start = time.perf_counter()
+            results = SMSService().send_batch(messages, concurrency=workers)
+            elapsed = time.perf_counter() - start
+        finally:
+            sms_providers.close()
+            sms_providers.providers = saved_providers
+            server.stop()
+
+        failed = sum(1 for result in results if not result.ok)
+        click.echo(f'  concurrency {workers:>3}  {elapsed:7.2f} s  {count / elapsed:8.1f} msg/s'
+                   f'  {server.connections:>3} connections' + (f'  ({failed} failed)' if failed else ''))
+
+
+@cli.command()
+@with_appcontext
+def sms_status():
+    """Show each SMS provider's circuit state and send latency (this process only)"""
+    statuses = current_app.extensions['sms_providers'].status()
+    if not statuses:
+        click.echo('No SMS provider is configured')
+    for status in statuses:
+        latency = (f"p50={status['p50_ms']}ms p95={status['p95_ms']}ms" if status['p50_ms'] is not None
+                   else 'no sends yet')
+        click.echo(f"{status['name']:<8} {status['state']:<10} sent={status['sent']} failed={status['failed']} "
+                   f"rejected={status['rejected']} skipped={status['skipped']} {latency}")
+
+
+@cli.command()
+@with_appcontext
+@click.argument('path')
+@click.option('--method', default='GET', help='HTTP method')
+@click.option('--data', multiple=True, help='Form field as key=value (repeatable)')
+@click.option('--user', 'phone', default=None, help='Phone number of the user to log in as')
+@click.option('--repeat', default=1, help='Times to run the request')
+@click.option('--limit', default=25, help='Number of functions to show')
+@click.option('--sort', type=click.Choice(['cumulative', 'own']), default='cumulative', help='Sort by')
+@click.option('--allow-writes', is_flag=True,
+              help='Allow methods other than GET/HEAD (the request really runs repeat + 1 times)')
+def profile_request(path, method, data, phone, repeat, limit, sort, allow_writes):
+    """Profile a request with cProfile and show the hottest routes, services and templates"""
+    from app.phone import normalize_phone_number
+    from app.profiler import hottest_functions, profile_request as run_profiled
+
+    method = method.upper()
+    # Requests go through the real app and database, warm-up included
+    if method not in ('GET', 'HEAD') and not allow_writes:
+        raise click.ClickException(f'{method} {path} would change data {repeat + 1} times; '
+                                   'pass --allow-writes to profile it anyway')
+
+    flask_app = current_app._get_current_object()
+    client = flask_app.test_client()
+    if phone:
+        user = User.query.filter_by(phone_number=normalize_phone_number(phone)).first()
+        if user is None:
+            raise click.ClickException(f'No user with phone number {phone}')
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+    form = dict(field.split('=', 1) for field in data) if data else None
+    saved_csrf = flask_app.config.get('WTF_CSRF_ENABLED')
+    flask_app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        # Warm up: the first request compiles templates and fills caches
+        client.open(path, method=method, data=form)
+        stats, statuses = run_profiled(client, method, path, data=form, repeat=repeat)
+    finally:
+        flask_app.config['WTF_CSRF_ENABLED'] = saved_csrf
+
+    click.echo(f"{method} {path}: status {', '.join(sorted(set(map(str, statuses))))}, "
+               f'{stats.total_tt / repeat * 1000:.1f} ms per request under the profiler')
+    click.echo(f"{'calls':>8} {'own ms':>9} {'total ms':>9}  function")
+    for row in hottest_functions(stats, limit=limit, sort=sort):
+        click.echo(f'{row.calls // repeat:>8} {row.own_seconds / repeat * 1000:>9.2f} '
+                   f'{row.total_seconds / repeat * 1000:>9.2f}  {row.label}')
+
+
 @cli.command()
 @with_appcontext
 @click.option('--count', default=5, help='Number of sample tasks to create')
@@ -157,6 +778,8 @@ def seed_data(count):
         )
         db.session.add(task)
 
+    from app.services.counter_service import CounterService
+    CounterService.adjust(user.id, total=min(count, len(sample_tasks)))
     db.session.commit()
     click.echo(f'Created {min(count, len(sample_tasks))} sample tasks')
 
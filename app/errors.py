@@ -3,19 +3,28 @@ Error handlers for do2done application.
 """
 from flask import render_template, jsonify, request
 from werkzeug.exceptions import HTTPException
+from app.logs import LogSampler
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def wants_json_response():
+    """Check if the request sent JSON or prefers a JSON response"""
+    return request.is_json or \
+        request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+
 def register_error_handlers(app):
     """Register error handlers with the Flask app"""
+    # Scanners and stale links make 404s noisy; log only a sample
+    not_found_sampler = LogSampler(app.config.get('LOG_404_SAMPLE_RATE', 1.0))
 
     @app.errorhandler(400)
     def bad_request(error):
         """Handle 400 Bad Request errors"""
         logger.warning(f"Bad Request: {request.url} - {error}")
-        if request.is_json:
+        if wants_json_response():
             return jsonify(error='Bad Request', message=str(error)), 400
         return render_template('errors/400.html', error=error), 400
 
@@ -23,15 +32,16 @@ def register_error_handlers(app):
     def forbidden(error):
         """Handle 403 Forbidden errors"""
         logger.warning(f"Forbidden: {request.url} - {error}")
-        if request.is_json:
+        if wants_json_response():
             return jsonify(error='Forbidden', message=str(error)), 403
         return render_template('errors/403.html', error=error), 403
 
     @app.errorhandler(404)
     def not_found(error):
         """Handle 404 Not Found errors"""
-        logger.info(f"Not Found: {request.url}")
-        if request.is_json:
+        if not_found_sampler.sample():
+            logger.info(f"Not Found: {request.url}", extra={'sample_rate': not_found_sampler.rate})
+        if wants_json_response():
             return jsonify(error='Not Found', message='Resource not found'), 404
         return render_template('errors/404.html'), 404
 
@@ -39,15 +49,31 @@ def register_error_handlers(app):
     def method_not_allowed(error):
         """Handle 405 Method Not Allowed errors"""
         logger.warning(f"Method Not Allowed: {request.method} {request.url}")
-        if request.is_json:
+        if wants_json_response():
             return jsonify(error='Method Not Allowed', message=str(error)), 405
         return render_template('errors/405.html', error=error), 405
 
+    @app.errorhandler(409)
+    def conflict(error):
+        """Handle 409 Conflict errors"""
+        logger.warning(f"Conflict: {request.url} - {error}")
+        if wants_json_response():
+            return jsonify(error='Conflict', message=str(error)), 409
+        return render_template('errors/409.html', error=error), 409
+
+    @app.errorhandler(422)
+    def unprocessable_entity(error):
+        """Handle 422 Unprocessable Entity errors"""
+        logger.warning(f"Unprocessable Entity: {request.url} - {error}")
+        if wants_json_response():
+            return jsonify(error='Unprocessable Entity', message=str(error)), 422
+        return render_template('errors/422.html', error=error), 422
+
     @app.errorhandler(500)
     def internal_server_error(error):
         """Handle 500 Internal Server errors"""
         logger.error(f"Internal Server Error: {request.url} - {error}", exc_info=True)
-        if request.is_json:
+        if wants_json_response():
             return jsonify(error='Internal Server Error', message='An error occurred'), 500
         return render_template('errors/500.html'), 500
 
@@ -62,6 +88,6 @@ def register_error_handlers(app):
         logger.error(f"Unhandled exception: {error}", exc_info=True)
 
         # Return error response
-        if request.is_json:
+        if wants_json_response():
             return jsonify(error='Internal Server Error', message='An error occurred'), 500
         return render_template('errors/500.html'), 500
@@ -0,0 +1,215 @@
+"""
+Server-sent event pub/sub for do2done application.
+
+Events are published to named channels (one per user for task changes)
+and fanned out to subscribers in this process. A pluggable backend carries
+events between workers: the local backend is an in-process stand-in, the
+Redis backend shares events across every worker and host.
+
+A subscriber that misses events (its queue overflowed, or the Redis
+connection dropped) is ended rather than left silently out of date; the
+stream closes and the browser reconnects and reloads the list.
+"""
+import json
+import queue
+import threading
+import time
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Wakes a subscriber waiting in get() when its subscription is ended
+_END = object()
+
+
+class Subscription:
+    """A single subscriber's queue of pending events for one channel"""
+
+    def __init__(self, broker, channel: str, max_pending: int = 100):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.ended = False
+
+    def get(self, timeout: float = None) -> Optional[dict]:
+        """
+        Wait for the next event
+
+        Args:
+            timeout: Seconds to wait before giving up
+
+        Returns:
+            Event dict with 'event' and 'data' keys, or None on timeout or
+            once the subscription has ended
+        """
+        if self.ended:
+            return None
+        try:
+            event = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return None if event is _END else event
+
+    def end(self) -> None:
+        """Mark the subscription as having missed events, so its stream can end"""
+        self.ended = True
+        try:
+            self.queue.put_nowait(_END)
+        except queue.Full:
+            pass  # get() checks `ended` before it waits
+
+    def close(self) -> None:
+        """Stop receiving events"""
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalEventBackend:
+    """Delivers events within this process only (single-worker stand-in)"""
+
+    def start(self, deliver, reset) -> None:
+        self._deliver = deliver
+
+    def publish(self, channel: str, message: str) -> None:
+        self._deliver(channel, message)
+
+
+class RedisEventBackend:
+    """Delivers events across workers through Redis pub/sub"""
+
+    def __init__(self, url: str, prefix: str = 'do2done:events:', reconnect_delay: float = 1.0):
+        """
+        Initialize Redis backend
+
+        Args:
+            url: Redis connection URL
+            prefix: Prefix for Redis channel names
+            reconnect_delay: Seconds between attempts to resubscribe after a connection error
+        """
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.reconnect_delay = reconnect_delay
+
+    def start(self, deliver, reset) -> None:
+        def listen():
+            while True:
+                try:
+                    pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.psubscribe(f'{self.prefix}*')
+                    for message in pubsub.listen():
+                        channel = message['channel'].decode('utf-8')[len(self.prefix):]
+                        deliver(channel, message['data'].decode('utf-8'))
+                except Exception as e:
+                    logger.warning(f"Event listener lost its Redis connection: {str(e)}")
+                    # Events published meanwhile never arrive; make subscribers resync
+                    reset()
+                    time.sleep(self.reconnect_delay)
+
+        threading.Thread(target=listen, name='event-listener', daemon=True).start()
+
+    def publish(self, channel: str, message: str) -> None:
+        self.client.publish(f'{self.prefix}{channel}', message)
+
+
+class EventBroker:
+    """Flask extension for publishing and subscribing to events"""
+
+    def __init__(self, app=None):
+        self.backend = LocalEventBackend()
+        self.max_pending = 100
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._started = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the event backend from app config
+
+        Uses EVENTS_BACKEND ('local' or 'redis'), EVENTS_REDIS_URL and
+        EVENTS_MAX_PENDING.
+        """
+        if app.config.get('EVENTS_BACKEND', 'local') == 'redis':
+            self.backend = RedisEventBackend(app.config['EVENTS_REDIS_URL'])
+        else:
+            self.backend = LocalEventBackend()
+        self.max_pending = app.config.get('EVENTS_MAX_PENDING', 100)
+        self._started = False
+        app.extensions['events'] = self
+
+    def _ensure_started(self) -> None:
+        # Started lazily so no listener thread exists before workers fork
+        with self._lock:
+            if not self._started:
+                self.backend.start(self._deliver, self._reset)
+                self._started = True
+
+    def publish(self, channel: str, event_type: str, data: dict) -> None:
+        """
+        Publish an event to every subscriber of a channel
+
+        Args:
+            channel: Channel name
+            event_type: Event name (e.g. 'created', 'deleted')
+            data: JSON-serializable event payload
+        """
+        self._ensure_started()
+        message = json.dumps({'event': event_type, 'data': data})
+        try:
+            self.backend.publish(channel, message)
+        except Exception as e:
+            logger.error(f"Failed to publish {event_type} event on {channel}: {str(e)}")
+
+    def subscribe(self, channel: str) -> Subscription:
+        """Subscribe to a channel"""
+        self._ensure_started()
+        subscription = Subscription(self, channel, self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription"""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def _deliver(self, channel: str, message: str) -> None:
+        """Fan an event out to local subscribers"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        if not subscribers:
+            return
+
+        event = json.loads(message)
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                # Slow consumer; ending its stream makes the client reconnect and reload
+                if not subscription.ended:
+                    logger.warning(f"Ending stream of slow subscriber on {channel}")
+                    subscription.end()
+
+    def _reset(self) -> None:
+        """End every local subscription after events may have been lost"""
+        with self._lock:
+            subscriptions = [s for subscribers in self._subscribers.values() for s in subscribers]
+        for subscription in subscriptions:
+            subscription.end()
+
+
+def format_sse(event: dict) -> str:
+    """Format an event dict as a server-sent event message"""
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
@@ -0,0 +1,86 @@
+"""
+In-process stand-in for a Redis client.
+
+Implements the handful of commands the Redis session backend uses, with
+key expiry, so it can be developed and tested without a Redis server.
+Set SESSION_REDIS_URL to `fake://` to use it. Data lives in the current
+process only.
+"""
+import fnmatch
+import threading
+import time
+from typing import Iterator, Optional
+
+
+class FakeRedis:
+    """Thread-safe dict of bytes values with Redis-style expiry"""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name) -> bytes:
+        return name.encode('utf-8') if isinstance(name, str) else name
+
+    def _alive(self, key: bytes, now: float) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= now:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def get(self, name) -> Optional[bytes]:
+        key = self._key(name)
+        with self._lock:
+            return self._data[key] if self._alive(key, time.monotonic()) else None
+
+    def set(self, name, value, ex: Optional[int] = None) -> bool:
+        key = self._key(name)
+        with self._lock:
+            self._data[key] = value.encode('utf-8') if isinstance(value, str) else value
+            if ex is None:
+                self._expires.pop(key, None)
+            else:
+                self._expires[key] = time.monotonic() + ex
+        return True
+
+    def expire(self, name, time_seconds: int) -> bool:
+        key = self._key(name)
+        with self._lock:
+            if not self._alive(key, time.monotonic()):
+                return False
+            self._expires[key] = time.monotonic() + time_seconds
+        return True
+
+    def ttl(self, name) -> int:
+        key = self._key(name)
+        now = time.monotonic()
+        with self._lock:
+            if not self._alive(key, now):
+                return -2
+            expires = self._expires.get(key)
+            return -1 if expires is None else int(expires - now)
+
+    def delete(self, *names) -> int:
+        with self._lock:
+            deleted = 0
+            for name in names:
+                key = self._key(name)
+                self._expires.pop(key, None)
+                if self._data.pop(key, None) is not None:
+                    deleted += 1
+            return deleted
+
+    def scan_iter(self, match: str = '*') -> Iterator[bytes]:
+        now = time.monotonic()
+        with self._lock:
+            keys = [key for key in list(self._data) if self._alive(key, now)]
+        return iter([key for key in keys if fnmatch.fnmatchcase(key.decode('utf-8'), match)])
+
+    def flushdb(self) -> bool:
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+        return True
@@ -0,0 +1,120 @@
+"""
+Local stand-in for the Twilio Messages API.
+
+Accepts the same message POSTs as api.twilio.com and answers with
+Twilio-shaped JSON after an optional delay, so SMS sending can be
+developed and benchmarked without credentials. Point
+TWILIO_API_BASE_URL at `server.url`, or run `flask cli fake-twilio`.
+"""
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+MESSAGES_PATH = re.compile(r'^/2010-04-01/Accounts/(?P<account_sid>[^/]+)/Messages\.json$')
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    """Handles message creation; HTTP/1.1 so clients can keep connections open"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; don't let Nagle delay the body
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        match = MESSAGES_PATH.match(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        if match is None:
+            self._respond(404, {'code': 20404, 'message': 'The requested resource was not found'})
+            return
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not form.get('To') or not form.get('Body') or not (form.get('From') or form.get('MessagingServiceSid')):
+            self._respond(400, {'code': 21604, 'message': 'A required parameter is missing'})
+            return
+        if self.server.failure_rate and random.random() < self.server.failure_rate:
+            self._respond(400, {'code': 21211, 'message': f"The 'To' number {form['To']} is not valid"})
+            return
+
+        message = {
+            'sid': f'SM{uuid.uuid4().hex}',
+            'account_sid': match.group('account_sid'),
+            'to': form['To'],
+            'from': form.get('From'),
+            'messaging_service_sid': form.get('MessagingServiceSid'),
+            'body': form['Body'],
+            'status': 'queued',
+        }
+        with self.server.lock:
+            self.server.messages.append(message)
+        self._respond(201, message)
+
+    def _respond(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTwilioServer(ThreadingHTTPServer):
+    """
+    Fake Twilio API server running on a background thread
+
+    Records accepted messages in `messages` and the number of TCP
+    connections clients opened in `connections`.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 failure_rate: float = 0.0):
+        """
+        Initialize fake server (port 0 picks a free port)
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on
+            latency: Seconds to wait before answering each message
+            failure_rate: Fraction of messages rejected as invalid numbers
+        """
+        super().__init__((host, port), FakeTwilioHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as TWILIO_API_BASE_URL"""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeTwilioServer':
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-twilio', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket"""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
@@ -6,31 +6,17 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, TextAreaField, DateField, SelectField
 from wtforms.validators import DataRequired, Length, EqualTo, ValidationError, Optional
 from flask_babel import lazy_gettext as _
-import phonenumbers
+from app.phone import normalize_phone_number
 
 
 def validate_phone_number(form, field):
     """Custom validator for phone numbers"""
-    try:
-        # Remove all non-digit characters
-        phone = ''.join(filter(str.isdigit, field.data))
+    formatted = normalize_phone_number(field.data, validate=True)
+    if not formatted:
+        raise ValidationError(_('Invalid phone number'))
 
-        # Check if it's 10 digits (US format)
-        if len(phone) != 10:
-            raise ValidationError(_('Phone number must be 10 digits'))
-
-        # Format and validate with phonenumbers library
-        formatted = f"+1{phone}"
-        parsed_number = phonenumbers.parse(formatted, "US")
-
-        if not phonenumbers.is_valid_number(parsed_number):
-            raise ValidationError(_('Invalid phone number'))
-
-        # Store formatted number back to field
-        field.data = formatted
-
-    except phonenumbers.NumberParseException:
-        raise ValidationError(_('Invalid phone number format'))
+    # Store formatted number back to field
+    field.data = formatted
 
 
 class SignupForm(FlaskForm):
@@ -0,0 +1,123 @@
+"""
+Health and readiness probes for do2done application.
+
+`/healthz` answers as long as the process can serve requests; `/readyz`
+also checks that a database connection can be checked out of the pool
+(and how long that takes) and reports the SMS providers' circuit states.
+Both are answered by a WSGI middleware in front of the Flask app, so a
+probe never opens a session, loads translations, checks CSRF or writes an
+access log record. Readiness results are cached for HEALTH_CACHE_SECONDS,
+and concurrent probes wait for one check instead of each running their
+own, so probing adds no load however often the load balancer asks.
+"""
+import json
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = '/healthz'
+READY_PATH = '/readyz'
+
+
+class HealthChecks:
+    """Flask extension answering the load balancer probes"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.cache_seconds = 5.0
+        self.db_latency_threshold = 1.0
+        self.sms_required = False
+        self._result = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Answer the probes in front of the app
+
+        Uses HEALTH_CACHE_SECONDS, HEALTH_DB_LATENCY_THRESHOLD and HEALTH_SMS_REQUIRED.
+        """
+        self.app = app
+        self.cache_seconds = app.config.get('HEALTH_CACHE_SECONDS', 5.0)
+        self.db_latency_threshold = app.config.get('HEALTH_DB_LATENCY_THRESHOLD', 1.0)
+        self.sms_required = app.config.get('HEALTH_SMS_REQUIRED', False)
+        self._result = None
+        app.wsgi_app = HealthMiddleware(app.wsgi_app, self)
+        app.extensions['health'] = self
+
+    def check_database(self) -> dict:
+        """Check out a pooled connection and run a trivial query"""
+        from app import db
+
+        started = time.perf_counter()
+        try:
+            with self.app.app_context(), db.engine.connect() as connection:
+                checked_out = time.perf_counter()
+                connection.exec_driver_sql('SELECT 1')
+                finished = time.perf_counter()
+        except Exception as e:
+            logger.warning(f'Readiness check: database unavailable: {e}')
+            return {'ok': False, 'error': type(e).__name__}
+
+        checkout = checked_out - started
+        return {
+            'ok': checkout <= self.db_latency_threshold,
+            'checkout_ms': round(checkout * 1000, 1),
+            'query_ms': round((finished - checked_out) * 1000, 1),
+        }
+
+    def check_sms(self) -> dict:
+        """Circuit state of each SMS provider; fine while any of them accepts sends"""
+        providers = self.app.extensions['sms_providers'].status()
+        states = {provider['name']: provider['state'] for provider in providers}
+        available = any(state != 'open' for state in states.values())
+        return {'ok': available or not self.sms_required, 'available': available, 'providers': states}
+
+    def readiness(self) -> dict:
+        """The latest readiness result, re-checked at most every cache_seconds"""
+        result = self._result
+        if result is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+            return result
+        with self._lock:
+            # Another probe may have refreshed it while we waited
+            if self._result is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+                return self._result
+            checks = {'database': self.check_database(), 'sms': self.check_sms()}
+            self._result = {
+                'status': 'ready' if all(check['ok'] for check in checks.values()) else 'unavailable',
+                'checks': checks,
+                'checked_at': time.time(),
+            }
+            self._checked_at = time.monotonic()
+            return self._result
+
+
+class HealthMiddleware:
+    """WSGI middleware answering the probe paths without entering the Flask app"""
+
+    def __init__(self, wsgi_app, health: HealthChecks):
+        self.wsgi_app = wsgi_app
+        self.health = health
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO')
+        if path == HEALTH_PATH:
+            return self._respond(start_response, 200, {'status': 'ok'})
+        if path == READY_PATH:
+            result = self.health.readiness()
+            return self._respond(start_response, 200 if result['status'] == 'ready' else 503, result)
+        return self.wsgi_app(environ, start_response)
+
+    @staticmethod
+    def _respond(start_response, status_code: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        start_response('200 OK' if status_code == 200 else '503 Service Unavailable', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Cache-Control', 'no-store'),
+        ])
+        return [body]
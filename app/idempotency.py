@@ -0,0 +1,293 @@
+"""
+Idempotency keys for mutating requests.
+
+Clients send an `Idempotency-Key` header (or an `idempotency_key` form
+field) with a write. The first request with a key is executed and its
+response stored for IDEMPOTENCY_TTL seconds; retries and double-submits
+with the same key get the stored response back without running the view
+again. Keys are scoped per user. A request still in progress holds its
+key for IDEMPOTENCY_LEASE seconds only, so if its worker dies, a retry
+runs the request again once the lease has expired.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import NamedTuple, Optional
+from flask import Response, abort, current_app, request
+from flask_login import current_user
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_HEADER = 'Idempotency-Key'
+KEY_FIELD = 'idempotency_key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Form fields that differ between otherwise identical submissions
+IGNORED_FIELDS = frozenset({KEY_FIELD, 'csrf_token'})
+
+
+class IdempotencyRecord(NamedTuple):
+    """A stored request; status_code is None while it is still being processed"""
+    fingerprint: str
+    status_code: Optional[int] = None
+    content_type: Optional[str] = None
+    location: Optional[str] = None
+    body: Optional[bytes] = None
+
+
+class MemoryIdempotencyBackend:
+    """
+    In-process key store with a size bound
+
+    Only protects requests handled by the same worker process; use the
+    database backend when running several workers.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Initialize memory backend
+
+        Args:
+            max_entries: Maximum number of stored keys (oldest are evicted first)
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reserve(self, user_id: int, key: str, fingerprint: str,
+                lease: int) -> Optional[IdempotencyRecord]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            self._entries[(user_id, key)] = (now + lease, IdempotencyRecord(fingerprint))
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return None
+
+    def complete(self, user_id: int, key: str, record: IdempotencyRecord, ttl: int) -> None:
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            # Only the reservation in progress; a retry may have taken over an expired one
+            if entry is not None and entry[1].status_code is None:
+                self._entries[(user_id, key)] = (time.monotonic() + ttl, record)
+
+    def release(self, user_id: int, key: str) -> None:
+        with self._lock:
+            self._entries.pop((user_id, key), None)
+
+    def purge(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [entry_key for entry_key, (expires, _) in self._entries.items() if expires <= now]
+            for entry_key in expired:
+                del self._entries[entry_key]
+        return len(expired)
+
+
+class DatabaseIdempotencyBackend:
+    """
+    Key store in the idempotency_key table
+
+    Shared by every worker; the unique (user_id, key) constraint lets
+    exactly one request claim a key.
+    """
+
+    def reserve(self, user_id: int, key: str, fingerprint: str,
+                lease: int) -> Optional[IdempotencyRecord]:
+        from sqlalchemy import delete, insert, select
+        from sqlalchemy.exc import IntegrityError
+        from app import db
+        from app.models.idempotency import IdempotencyKey
+
+        now = datetime.now()
+        db.session.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at <= now
+        ))
+        try:
+            db.session.execute(insert(IdempotencyKey).values(
+                user_id=user_id, key=key, fingerprint=fingerprint,
+                created_at=now, expires_at=now + timedelta(seconds=lease)
+            ))
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+
+        stored = db.session.execute(
+            select(IdempotencyKey.fingerprint, IdempotencyKey.status_code,
+                   IdempotencyKey.content_type, IdempotencyKey.location, IdempotencyKey.body)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        ).one_or_none()
+        db.session.commit()
+        # Released between our insert and select; report it as in progress
+        return IdempotencyRecord(*stored) if stored else IdempotencyRecord(fingerprint)
+
+    def complete(self, user_id: int, key: str, record: IdempotencyRecord, ttl: int) -> None:
+        from sqlalchemy import update
+        from app import db
+        from app.models.idempotency import IdempotencyKey
+
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key,
+                   IdempotencyKey.status_code.is_(None))
+            .values(status_code=record.status_code, content_type=record.content_type,
+                    location=record.location, body=record.body,
+                    expires_at=datetime.now() + timedelta(seconds=ttl))
+        )
+        db.session.commit()
+
+    def release(self, user_id: int, key: str) -> None:
+        from sqlalchemy import delete
+        from app import db
+        from app.models.idempotency import IdempotencyKey
+
+        db.session.rollback()
+        db.session.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+        ))
+        db.session.commit()
+
+    def purge(self) -> int:
+        from sqlalchemy import delete
+        from app import db
+        from app.models.idempotency import IdempotencyKey
+
+        result = db.session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.now())
+        )
+        db.session.commit()
+        return result.rowcount
+
+
+class IdempotencyStore:
+    """Flask extension holding the idempotency key backend"""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 3600
+        self.lease = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the backend from IDEMPOTENCY_BACKEND ('memory' or 'database')
+
+        Uses IDEMPOTENCY_TTL, IDEMPOTENCY_LEASE and IDEMPOTENCY_MAX_ENTRIES (memory backend).
+        """
+        backend_type = app.config.get('IDEMPOTENCY_BACKEND', 'memory')
+        if backend_type == 'database':
+            self.backend = DatabaseIdempotencyBackend()
+        else:
+            self.backend = MemoryIdempotencyBackend(app.config.get('IDEMPOTENCY_MAX_ENTRIES', 10000))
+        self.ttl = app.config.get('IDEMPOTENCY_TTL', 3600)
+        self.lease = app.config.get('IDEMPOTENCY_LEASE', 60)
+        app.extensions['idempotency'] = self
+
+    def reserve(self, user_id: int, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        """
+        Claim a key for a new request
+
+        The claim lasts `lease` seconds until the response is stored, so a
+        request that never finishes doesn't block retries for the full TTL.
+
+        Returns:
+            None if the key was claimed, otherwise the existing record
+        """
+        return self.backend.reserve(user_id, key, fingerprint, self.lease)
+
+    def complete(self, user_id: int, key: str, fingerprint: str, response: Response) -> None:
+        """Store the response of a claimed request for replay"""
+        self.backend.complete(user_id, key, IdempotencyRecord(
+            fingerprint=fingerprint,
+            status_code=response.status_code,
+            content_type=response.content_type,
+            location=response.headers.get('Location'),
+            body=response.get_data()
+        ), self.ttl)
+
+    def release(self, user_id: int, key: str) -> None:
+        """Forget a claimed key so the request can be retried"""
+        self.backend.release(user_id, key)
+
+    def purge(self) -> int:
+        """Delete expired keys, returning how many were removed"""
+        return self.backend.purge()
+
+
+def request_fingerprint() -> str:
+    """Hash the method, path and body of the current request"""
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.full_path}\n'.encode('utf-8'))
+    if request.is_json:
+        digest.update(request.get_data())
+    else:
+        for name, value in sorted(request.form.items(multi=True)):
+            if name not in IGNORED_FIELDS:
+                digest.update(f'{name}={value}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def replay(record: IdempotencyRecord) -> Response:
+    """Rebuild a stored response"""
+    response = Response(record.body, status=record.status_code, content_type=record.content_type)
+    if record.location:
+        response.headers['Location'] = record.location
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Make a mutating view safe to retry with an idempotency key
+
+    Requests without a key run as usual. A repeated key returns the stored
+    response, 409 if the first request is still running (within its lease), or 422 if the
+    key was used for a different request. Failed requests (exceptions and
+    5xx responses) release the key so the client can retry.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(KEY_HEADER) or request.form.get(KEY_FIELD)
+        if not key or not current_user.is_authenticated:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            abort(400, f'{KEY_HEADER} must be at most {MAX_KEY_LENGTH} characters')
+
+        store = current_app.extensions['idempotency']
+        user_id = current_user.id
+        fingerprint = request_fingerprint()
+
+        existing = store.reserve(user_id, key, fingerprint)
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                abort(422, f'{KEY_HEADER} was already used for a different request')
+            if existing.status_code is None:
+                abort(409, 'A request with this idempotency key is still in progress')
+            logger.info(f'Replaying idempotent {request.method} {request.path} for user {user_id}')
+            return replay(existing)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            store.release(user_id, key)
+            raise
+
+        if response.status_code >= 500 or response.is_streamed:
+            store.release(user_id, key)
+        else:
+            store.complete(user_id, key, fingerprint, response)
+        return response
+
+    return wrapper
@@ -0,0 +1,234 @@
+"""
+Application logging for do2done application.
+
+Request threads never write log files themselves: records are put on an
+in-memory queue by a QueueHandler and written by a QueueListener thread.
+When LOG_SOCKET is set, the listener forwards the records to the host's
+single log writer (`flask cli log-writer`), which is then the only process
+writing and rotating the file. Otherwise every process appends to LOG_FILE
+itself and never rotates it, since processes rotating a shared file lose
+each other's records; rotate it externally (e.g. logrotate), and the file
+is reopened when it is moved. Records are JSON lines carrying the request id, user id and, for
+the per-request access record, the latency.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import socketserver
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, SocketHandler, WatchedFileHandler
+from flask import g, has_request_context, request
+
+access_logger = logging.getLogger('app.requests')
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Request ids accepted from a proxy; anything else is replaced
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# LogRecord attributes that are not extra fields
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Adds the request id and user id to records logged during a request"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            # Only a user Flask-Login already loaded; logging must not query
+            user = g.get('_login_user')
+            record.user_id = getattr(user, 'id', None)
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments and render the traceback now, in the calling
+        # thread, but keep them apart for the JSON formatter (the base class
+        # would flatten both into one formatted line)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LineSocketHandler(SocketHandler):
+    """Sends formatted records as newline-terminated lines to the log writer"""
+
+    def makePickle(self, record: logging.LogRecord) -> bytes:
+        return (self.format(record) + '\n').encode('utf-8')
+
+
+class LogSampler:
+    """Lets through a fraction of records, e.g. for noisy 404s"""
+
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate: Fraction of records to keep (1 keeps all, 0 none)
+        """
+        self.rate = rate
+
+    def sample(self) -> bool:
+        """Whether to log this occurrence"""
+        return self.rate >= 1 or random.random() < self.rate
+
+
+def build_writer_handler(app) -> logging.Handler:
+    """Handler the listener thread writes through: the host log writer, or LOG_FILE (never rotated)"""
+    socket_path = app.config.get('LOG_SOCKET')
+    if socket_path:
+        handler = LineSocketHandler(socket_path, None)
+    else:
+        log_file = app.config.get('LOG_FILE', 'logs/do2done.log')
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        handler = WatchedFileHandler(log_file)
+    handler.setFormatter(JSONFormatter())
+    return handler
+
+
+def configure_logging(app) -> None:
+    """
+    Route the app's logs through the queue and log each request
+
+    Uses LOG_LEVEL, LOG_FILE, LOG_SOCKET, LOG_QUEUE_SIZE and LOG_REQUESTS.
+    The listener is started once per process, however many apps are created.
+    """
+    global _listener
+
+    app_logger = logging.getLogger('app')
+    app_logger.setLevel(getattr(logging, app.config.get('LOG_LEVEL', 'INFO')))
+    if _listener is None:
+        log_queue = queue.Queue(maxsize=app.config.get('LOG_QUEUE_SIZE', 10000))
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.setFormatter(JSONFormatter())
+        queue_handler.addFilter(RequestContextFilter())
+        app_logger.addHandler(queue_handler)
+
+        _listener = QueueListener(log_queue, build_writer_handler(app), respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    if app.config.get('LOG_REQUESTS', True):
+        app.before_request(start_request)
+        app.after_request(log_request)
+    app.logger.info('do2done application startup')
+
+
+def start_request() -> None:
+    """Assign the request id and start the latency clock"""
+    request_id = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = request_id if REQUEST_ID_PATTERN.match(request_id) else uuid.uuid4().hex
+    g.request_started = time.perf_counter()
+
+
+def log_request(response):
+    """Write the access record and echo the request id"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    response.headers[REQUEST_ID_HEADER] = g.request_id
+    access_logger.info(
+        f'{request.method} {request.path} {response.status_code}',
+        extra={
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+    )
+    return response
+
+
+class LogWriterHandler(socketserver.StreamRequestHandler):
+    """Appends the lines one worker process sends"""
+
+    def handle(self):
+        for line in self.rfile:
+            self.server.write(line.decode('utf-8', errors='replace').rstrip('\n'))
+
+
+class LogWriter(socketserver.ThreadingUnixStreamServer):
+    """
+    The host's single log writer
+
+    Worker processes connect to its Unix socket (LOG_SOCKET) and send
+    JSON lines; only this process writes and rotates the log file.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, log_file: str, max_bytes: int = 10240000, backup_count: int = 10):
+        """
+        Args:
+            socket_path: Unix socket to listen on (a stale one is replaced)
+            log_file: File to append to
+            max_bytes: Rotate when the file reaches this size
+            backup_count: Rotated files to keep
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, LogWriterHandler)
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        self.file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+        self.file_handler.setFormatter(logging.Formatter('%(message)s'))
+        self.lines = 0
+        self._lock = threading.Lock()
+
+    def write(self, line: str) -> None:
+        with self._lock:
+            self.file_handler.emit(logging.makeLogRecord({'msg': line}))
+            self.lines += 1
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.file_handler.close()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
@@ -1,2 +1,5 @@
 from app.models.users import User, VerificationCode
-from app.models.tasks import Task
+from app.models.idempotency import IdempotencyKey
+from app.models.sessions import ServerSession
+from app.models.tasks import CalendarDay, DueTaskView, Task, TaskArchive, TaskRecurrence, TaskView, \
+    UserTaskCounters
@@ -0,0 +1,26 @@
+from app import db
+from datetime import datetime
+
+
+class IdempotencyKey(db.Model):
+    """Stored result of a request made with an Idempotency-Key"""
+    __tablename__ = 'idempotency_key'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of method, path and body
+    status_code = db.Column(db.Integer, nullable=True)  # NULL while the request is in progress
+    content_type = db.Column(db.String(100), nullable=True)
+    location = db.Column(db.String(500), nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    # One execution per user and key, even across workers
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_key_user_key'),
+    )
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.user_id}:{self.key}>'
@@ -0,0 +1,13 @@
+from app import db
+
+
+class ServerSession(db.Model):
+    """Session data for the database session backend (see app.sessions)"""
+    __tablename__ = 'server_session'
+
+    sid = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)  # Tagged JSON, as in Flask's cookie sessions
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ServerSession {self.sid[:8]}>'
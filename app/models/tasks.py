@@ -1,5 +1,8 @@
+from typing import List, NamedTuple, Optional
 from app import db
-from datetime import datetime
+from datetime import date, datetime
+
+PRIORITY_LABELS = {1: 'Low', 2: 'Medium', 3: 'High'}
 
 
 class Task(db.Model):
@@ -8,11 +11,31 @@ class Task(db.Model):
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     completed = db.Column(db.Boolean, default=False)
+    completed_at = db.Column(db.DateTime, nullable=True)
     priority = db.Column(db.Integer, default=2)  # 1=Low, 2=Medium, 3=High
     due_date = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
-    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    recurrence_id = db.Column(db.Integer, db.ForeignKey('task_recurrence.id', ondelete='SET NULL'),
+                              nullable=True, index=True)
+
+    # Pending tasks per owner; completed tasks are left out of this index
+    # and eventually moved to task_archive by `flask cli archive-tasks`.
+    # The full (owner_id, due_date) index serves calendar range scans and
+    # every other lookup by owner.
+    __table_args__ = (
+        db.Index('ix_task_owner_pending', 'owner_id', 'due_date',
+                 postgresql_where=db.text('completed = false'),
+                 sqlite_where=db.text('completed = 0')),
+        db.Index('ix_task_owner_due_date', 'owner_id', 'due_date'),
+    )
+
+    # Owners are batch-loaded for whole result sets; the shares collection
+    # must be loaded explicitly (e.g. with selectinload) instead of lazily
+    owner = db.relationship('User', back_populates='tasks', lazy='selectin')
+    shared_with = db.relationship('User', secondary='task_shares', back_populates='shared_tasks',
+                                  lazy='raise_on_sql', passive_deletes=True)
 
     def __repr__(self):
         return f'<Task {self.title}>'
@@ -27,8 +50,7 @@ class Task(db.Model):
     @property
     def priority_label(self):
         """Get human-readable priority label"""
-        labels = {1: 'Low', 2: 'Medium', 3: 'High'}
-        return labels.get(self.priority, 'Medium')
+        return PRIORITY_LABELS.get(self.priority, 'Medium')
 
     def to_dict(self):
         """Convert task to dictionary"""
@@ -37,17 +59,160 @@ class Task(db.Model):
             'title': self.title,
             'description': self.description,
             'completed': self.completed,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'priority': self.priority,
             'priority_label': self.priority_label,
             'due_date': self.due_date.isoformat() if self.due_date else None,
             'is_overdue': self.is_overdue,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
+            'owner_id': self.owner_id,
+            'recurrence_id': self.recurrence_id
+        }
+
+
+class TaskRecurrence(db.Model):
+    """
+    A repeating task series
+
+    Only the next pending occurrence exists as a Task row; later ones are
+    computed from the rule when a date range is viewed, and the following
+    occurrence is created when the current one is completed.
+    """
+    __tablename__ = 'task_recurrence'
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    priority = db.Column(db.Integer, default=2)
+    rule = db.Column(db.String(200), nullable=False)  # Canonical RRULE text
+    dtstart = db.Column(db.DateTime, nullable=False)
+    # Due date of the first occurrence not yet created; NULL once the rule has ended
+    next_due_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_task_recurrence_owner_next', 'owner_id', 'next_due_at'),
+    )
+
+    def __repr__(self):
+        return f'<TaskRecurrence {self.title} {self.rule}>'
+
+
+class TaskView(NamedTuple):
+    """Read-only task row for list views, loaded without the session identity map"""
+    id: int
+    title: str
+    completed: bool
+    owner_id: int
+
+
+class DueTaskView(NamedTuple):
+    """Read-only dated task row for calendar views"""
+    id: int
+    title: str
+    completed: bool
+    priority: int
+    due_date: datetime
+    owner_id: int
+    # Set for occurrences of a recurring task; upcoming occurrences that
+    # have not been created yet have no id
+    recurrence_id: Optional[int] = None
+
+    @property
+    def priority_label(self):
+        """Get human-readable priority label"""
+        return PRIORITY_LABELS.get(self.priority, 'Medium')
+
+    def to_dict(self):
+        """Convert task row to dictionary"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'completed': self.completed,
+            'priority': self.priority,
+            'priority_label': self.priority_label,
+            'due_date': self.due_date.isoformat(),
+            'owner_id': self.owner_id,
+            'recurrence_id': self.recurrence_id
+        }
+
+
+class CalendarDay(NamedTuple):
+    """Tasks due on one day: the day's full count and its first few tasks"""
+    day: date
+    total: int
+    tasks: List[DueTaskView]
+
+
+class TaskArchive(db.Model):
+    """Completed tasks moved out of the hot task table"""
+    __tablename__ = 'task_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Original task id
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    priority = db.Column(db.Integer, default=2)
+    due_date = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.now)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_task_archive_owner_completed', 'owner_id', 'completed_at'),
+    )
+
+    def __repr__(self):
+        return f'<TaskArchive {self.title}>'
+
+    @property
+    def priority_label(self):
+        """Get human-readable priority label"""
+        return PRIORITY_LABELS.get(self.priority, 'Medium')
+
+    def to_dict(self):
+        """Convert archived task to dictionary"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'completed': True,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'priority': self.priority,
+            'priority_label': self.priority_label,
+            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None,
             'owner_id': self.owner_id
         }
 
 
+class UserTaskCounters(db.Model):
+    """Per-user task counts, maintained alongside every task write"""
+    __tablename__ = 'user_task_counters'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    pending = db.Column(db.Integer, nullable=False, default=0)
+
+    # Overdue depends on the clock, so it is a snapshot refreshed on read
+    # once it is older than TASK_COUNTERS_OVERDUE_TTL; writes clear it
+    overdue = db.Column(db.Integer, nullable=False, default=0)
+    overdue_as_of = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<UserTaskCounters user={self.user_id} total={self.total}>'
+
+
+# Composite primary key indexes (task_id, user_id); user_id has its own
+# index for "shared with me" lookups
 task_shares = db.Table('task_shares',
-    db.Column('task_id', db.Integer, db.ForeignKey('task.id')),
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id'))
+    db.Column('task_id', db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True,
+              index=True)
 )
@@ -2,25 +2,45 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 from app import db
+from app.tracing import traced
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
-    phone_number = db.Column(db.String(20), unique=True)
+    phone_number = db.Column(db.String(20))
     password_hash = db.Column(db.String(512))
     verification_code = db.Column(db.String(6))
     verified = db.Column(db.Boolean, default=False)
     verification_attempts = db.Column(db.Integer, default=0)
     last_verification_attempt = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    # Numbers are stored normalized (E.164, see app.phone). The unique index
+    # also carries the id, so "is this number taken" checks are index-only.
+    # Unverified accounts are a small slice of the table; the partial index
+    # lets the admin commands walk them in id order without a full scan.
+    __table_args__ = (
+        db.Index('ix_user_phone_number', 'phone_number', unique=True, postgresql_include=['id']),
+        db.Index('ix_user_unverified', 'id', 'created_at', postgresql_where=db.text('verified IS NOT TRUE')),
+    )
+
+    # Task collections can be large, so they are never lazy loaded. Use
+    # selectinload/joinedload or an aggregate query instead.
+    tasks = db.relationship('Task', back_populates='owner', lazy='raise_on_sql',
+                            passive_deletes=True)
+    shared_tasks = db.relationship('Task', secondary='task_shares', back_populates='shared_with',
+                                   lazy='raise_on_sql', passive_deletes=True)
 
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+    @traced('User.set_password')
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
+    @traced('User.check_password')
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
@@ -0,0 +1,135 @@
+"""
+N+1 query detection for do2done application.
+
+Opt-in (NPLUSONE_ENABLED) for tests and development. Every lazy
+relationship load issued during a request is fingerprinted; a request
+that repeats the same lazy SELECT is flagged as an N+1 pattern.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Tuple
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import logging
+
+logger = logging.getLogger(__name__)
+
+_current_tracker = ContextVar('lazy_load_tracker', default=None)
+
+
+class NPlusOneError(Exception):
+    """Raised when NPLUSONE_RAISE is set and a request has an N+1 pattern"""
+    pass
+
+
+class LazyLoadTracker:
+    """Counts lazy loads by parent model and SQL statement"""
+
+    def __init__(self, threshold: int = 2):
+        """
+        Initialize tracker
+
+        Args:
+            threshold: Number of identical lazy loads that counts as N+1
+        """
+        self.threshold = threshold
+        self.counts = Counter()
+
+    def record(self, parent: str, statement: str) -> None:
+        """Record a single lazy load"""
+        self.counts[(parent, statement)] += 1
+
+    def repeated(self) -> List[Tuple[str, str, int]]:
+        """
+        Get lazy loads that were repeated at least `threshold` times
+
+        Returns:
+            List of (parent model, statement, count) tuples
+        """
+        return [(parent, statement, count)
+                for (parent, statement), count in self.counts.most_common()
+                if count >= self.threshold]
+
+
+@contextmanager
+def track_lazy_loads(threshold: int = 2):
+    """
+    Track lazy loads issued inside the block
+
+    Example:
+        with track_lazy_loads() as tracker:
+            render_task_list()
+        assert not tracker.repeated()
+    """
+    _listen()
+    tracker = LazyLoadTracker(threshold)
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
+
+def _on_orm_execute(orm_execute_state):
+    tracker = _current_tracker.get()
+    if tracker is None or not orm_execute_state.is_select:
+        return
+    if orm_execute_state.lazy_loaded_from is not None:
+        tracker.record(orm_execute_state.lazy_loaded_from.class_.__name__,
+                       str(orm_execute_state.statement))
+
+
+def _listen():
+    if not event.contains(Session, 'do_orm_execute', _on_orm_execute):
+        event.listen(Session, 'do_orm_execute', _on_orm_execute)
+
+
+def _describe(repeated: List[Tuple[str, str, int]]) -> str:
+    return '; '.join(f'{count}x lazy load from {parent}: {" ".join(statement.split())}'
+                     for parent, statement, count in repeated)
+
+
+class NPlusOneDetector:
+    """Flask extension that flags requests with repeated lazy loads"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Hook request tracking when NPLUSONE_ENABLED is set
+
+        Uses NPLUSONE_THRESHOLD and NPLUSONE_RAISE (raise NPlusOneError
+        instead of logging a warning, for test suites).
+        """
+        if not app.config.get('NPLUSONE_ENABLED', False):
+            return
+
+        _listen()
+        app.before_request(self._start_tracking)
+        app.after_request(self._check_request)
+        app.teardown_request(self._stop_tracking)
+        app.extensions['nplusone'] = self
+
+    def _start_tracking(self):
+        tracker = LazyLoadTracker(current_app.config.get('NPLUSONE_THRESHOLD', 2))
+        g._lazy_load_tracker = tracker
+        g._lazy_load_token = _current_tracker.set(tracker)
+
+    def _check_request(self, response):
+        tracker = g.get('_lazy_load_tracker')
+        repeated = tracker.repeated() if tracker else []
+        if repeated:
+            message = f'N+1 queries in {request.method} {request.path}: {_describe(repeated)}'
+            if current_app.config.get('NPLUSONE_RAISE', False):
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
+
+    def _stop_tracking(self, exc=None):
+        token = g.pop('_lazy_load_token', None)
+        if token is not None:
+            _current_tracker.reset(token)
@@ -0,0 +1,65 @@
+"""
+Phone number normalization for do2done application.
+
+Every phone number entered by a user or an admin goes through
+normalize_phone_number before it is stored or looked up, so the
+database only ever holds E.164 numbers (e.g. +15555551234).
+
+Ten digit numbers without a country code are taken as US numbers and
+normalized without loading `phonenumbers`; international numbers
+(starting with + or 00), other default regions and validation are
+handled by `phonenumbers`, which is only imported the first time it is
+needed. Results are cached per input.
+"""
+from functools import lru_cache
+from typing import Optional
+from flask import current_app, has_app_context
+
+DEFAULT_REGION = 'US'
+CACHE_SIZE = 4096
+
+
+def normalize_phone_number(raw: Optional[str], region: Optional[str] = None,
+                           validate: bool = False) -> Optional[str]:
+    """
+    Normalize a phone number to E.164
+
+    Args:
+        raw: Number as entered, e.g. '(555) 555-1234' or '+44 20 7946 0958'
+        region: Region for numbers without a country code; defaults to
+                PHONE_DEFAULT_REGION
+        validate: Also require the number to be assigned in its region,
+                  not just well formed
+
+    Returns:
+        The E.164 number, or None if it isn't a usable phone number
+    """
+    if not raw:
+        return None
+    if region is None:
+        region = current_app.config.get('PHONE_DEFAULT_REGION', DEFAULT_REGION) if has_app_context() \
+            else DEFAULT_REGION
+    return _normalize(raw.strip(), region.upper(), validate)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize(raw: str, region: str, validate: bool) -> Optional[str]:
+    international = raw.startswith(('+', '00'))
+    if not international and region == 'US' and not validate:
+        digits = ''.join(filter(str.isdigit, raw))
+        if len(digits) == 11 and digits.startswith('1'):
+            digits = digits[1:]
+        return f'+1{digits}' if len(digits) == 10 else None
+
+    import phonenumbers
+
+    if raw.startswith('00'):
+        raw = f'+{raw[2:]}'
+    try:
+        parsed = phonenumbers.parse(raw, None if international else region)
+    except phonenumbers.NumberParseException:
+        return None
+    usable = phonenumbers.is_valid_number(parsed) if validate else phonenumbers.is_possible_number(parsed)
+    if not usable:
+        return None
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
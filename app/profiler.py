@@ -0,0 +1,159 @@
+"""
+Profiling tools for do2done application.
+
+StackSampler takes periodic snapshots of every thread's stack from a
+sampling loop (signals would only ever interrupt the main thread) and
+counts identical stacks, which collapse_stacks turns into the "collapsed"
+format read by flamegraph.pl, speedscope and similar tools. By default
+only threads that are handling a request are sampled.
+
+profile_request runs one request through the test client under cProfile,
+for `flask cli profile-request`.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+# Frames that mark a thread as serving a request (WSGI, and ASGI async views)
+REQUEST_FRAMES = frozenset({
+    (os.path.join('flask', 'app.py'), 'wsgi_app'),
+    (os.path.join('app', 'asgi.py'), '_dispatch'),
+})
+
+# Code we want to see in profiles: views, services and templates
+APP_CODE_DIRS = (
+    os.path.join('app', 'routes') + os.sep,
+    os.path.join('app', 'services') + os.sep,
+    os.path.join('app', 'templates') + os.sep,
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STDLIB = sysconfig.get_paths()['stdlib']
+
+
+def frame_label(filename: str, name: str) -> str:
+    """Short, stable label for a frame: path relative to site-packages, the project or the stdlib"""
+    if 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    elif filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    elif filename.startswith(STDLIB):
+        filename = os.path.relpath(filename, STDLIB)
+    return f'{filename}:{name}'
+
+
+def _is_request_frame(code) -> bool:
+    return any(code.co_name == name and code.co_filename.endswith(path) for path, name in REQUEST_FRAMES)
+
+
+class StackSampler:
+    """Samples thread stacks at a fixed interval"""
+
+    def __init__(self, interval: float = 0.01, request_threads_only: bool = True):
+        """
+        Initialize sampler
+
+        Args:
+            interval: Seconds between samples
+            request_threads_only: Skip threads that aren't serving a request
+        """
+        self.interval = interval
+        self.request_threads_only = request_threads_only
+        self.stacks = Counter()
+        self.samples = 0
+
+    def sample_once(self) -> None:
+        """Record the current stack of every other thread"""
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            in_request = False
+            while frame is not None:
+                code = frame.f_code
+                in_request = in_request or _is_request_frame(code)
+                stack.append(frame_label(code.co_filename, getattr(code, 'co_qualname', code.co_name)))
+                frame = frame.f_back
+            if self.request_threads_only and not in_request:
+                continue
+            stack.append(names.get(ident, f'thread-{ident}'))
+            self.stacks[tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self, seconds: float) -> Counter:
+        """Sample for the given number of seconds; returns the stack counts"""
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while next_sample < deadline:
+            self.sample_once()
+            next_sample += self.interval
+            time.sleep(max(0.0, next_sample - time.monotonic()))
+        return self.stacks
+
+
+def collapse_stacks(stacks: Counter) -> str:
+    """Render stack counts in collapsed format: `root;caller;callee count` per line"""
+    lines = [f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}"
+             for stack, count in stacks.most_common()]
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+class FunctionStats(NamedTuple):
+    """cProfile figures for one function"""
+    label: str
+    calls: int
+    own_seconds: float
+    total_seconds: float
+
+
+def profile_request(client, method: str, path: str, data: Optional[dict] = None,
+                    repeat: int = 1) -> Tuple[pstats.Stats, List[int]]:
+    """
+    Run a request through a test client under cProfile
+
+    Args:
+        client: Flask test client (logged in as needed)
+        method: HTTP method
+        path: Path including any query string
+        data: Form data
+        repeat: Number of times to run the request
+
+    Returns:
+        The profile and the status code of each run
+    """
+    profiler = cProfile.Profile()
+    statuses = []
+    for _ in range(repeat):
+        profiler.enable()
+        response = client.open(path, method=method, data=data)
+        response.get_data()
+        profiler.disable()
+        statuses.append(response.status_code)
+    return pstats.Stats(profiler), statuses
+
+
+def hottest_functions(stats: pstats.Stats, limit: int = 25, sort: str = 'cumulative',
+                      code_dirs: Iterable[str] = APP_CODE_DIRS) -> List[FunctionStats]:
+    """
+    The most expensive functions in the given code directories
+
+    Args:
+        stats: Profile to read
+        limit: Number of functions to return
+        sort: 'cumulative' (including callees) or 'own' time
+        code_dirs: Path fragments of the files to include
+    """
+    rows = []
+    for (filename, lineno, name), (_, calls, own, total, _) in stats.stats.items():
+        if any(code_dir in filename for code_dir in code_dirs):
+            rows.append(FunctionStats(frame_label(filename, f'{name}:{lineno}'), calls, own, total))
+    key = (lambda row: row.own_seconds) if sort == 'own' else (lambda row: row.total_seconds)
+    return sorted(rows, key=key, reverse=True)[:limit]
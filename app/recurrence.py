@@ -0,0 +1,203 @@
+"""
+Recurrence rules for repeating tasks.
+
+Supports a subset of RFC 5545 RRULE: FREQ=DAILY|WEEKLY|MONTHLY with
+INTERVAL, BYDAY (weekly), BYMONTHDAY (monthly), COUNT and UNTIL, plus the
+shorthands 'daily', 'weekly' and 'monthly'. Occurrences are computed on
+demand; rules without COUNT jump straight to the requested window instead
+of stepping through every earlier occurrence.
+"""
+from itertools import count as count_from
+from typing import Iterator, List, Optional, Tuple
+from datetime import datetime, time, timedelta
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+SHORTHANDS = {'daily': 'FREQ=DAILY', 'weekly': 'FREQ=WEEKLY', 'monthly': 'FREQ=MONTHLY'}
+
+# Give up on a rule after this many periods in a row without an occurrence
+# (e.g. BYMONTHDAY=31 with an interval that only ever lands on short months)
+MAX_EMPTY_PERIODS = 400
+
+
+class RecurrenceError(ValueError):
+    """Raised for recurrence rules outside the supported RRULE subset"""
+    pass
+
+
+def _parse_until(value: str) -> datetime:
+    value = value.rstrip('Z')
+    try:
+        if 'T' in value:
+            return datetime.strptime(value, '%Y%m%dT%H%M%S')
+        # A date-only UNTIL includes that whole day
+        return datetime.combine(datetime.strptime(value, '%Y%m%d').date(), time.max)
+    except ValueError:
+        raise RecurrenceError(f'Invalid UNTIL: {value}')
+
+
+def _positive_int(name: str, value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise RecurrenceError(f'Invalid {name}: {value}')
+    if number < 1:
+        raise RecurrenceError(f'{name} must be positive')
+    return number
+
+
+class RecurrenceRule:
+    """A parsed recurrence rule"""
+
+    __slots__ = ('freq', 'interval', 'byday', 'bymonthday', 'count', 'until')
+
+    def __init__(self, freq: str, interval: int = 1, byday: Tuple[int, ...] = (),
+                 bymonthday: Optional[int] = None, count: Optional[int] = None,
+                 until: Optional[datetime] = None):
+        self.freq = freq
+        self.interval = interval
+        self.byday = byday
+        self.bymonthday = bymonthday
+        self.count = count
+        self.until = until
+
+    @classmethod
+    def parse(cls, text: str) -> 'RecurrenceRule':
+        """
+        Parse an RRULE string or shorthand
+
+        Args:
+            text: e.g. 'weekly' or 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH'
+
+        Returns:
+            RecurrenceRule instance
+
+        Raises:
+            RecurrenceError: If the rule is malformed or unsupported
+        """
+        text = (text or '').strip()
+        text = SHORTHANDS.get(text.lower(), text)
+        if text.upper().startswith('RRULE:'):
+            text = text[6:]
+
+        parts = {}
+        for part in filter(None, text.split(';')):
+            name, _, value = part.partition('=')
+            if not value:
+                raise RecurrenceError(f'Invalid rule part: {part}')
+            parts[name.strip().upper()] = value.strip().upper()
+
+        freq = parts.pop('FREQ', None)
+        if freq not in FREQUENCIES:
+            raise RecurrenceError(f'Unsupported FREQ: {freq}')
+
+        interval = _positive_int('INTERVAL', parts.pop('INTERVAL', '1'))
+        count = _positive_int('COUNT', parts.pop('COUNT')) if 'COUNT' in parts else None
+        until = _parse_until(parts.pop('UNTIL')) if 'UNTIL' in parts else None
+
+        byday = ()
+        if 'BYDAY' in parts:
+            if freq != 'WEEKLY':
+                raise RecurrenceError('BYDAY is only supported with FREQ=WEEKLY')
+            days = parts.pop('BYDAY').split(',')
+            if any(day not in WEEKDAYS for day in days):
+                raise RecurrenceError(f'Invalid BYDAY: {",".join(days)}')
+            byday = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+
+        bymonthday = None
+        if 'BYMONTHDAY' in parts:
+            if freq != 'MONTHLY':
+                raise RecurrenceError('BYMONTHDAY is only supported with FREQ=MONTHLY')
+            bymonthday = _positive_int('BYMONTHDAY', parts.pop('BYMONTHDAY'))
+            if bymonthday > 31:
+                raise RecurrenceError('BYMONTHDAY must be between 1 and 31')
+
+        if parts:
+            raise RecurrenceError(f'Unsupported rule parts: {", ".join(sorted(parts))}')
+
+        return cls(freq, interval, byday, bymonthday, count, until)
+
+    def __str__(self):
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.byday:
+            parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in self.byday))
+        if self.bymonthday:
+            parts.append(f'BYMONTHDAY={self.bymonthday}')
+        if self.count:
+            parts.append(f'COUNT={self.count}')
+        if self.until:
+            parts.append(f'UNTIL={self.until.strftime("%Y%m%dT%H%M%S")}')
+        return ';'.join(parts)
+
+    def __repr__(self):
+        return f'<RecurrenceRule {self}>'
+
+    def _first_period(self, dtstart: datetime, start: datetime) -> int:
+        """Index of the last period beginning at or before `start`"""
+        if start <= dtstart:
+            return 0
+        if self.freq == 'DAILY':
+            return (start - dtstart) // timedelta(days=self.interval)
+        if self.freq == 'WEEKLY':
+            anchor = dtstart - timedelta(days=dtstart.weekday())
+            return (start - anchor) // timedelta(weeks=self.interval)
+        months = (start.year - dtstart.year) * 12 + start.month - dtstart.month
+        return months // self.interval
+
+    def _period(self, dtstart: datetime, period: int) -> List[datetime]:
+        """Candidate occurrences of one period, in order"""
+        if self.freq == 'DAILY':
+            return [dtstart + timedelta(days=period * self.interval)]
+        if self.freq == 'WEEKLY':
+            week = dtstart - timedelta(days=dtstart.weekday()) + timedelta(weeks=period * self.interval)
+            return [week + timedelta(days=day) for day in self.byday or (dtstart.weekday(),)]
+        year, month = divmod(dtstart.year * 12 + dtstart.month - 1 + period * self.interval, 12)
+        try:
+            return [dtstart.replace(year=year, month=month + 1, day=self.bymonthday or dtstart.day)]
+        except ValueError:
+            # Months without that day are skipped, as in RFC 5545
+            return []
+
+    def occurrences(self, dtstart: datetime, start: datetime = None,
+                    end: datetime = None) -> Iterator[datetime]:
+        """
+        Generate occurrences of the rule
+
+        Args:
+            dtstart: Start of the series (the first candidate occurrence)
+            start: Only yield occurrences at or after this time
+            end: Stop before this time (required for open-ended rules
+                unless the caller stops iterating)
+
+        Yields:
+            Occurrence datetimes in order
+        """
+        # COUNT needs every earlier occurrence counted, so only jump without it
+        first = 0 if self.count or start is None else self._first_period(dtstart, start)
+        emitted = 0
+        empty = 0
+
+        for period in count_from(first):
+            candidates = self._period(dtstart, period)
+            empty = 0 if candidates else empty + 1
+            if empty > MAX_EMPTY_PERIODS:
+                return
+            for occurrence in candidates:
+                if occurrence < dtstart:
+                    continue
+                if self.until and occurrence > self.until:
+                    return
+                if self.count and emitted >= self.count:
+                    return
+                emitted += 1
+                if start and occurrence < start:
+                    continue
+                if end and occurrence >= end:
+                    return
+                yield occurrence
+
+    def after(self, dtstart: datetime, moment: datetime) -> Optional[datetime]:
+        """Get the first occurrence strictly after `moment`, or None if the rule has ended"""
+        return next(self.occurrences(dtstart, start=moment + timedelta(microseconds=1)), None)
@@ -0,0 +1,52 @@
+import hmac
+import threading
+import time
+from functools import wraps
+from flask import Blueprint, Response, abort, current_app, request
+from app.profiler import StackSampler, collapse_stacks
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+# One profile at a time per process; sampling is cheap but not free
+profile_lock = threading.Lock()
+
+def admin_required(view):
+    """Require `Authorization: Bearer <ADMIN_TOKEN>`; the endpoints don't exist without a token"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get('ADMIN_TOKEN')
+        if not token:
+            abort(404)
+        scheme, _, supplied = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(supplied.encode(), token.encode()):
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route('/profile')
+@admin_required
+def profile():
+    """
+    Sample request thread stacks and return them in collapsed format
+
+    Query args: seconds (default 10), hz (samples per second, default 100),
+    all=1 to include threads that aren't serving a request.
+    """
+    seconds = min(max(request.args.get('seconds', 10, type=float), 0.1),
+                  current_app.config.get('PROFILER_MAX_SECONDS', 60))
+    hz = min(max(request.args.get('hz', 100, type=int), 1), 1000)
+
+    if not profile_lock.acquire(blocking=False):
+        abort(409, description='A profile is already being taken')
+    try:
+        sampler = StackSampler(interval=1 / hz, request_threads_only=not request.args.get('all', type=int))
+        stacks = sampler.run(seconds)
+    finally:
+        profile_lock.release()
+
+    filename = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.collapsed"
+    return Response(collapse_stacks(stacks), mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename={filename}',
+        'X-Profile-Samples': str(sampler.samples),
+        'Cache-Control': 'no-store',
+    })
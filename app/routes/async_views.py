@@ -0,0 +1,184 @@
+"""
+Async versions of views, served natively by the ASGI app (app.asgi).
+
+Each view is registered under the endpoint of the Flask view it stands in
+for and behaves the same way, but awaits the asyncio engine and the async
+SMS client instead of blocking a worker thread. Requests a view doesn't
+handle (other methods, or when `handles` returns False) go to the Flask
+view as usual.
+
+Task writes stay on the Flask views: counters, recurrences, events and
+idempotency keys are all maintained through the sync session.
+"""
+import asyncio
+from datetime import datetime, time, timedelta
+from typing import Callable, FrozenSet, NamedTuple, Optional
+from flask import abort, current_app, flash, g, redirect, render_template, request, session, url_for
+from flask_login import login_user
+from flask_babel import _
+from sqlalchemy import select
+from app.errors import wants_json_response
+from app.models.users import User, VerificationCode
+from app.phone import normalize_phone_number
+from app.routes.tasks import calendar_json, calendar_per_day, calendar_range
+from app.routes.users import generate_verification_code
+from app.services.recurrence_service import RecurrenceService
+from app.services.sms_service import SMSService
+from app.services.task_service import TaskService
+
+
+class AsyncView(NamedTuple):
+    """An async view and the requests it serves"""
+    view: Callable
+    methods: FrozenSet[str]
+    handles: Optional[Callable[[], bool]] = None
+
+
+# Flask endpoint -> AsyncView
+async_views = {}
+
+
+def async_view(endpoint: str, methods=('GET',), handles: Optional[Callable[[], bool]] = None):
+    """
+    Register an async view for a Flask endpoint
+
+    Args:
+        endpoint: Endpoint of the Flask view, e.g. 'users.signup'
+        methods: HTTP methods served by the async view
+        handles: Optional check, run in the request context, that the
+                 async view should serve this request
+    """
+    def decorator(view):
+        async_views[endpoint] = AsyncView(view, frozenset(methods), handles)
+        return view
+    return decorator
+
+
+def get_async_session():
+    """Open a session on the ASGI app's asyncio engine"""
+    return current_app.extensions['asgi'].sessionmaker()
+
+
+async def load_current_user(db_session) -> Optional[User]:
+    """
+    Load the logged-in user without Flask-Login's blocking user loader
+
+    The user is stored where Flask-Login looks first, so `current_user`
+    (e.g. in templates) doesn't query again.
+    """
+    user_id = session.get('_user_id')
+    user = await db_session.get(User, int(user_id)) if user_id else None
+    g._login_user = user if user is not None else current_app.login_manager.anonymous_user()
+    return user
+
+
+@async_view('users.signup', methods=['POST'])
+async def signup():
+    first_name = request.form.get('first_name')
+    last_name = request.form.get('last_name')
+    formatted_number = normalize_phone_number(request.form.get('phone_number'))
+    password = request.form.get('password')
+
+    if not formatted_number:
+        flash(_('Invalid phone number'))
+        return redirect(url_for('users.signup'))
+
+    verification_code = generate_verification_code()
+
+    async with get_async_session() as db_session:
+        existing = await db_session.scalar(select(User.id).where(User.phone_number == formatted_number))
+        if existing:
+            flash('Phone number already registered')
+            return redirect(url_for('users.signup'))
+
+        user = User(
+            first_name=first_name,
+            last_name=last_name,
+            phone_number=formatted_number,
+            verification_code=verification_code,
+            verification_attempts=0,
+            verified=False
+        )
+        # Password hashing is CPU bound; keep it off the event loop
+        await asyncio.to_thread(user.set_password, password)
+        db_session.add(user)
+        db_session.add(VerificationCode(
+            phone_number=formatted_number,
+            code=verification_code,
+            created_at=datetime.now()
+        ))
+        await db_session.commit()
+
+    await SMSService().send_sms_async(
+        formatted_number, f'Your Do2Done verification code is: {verification_code}'
+    )
+
+    session['user_id'] = user.id
+    flash('Account created successfully. Please verify your phone number.')
+    return redirect(url_for('users.verify_phone'))
+
+
+@async_view('users.verify_phone', methods=['POST'])
+async def verify_phone():
+    if 'user_id' not in session:
+        return redirect(url_for('users.login'))
+
+    async with get_async_session() as db_session:
+        user = await db_session.get(User, session['user_id'])
+        if not user:
+            return redirect(url_for('users.login'))
+
+        code = request.form.get('code')
+
+        if not user.verification_code:
+            flash('No verification code was sent.')
+            return redirect(url_for('users.signup'))
+
+        # Check verification attempts
+        if user.verification_attempts >= 3:
+            if user.last_verification_attempt + timedelta(minutes=15) > datetime.now():
+                flash('Too many attempts. Please wait 15 minutes.')
+                return redirect(url_for('users.signup'))
+            user.verification_attempts = 0
+
+        # Verify code
+        if code == user.verification_code:
+            user.verified = True
+            user.verification_code = None
+            user.verification_attempts = 0
+            await db_session.commit()
+            login_user(user)
+            session.pop('user_id')
+            flash('Phone number verified successfully!')
+            return redirect(url_for('tasks.index'))
+
+        user.verification_attempts += 1
+        user.last_verification_attempt = datetime.now()
+        await db_session.commit()
+        # The page template reads current_user
+        await load_current_user(db_session)
+
+    flash('Invalid verification code.')
+    return render_template('verify_phone.html')
+
+
+@async_view('tasks.calendar', handles=wants_json_response)
+async def calendar():
+    async with get_async_session() as db_session:
+        user = await load_current_user(db_session)
+        if user is None:
+            return current_app.login_manager.unauthorized()
+
+        try:
+            start, end, month = calendar_range()
+        except ValueError:
+            abort(400)
+        per_day = calendar_per_day(month)
+
+        rows = await db_session.execute(TaskService.calendar_statement(user.id, start, end, per_day))
+        window_start, window_end = datetime.combine(start, time.min), datetime.combine(end, time.min)
+        recurrences = await db_session.execute(RecurrenceService.expand_statement(user.id, window_end))
+        occurrences = RecurrenceService.expand_rows(recurrences.all(), user.id, window_start, window_end)
+        days = TaskService.build_calendar(rows.all(), occurrences, per_day)
+
+    return calendar_json(start, end, days)
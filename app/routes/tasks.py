@@ -1,39 +1,295 @@
-from flask import Blueprint, render_template, request, redirect, url_for
+import csv
+import io
+import json
+import uuid
+from calendar import Calendar
+from datetime import date, datetime, timedelta
+from flask import Blueprint, Response, abort, current_app, flash, g, jsonify, render_template, \
+    request, redirect, stream_with_context, url_for
 from flask_login import login_required, current_user
+from markupsafe import Markup
 from app.models.tasks import Task
-from app import db
+from app.services.task_service import TaskService
+from app.services.auth_service import AuthService
+from app.services.archive_service import ArchiveService
+from app.events import format_sse
+from app.errors import wants_json_response
+from app.idempotency import idempotent
+from app.phone import normalize_phone_number
+from app import db, events, fragment_cache
+from flask_babel import _
 
 tasks_bp = Blueprint('tasks', __name__, url_prefix='/tasks')
 
+def wants_partial():
+    """Check if the client asked for an HTML fragment (htmx-style request)"""
+    return request.headers.get('HX-Request') == 'true'
+
+def task_response(task, event_type, status=200):
+    """
+    Respond to a task mutation
+
+    JSON and partial requests get just the changed task, so the client can
+    update the page without the redirect and full list re-query.
+    """
+    if wants_json_response():
+        data = task.to_dict() if event_type != 'deleted' else {'id': task.id}
+        return jsonify(event=event_type, task=data), status
+    if wants_partial():
+        if event_type == 'deleted':
+            return '', 200
+        return render_template('partials/task_item.html', task=task), status
+    return redirect(url_for('tasks.index'))
+
+def denied_response(status=403, message=None):
+    """Reject a task action: an error for JSON/partial requests, back to the list otherwise"""
+    if wants_json_response() or wants_partial():
+        abort(status)
+    if message:
+        flash(message)
+    return redirect(url_for('tasks.index'))
+
+# Longest range the calendar endpoint serves in one request
+MAX_CALENDAR_DAYS = 62
+
+def calendar_range():
+    """
+    Read the calendar date range from the query string
+
+    `month=YYYY-MM` selects a whole month; otherwise `start` and `end`
+    (inclusive, YYYY-MM-DD) default to the coming week.
+
+    Returns:
+        (start, end, month) with `end` exclusive and `month` the first of
+        the month for month views, else None
+
+    Raises:
+        ValueError: If a parameter is malformed or the range is too long
+    """
+    try:
+        month = request.args.get('month')
+        if month:
+            first = datetime.strptime(month, '%Y-%m').date()
+            next_month = (first + timedelta(days=31)).replace(day=1)
+            return first, next_month, first
+
+        start = request.args.get('start')
+        start = date.fromisoformat(start) if start else date.today()
+        end = request.args.get('end')
+        end = date.fromisoformat(end) if end else start + timedelta(days=6)
+        if end < start or (end - start).days >= MAX_CALENDAR_DAYS:
+            raise ValueError('Invalid calendar range')
+        return start, end + timedelta(days=1), None
+    except OverflowError:
+        # A range ending at or past the last representable date (9999-12-31)
+        raise ValueError('Invalid calendar range')
+
+def calendar_json(start, end, days):
+    """JSON body of the calendar view for a range with exclusive `end`"""
+    return jsonify(
+        start=start.isoformat(),
+        end=(end - timedelta(days=1)).isoformat(),
+        days=[{'date': day.day.isoformat(), 'total': day.total,
+               'tasks': [task.to_dict() for task in day.tasks]} for day in days]
+    )
+
+def calendar_per_day(month):
+    """Read the per-day task limit, with a smaller default for month grids"""
+    return min(max(request.args.get('per_day', 3 if month else 10, type=int), 1), 50)
+
+def user_from_form():
+    """Look up the user whose phone number was submitted with the form"""
+    phone_number = normalize_phone_number(request.form.get('phone_number'))
+    if not phone_number:
+        return None
+    return AuthService.get_user_by_phone(phone_number)
+
 @tasks_bp.route('/')
 @login_required
 def index():
-    tasks = Task.query.filter_by(owner_id=current_user.id).order_by(Task.created_at.desc()).all()
-    return render_template('index.html', tasks=tasks)
+    # The rendered task list is cached per user, locale and tasks version,
+    # so unchanged lists skip both the query and the per-task url_for calls
+    cache_key = fragment_cache.task_list_key(current_user.id, g.locale)
+    task_list_html = fragment_cache.get(cache_key)
+    if task_list_html is None:
+        tasks = TaskService.get_task_views(current_user.id, include_shared=True)
+        task_list_html = render_template('partials/task_list.html', tasks=tasks)
+        fragment_cache.set(cache_key, task_list_html)
+    if wants_partial():
+        return task_list_html
+    # A fresh key per rendered form turns double-submits into replays
+    return render_template('index.html', task_list_html=Markup(task_list_html),
+                           idempotency_key=uuid.uuid4().hex)
+
+@tasks_bp.route('/archive')
+@login_required
+def archive():
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    archived = ArchiveService.search_archived_tasks(
+        current_user.id, query=query, page=page,
+        per_page=current_app.config.get('ITEMS_PER_PAGE', 20)
+    )
+    return render_template('archive.html', archived=archived, query=query)
+
+@tasks_bp.route('/archive/export')
+@login_required
+def export_archive():
+    user_id = current_user.id
+    fields = ['id', 'title', 'description', 'priority_label', 'due_date', 'created_at',
+              'completed_at', 'archived_at']
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for archived in ArchiveService.iter_archived_tasks(user_id):
+            writer.writerow(archived.to_dict())
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    response = Response(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=archived-tasks.csv'
+    return response
+
+@tasks_bp.route('/calendar')
+@login_required
+def calendar():
+    try:
+        start, end, month = calendar_range()
+    except ValueError:
+        abort(400)
+    days = TaskService.get_calendar(current_user.id, start, end, per_day=calendar_per_day(month))
+
+    if wants_json_response():
+        return calendar_json(start, end, days)
+
+    days_by_date = {day.day: day for day in days}
+    if month:
+        return render_template(
+            'calendar.html', days=days_by_date, month=month,
+            weeks=Calendar().monthdatescalendar(month.year, month.month),
+            prev_month=(month - timedelta(days=1)).replace(day=1), next_month=end,
+            today=date.today()
+        )
+    dates = [start + timedelta(days=offset) for offset in range((end - start).days)]
+    return render_template('calendar.html', days=days_by_date, dates=dates, today=date.today())
+
+@tasks_bp.route('/export')
+@login_required
+def export_tasks():
+    user_id = current_user.id
+    now = datetime.now()
+
+    def generate():
+        # Serialized a chunk at a time against one reference time
+        for rows in TaskService.iter_task_rows(user_id, include_shared=True):
+            yield ''.join(json.dumps(task) + '\n' for task in TaskService.serialize_many(rows, now=now))
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename=tasks.jsonl'
+    return response
+
+@tasks_bp.route('/stream')
+@login_required
+def stream():
+    channel = TaskService.event_channel(current_user.id)
+    keepalive = current_app.config.get('EVENTS_KEEPALIVE_SECONDS', 15)
+
+    # Don't hold a pooled connection for the lifetime of the stream
+    db.session.close()
+
+    def generate():
+        with events.subscribe(channel) as subscription:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = subscription.get(timeout=keepalive)
+                if subscription.ended:
+                    # Events were missed; the browser reconnects and reloads the list
+                    return
+                if event is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield format_sse(event)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @tasks_bp.route('/add', methods=['POST'])
 @login_required
+@idempotent
 def add_task():
     task_title = request.form.get('task')
-    new_task = Task(title=task_title, owner_id=current_user.id)
-    db.session.add(new_task)
-    db.session.commit()
-    return redirect(url_for('tasks.index'))
+    due_date = request.form.get('due_date')
+    repeat = request.form.get('repeat')
+    try:
+        due_date = datetime.fromisoformat(due_date) if due_date else None
+        if repeat:
+            # `repeat` is a shorthand (daily, weekly, monthly) or RRULE text
+            task = TaskService.create_recurring_task(
+                title=task_title, owner_id=current_user.id, rule=repeat,
+                dtstart=due_date or datetime.combine(date.today(), datetime.min.time())
+            )
+            return task_response(task, 'created', 201)
+    except ValueError:
+        abort(400)
+    task = TaskService.create_task(title=task_title, owner_id=current_user.id, due_date=due_date)
+    return task_response(task, 'created', 201)
 
 @tasks_bp.route('/complete/<int:task_id>', methods=['POST'])
 @login_required
+@idempotent
 def complete_task(task_id):
     task = Task.query.get_or_404(task_id)
-    if task.owner_id == current_user.id:
-        task.completed = True
-        db.session.commit()
-    return redirect(url_for('tasks.index'))
+    if not TaskService.can_access_task(task, current_user.id):
+        return denied_response()
+    TaskService.complete_task(task)
+    return task_response(task, 'completed')
 
 @tasks_bp.route('/delete/<int:task_id>', methods=['POST'])
 @login_required
+@idempotent
 def delete_task(task_id):
     task = Task.query.get_or_404(task_id)
-    if task.owner_id == current_user.id:
-        db.session.delete(task)
-        db.session.commit()
-    return redirect(url_for('tasks.index'))
+    if not TaskService.is_task_owner(task, current_user.id):
+        return denied_response()
+    TaskService.delete_task(task)
+    return task_response(task, 'deleted')
+
+@tasks_bp.route('/share/<int:task_id>', methods=['POST'])
+@login_required
+@idempotent
+def share_task(task_id):
+    task = Task.query.get_or_404(task_id)
+    if not TaskService.is_task_owner(task, current_user.id):
+        return denied_response()
+
+    user = user_from_form()
+    if user is None:
+        return denied_response(404, _('No account found with that phone number.'))
+
+    TaskService.share_task(task, user.id)
+    return task_response(task, 'updated')
+
+@tasks_bp.route('/unshare/<int:task_id>', methods=['POST'])
+@login_required
+@idempotent
+def unshare_task(task_id):
+    task = Task.query.get_or_404(task_id)
+
+    # Owners remove someone else; everyone else can only leave the share
+    if TaskService.is_task_owner(task, current_user.id):
+        user = user_from_form()
+        if user is None:
+            return denied_response(404, _('No account found with that phone number.'))
+        TaskService.unshare_task(task, user.id)
+        return task_response(task, 'updated')
+
+    if not TaskService.unshare_task(task, current_user.id):
+        return denied_response()
+    return task_response(task, 'deleted')
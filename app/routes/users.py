@@ -1,10 +1,12 @@
 import random
-import phonenumbers
 from datetime import datetime, timedelta
 from flask import Blueprint, render_template, redirect, request, url_for, flash, session, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models.users import User, VerificationCode
-from app import db, client, TWILIO_PHONE_NUMBER
+from app import db
+from app.phone import normalize_phone_number
+from app.services.sms_service import SMSService
+from app.services.task_service import TaskService
 from flask_babel import _
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
@@ -26,31 +28,22 @@ def send_verification_sms(phone_number, verification_code=None):
     db.session.add(verification)
     db.session.commit()
     
-    # Send SMS
-    message = client.messages.create(
-        body=f'Your Do2Done verification code is: {verification_code}',
-        from_=TWILIO_PHONE_NUMBER,
-        to=phone_number
-    )
-    return message
+    # Send SMS; returns the message SID, or None if it wasn't sent
+    return SMSService().send_sms(phone_number, f'Your Do2Done verification code is: {verification_code}')
 
 @users_bp.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
         first_name = request.form.get('first_name')
         last_name = request.form.get('last_name')
-        phone = ''.join(filter(str.isdigit, request.form.get('phone_number')))
+        formatted_number = normalize_phone_number(request.form.get('phone_number'))
         password = request.form.get('password')
         
-        # Validate phone number is exactly 10 digits
-        if len(phone) != 10:
-            flash(_('Phone number must be 10 digits'))
+        if not formatted_number:
+            flash(_('Invalid phone number'))
             return redirect(url_for('users.signup'))
-            
-        # Format to E.164 for Twilio (+1 for US numbers)
-        formatted_number = f"+1{phone}"
         
-        if User.query.filter_by(phone_number=formatted_number).first():
+        if db.session.query(User.id).filter_by(phone_number=formatted_number).first():
             flash('Phone number already registered')
             return redirect(url_for('users.signup'))
         
@@ -82,8 +75,7 @@ def signup():
 @users_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
-        phone = ''.join(filter(str.isdigit, request.form.get('phone_number')))
-        formatted_number = f"+1{phone}" if len(phone) == 10 else None
+        formatted_number = normalize_phone_number(request.form.get('phone_number'))
         password = request.form.get('password')
         
         if not formatted_number:
@@ -150,8 +142,7 @@ def reset_password():
     if request.method == 'POST':
         # Handle phone number submission
         if 'phone_number' in request.form and 'code' not in request.form:
-            phone = ''.join(filter(str.isdigit, request.form.get('phone_number')))
-            formatted_number = f"+1{phone}" if len(phone) == 10 else None
+            formatted_number = normalize_phone_number(request.form.get('phone_number'))
 
             if not formatted_number:
                 flash('Invalid phone number')
@@ -196,6 +187,8 @@ def logout():
 @login_required
 def delete_account():
     user = current_user
+    # Tasks, counters and the rest go with the account (ON DELETE CASCADE)
+    TaskService.unshare_owned_tasks(user.id)
     db.session.delete(user)
     db.session.commit()
     logout_user()
@@ -223,8 +216,7 @@ def change_password():
 @users_bp.route('/recover-account', methods=['GET', 'POST'])
 def recover_account():
     if request.method == 'POST':
-        phone = ''.join(filter(str.isdigit, request.form.get('phone_number')))
-        formatted_number = f"+1{phone}" if len(phone) == 10 else None
+        formatted_number = normalize_phone_number(request.form.get('phone_number'))
         
         if not formatted_number:
             flash('Invalid phone number')
@@ -281,16 +273,14 @@ def profile():
 @login_required
 def edit_profile():
     if request.method == 'POST':
-        phone = ''.join(filter(str.isdigit, request.form.get('phone_number')))
+        formatted_number = normalize_phone_number(request.form.get('phone_number'))
         
-        if len(phone) != 10:
-            flash('Phone number must be 10 digits')
+        if not formatted_number:
+            flash('Invalid phone number')
             return redirect(url_for('users.edit_profile'))
-            
-        formatted_number = f"+1{phone}"
         
         # Check if phone number is already in use by another user
-        existing_user = User.query.filter(
+        existing_user = db.session.query(User.id).filter(
             User.phone_number == formatted_number,
             User.id != current_user.id
         ).first()
@@ -0,0 +1,137 @@
+"""
+Task archival service.
+
+Moves long-completed tasks out of the hot task table into task_archive,
+where they remain searchable and exportable.
+"""
+from collections import Counter
+from typing import Callable, Iterator, Optional
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, literal, select
+from app import db, events, fragment_cache
+from app.models.tasks import Task, TaskArchive, task_shares
+from app.services.counter_service import CounterService
+from app.services.task_service import TaskService
+
+
+class ArchiveService:
+    """Service for archived task operations"""
+
+    @staticmethod
+    def archive_completed_tasks(older_than_days: int, batch_size: int = 1000,
+                                progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Move tasks completed more than N days ago into the archive
+
+        Each batch is copied, removed from the task table and committed in
+        its own transaction, so the job can be interrupted and resumed.
+
+        Args:
+            older_than_days: Archive tasks completed at least this many days ago
+            batch_size: Number of tasks to move per transaction
+            progress: Optional callback receiving the running total after each batch
+
+        Returns:
+            Number of tasks archived
+        """
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        # Tasks completed before completed_at existed fall back to updated_at
+        completed_at = func.coalesce(Task.completed_at, Task.updated_at)
+        total = 0
+
+        while True:
+            rows = db.session.execute(
+                select(Task.id, Task.owner_id)
+                # Tasks completed before the cutoff were also created before it;
+                # the created_at bound lets a partitioned table skip newer partitions
+                .where(Task.completed == True, completed_at < cutoff, Task.created_at < cutoff)
+                .order_by(Task.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            task_ids = [row.id for row in rows]
+            # Sharees lose the task too; their cached lists still show it
+            shares = db.session.execute(
+                select(task_shares.c.task_id, task_shares.c.user_id).where(task_shares.c.task_id.in_(task_ids))
+            ).all()
+            archived_at = literal(datetime.now(), type_=db.DateTime)
+            db.session.execute(
+                insert(TaskArchive).from_select(
+                    ['id', 'title', 'description', 'priority', 'due_date', 'created_at',
+                     'updated_at', 'completed_at', 'archived_at', 'owner_id'],
+                    select(Task.id, Task.title, Task.description, Task.priority, Task.due_date,
+                           Task.created_at, Task.updated_at, completed_at, archived_at,
+                           Task.owner_id)
+                    .where(Task.id.in_(task_ids))
+                )
+            )
+            db.session.execute(task_shares.delete().where(task_shares.c.task_id.in_(task_ids)))
+            db.session.execute(
+                delete(Task).where(Task.id.in_(task_ids)).execution_options(synchronize_session=False)
+            )
+            archived_per_owner = Counter(row.owner_id for row in rows)
+            for owner_id, count in archived_per_owner.items():
+                CounterService.adjust(owner_id, total=-count, completed=-count)
+            db.session.commit()
+
+            for owner_id in archived_per_owner:
+                fragment_cache.bump_tasks_version(owner_id)
+            for user_id in {share.user_id for share in shares}:
+                fragment_cache.bump_tasks_version(user_id)
+            for share in shares:
+                events.publish(TaskService.event_channel(share.user_id), 'deleted', {'id': share.task_id})
+
+            total += len(task_ids)
+            if progress:
+                progress(total)
+
+        return total
+
+    @staticmethod
+    def search_archived_tasks(user_id: int, query: str = None, page: int = 1,
+                              per_page: int = 20):
+        """
+        Search a user's archived tasks by title
+
+        Args:
+            user_id: User ID
+            query: Optional case-insensitive title substring
+            page: Page number (1-based)
+            per_page: Results per page
+
+        Returns:
+            Pagination of TaskArchive instances, most recently completed first
+        """
+        statement = select(TaskArchive).where(TaskArchive.owner_id == user_id)
+        if query:
+            statement = statement.where(TaskArchive.title.icontains(query, autoescape=True))
+        statement = statement.order_by(TaskArchive.completed_at.desc())
+        return db.paginate(statement, page=page, per_page=per_page, error_out=False)
+
+    @staticmethod
+    def iter_archived_tasks(user_id: int, chunk_size: int = 1000) -> Iterator[TaskArchive]:
+        """
+        Stream every archived task for a user without loading them all at once
+
+        Args:
+            user_id: User ID
+            chunk_size: Number of rows fetched per round trip
+
+        Yields:
+            TaskArchive instances, oldest completion first
+        """
+        statement = select(TaskArchive) \
+            .where(TaskArchive.owner_id == user_id) \
+            .order_by(TaskArchive.completed_at.asc()) \
+            .execution_options(yield_per=chunk_size)
+        for archived in db.session.scalars(statement):
+            yield archived
+
+    @staticmethod
+    def count_archived_tasks(user_id: int) -> int:
+        """Count a user's archived tasks"""
+        return db.session.scalar(
+            select(func.count()).select_from(TaskArchive).where(TaskArchive.owner_id == user_id)
+        )
@@ -7,8 +7,10 @@ from typing import Optional, Tuple
 from flask import current_app
 from app import db
 from app.models.users import User, VerificationCode
+from app.tracing import trace_methods
 
 
+@trace_methods
 class AuthService:
     """Service for authentication operations"""
 
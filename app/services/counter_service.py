@@ -0,0 +1,195 @@
+"""
+Denormalized per-user task counters.
+
+Counters are adjusted inside the caller's transaction on every task
+write, so reading stats is a primary key lookup instead of a COUNT over
+the task table. `flask cli reconcile-counters` recomputes them in bulk.
+"""
+from typing import Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models.tasks import Task, UserTaskCounters
+from app.models.users import User
+
+
+class CounterService:
+    """Service for per-user task counters"""
+
+    @staticmethod
+    def count_tasks(user_ids: List[int]) -> Dict[int, dict]:
+        """
+        Count tasks for a set of users straight from the task table
+
+        Args:
+            user_ids: User IDs to count
+
+        Returns:
+            Dict mapping user ID to {'total': int, 'completed': int}
+        """
+        rows = db.session.execute(
+            select(
+                Task.owner_id,
+                func.count(Task.id),
+                func.coalesce(func.sum(case((Task.completed == True, 1), else_=0)), 0)
+            )
+            .where(Task.owner_id.in_(user_ids))
+            .group_by(Task.owner_id)
+        ).all()
+        counts = {user_id: {'total': 0, 'completed': 0} for user_id in user_ids}
+        for owner_id, total, completed in rows:
+            counts[owner_id] = {'total': total, 'completed': completed}
+        return counts
+
+    @staticmethod
+    def _create_counters(user_id: int) -> bool:
+        """
+        Create a user's counter row from an exact count
+
+        Returns:
+            False if a concurrent transaction created the row first
+        """
+        counts = CounterService.count_tasks([user_id])[user_id]
+        dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+        result = db.session.execute(
+            dialect.insert(UserTaskCounters)
+            .values(
+                user_id=user_id,
+                total=counts['total'],
+                completed=counts['completed'],
+                pending=counts['total'] - counts['completed'],
+                overdue=0,
+                overdue_as_of=None
+            )
+            .on_conflict_do_nothing(index_elements=['user_id'])
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def adjust(user_id: int, total: int = 0, completed: int = 0) -> None:
+        """
+        Apply counter deltas inside the current transaction
+
+        The caller commits. Pending task changes are flushed first, so a
+        missing counter row is created from a count that already
+        includes them.
+
+        Args:
+            user_id: Owner whose counters change
+            total: Change in total task count
+            completed: Change in completed task count
+        """
+        db.session.flush()
+        statement = (
+            update(UserTaskCounters)
+            .where(UserTaskCounters.user_id == user_id)
+            .values(
+                total=UserTaskCounters.total + total,
+                completed=UserTaskCounters.completed + completed,
+                pending=UserTaskCounters.pending + (total - completed),
+                overdue_as_of=None
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if db.session.execute(statement).rowcount == 0 and not CounterService._create_counters(user_id):
+            # A concurrent write created the row from a count without our change
+            db.session.execute(statement)
+
+    @staticmethod
+    def get_counters(user_id: int) -> UserTaskCounters:
+        """
+        Get a user's counters with a fresh overdue snapshot
+
+        A missing row and a refreshed snapshot are flushed, not committed:
+        they are saved with the caller's transaction, and a read-only
+        request simply recomputes them next time.
+
+        Returns:
+            UserTaskCounters instance
+        """
+        counters = db.session.get(UserTaskCounters, user_id, populate_existing=True)
+        if counters is None:
+            CounterService._create_counters(user_id)
+            counters = db.session.get(UserTaskCounters, user_id, populate_existing=True)
+
+        ttl = current_app.config.get('TASK_COUNTERS_OVERDUE_TTL', 60)
+        now = datetime.now()
+        if counters.overdue_as_of is None or now - counters.overdue_as_of > timedelta(seconds=ttl):
+            # Range scan over ix_task_owner_pending (pending tasks only)
+            counters.overdue = db.session.scalar(
+                select(func.count(Task.id)).where(
+                    Task.owner_id == user_id,
+                    Task.completed == False,
+                    Task.due_date < now
+                )
+            )
+            counters.overdue_as_of = now
+            db.session.flush()
+        return counters
+
+    @staticmethod
+    def reconcile(batch_size: int = 1000, fix: bool = True,
+                  progress: Optional[Callable[[int], None]] = None) -> List[dict]:
+        """
+        Recompute every user's counters in bulk and report drift
+
+        Args:
+            batch_size: Number of users counted per query
+            fix: Whether to overwrite drifted counters
+            progress: Optional callback receiving the number of users checked
+
+        Returns:
+            List of dicts describing drifted users (user_id, expected, actual)
+        """
+        drift = []
+        checked = 0
+        last_id = 0
+
+        while True:
+            user_ids = db.session.scalars(
+                select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size)
+            ).all()
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            expected = CounterService.count_tasks(user_ids)
+            stored = {
+                counters.user_id: counters
+                for counters in db.session.scalars(
+                    select(UserTaskCounters).where(UserTaskCounters.user_id.in_(user_ids))
+                )
+            }
+
+            for user_id in user_ids:
+                counts = expected[user_id]
+                counts['pending'] = counts['total'] - counts['completed']
+                counters = stored.get(user_id)
+                actual = None if counters is None else {
+                    'total': counters.total,
+                    'completed': counters.completed,
+                    'pending': counters.pending
+                }
+                # No row is only drift if the user has tasks; adjust() creates it on the first write
+                if actual == counts or (actual is None and counts['total'] == 0):
+                    continue
+
+                drift.append({'user_id': user_id, 'expected': counts, 'actual': actual})
+                if fix:
+                    if counters is None:
+                        counters = UserTaskCounters(user_id=user_id, overdue=0)
+                        db.session.add(counters)
+                    counters.total = counts['total']
+                    counters.completed = counts['completed']
+                    counters.pending = counts['pending']
+                    counters.overdue_as_of = None
+
+            if fix:
+                db.session.commit()
+            checked += len(user_ids)
+            if progress:
+                progress(checked)
+
+        return drift
@@ -0,0 +1,150 @@
+"""
+Task table partition maintenance (PostgreSQL only).
+
+When the task table has been converted to monthly range partitions on
+created_at (migration b7e3f1a2c5d8 with TASK_PARTITIONING enabled), these
+helpers create future partitions ahead of time and detach old ones.
+Other databases keep a single unpartitioned table and every call is a no-op.
+"""
+import re
+from typing import List
+from datetime import date, datetime
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from app import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME_PATTERN = re.compile(r'^task_p(\d{4})_(\d{2})$')
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(value: date, months: int) -> date:
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+class PartitionService:
+    """Service for task table partition maintenance"""
+
+    @staticmethod
+    def is_partitioned() -> bool:
+        """Check if the task table is a partitioned PostgreSQL table"""
+        if db.engine.dialect.name != 'postgresql':
+            return False
+        return db.session.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'task')"
+        )).scalar()
+
+    @staticmethod
+    def partition_name(month: date) -> str:
+        """Get the partition table name for a month"""
+        return f'task_p{month.year:04d}_{month.month:02d}'
+
+    @staticmethod
+    def list_partitions() -> List[dict]:
+        """
+        List the partitions of the task table
+
+        Returns:
+            List of dicts with name, bounds and estimated row count
+        """
+        if not PartitionService.is_partitioned():
+            return []
+
+        rows = db.session.execute(text(
+            "SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bounds, "
+            "GREATEST(c.reltuples, 0)::bigint AS estimated_rows "
+            "FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'task' ORDER BY c.relname"
+        )).mappings().all()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def create_partitions(months_ahead: int = 3) -> List[str]:
+        """
+        Create monthly partitions from the current month up to N months ahead
+
+        Args:
+            months_ahead: Number of future months to cover
+
+        Returns:
+            Names of partitions that were created
+        """
+        if not PartitionService.is_partitioned():
+            return []
+
+        existing = {partition['name'] for partition in PartitionService.list_partitions()}
+        current = _month_start(datetime.now().date())
+        created = []
+
+        for offset in range(months_ahead + 1):
+            start = _add_months(current, offset)
+            name = PartitionService.partition_name(start)
+            if name in existing:
+                continue
+            try:
+                db.session.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF task "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{_add_months(start, 1).isoformat()}')"
+                ))
+                db.session.commit()
+                created.append(name)
+            except DBAPIError as e:
+                # Usually rows for this month already landed in the default partition
+                db.session.rollback()
+                logger.error(f"Failed to create partition {name}: {str(e)}")
+
+        return created
+
+    @staticmethod
+    def detach_partitions(older_than_months: int = 12, drop: bool = False) -> List[str]:
+        """
+        Detach monthly partitions that ended more than N months ago
+
+        Only empty partitions are detached: rows still in a partition are
+        live tasks, with shares and counters pointing at them, so run
+        `archive-tasks` first and pending tasks keep their partition.
+        Detached partitions are kept as standalone tables unless `drop` is set.
+
+        Args:
+            older_than_months: Detach partitions older than this many months
+            drop: Drop detached partitions instead of keeping them
+
+        Returns:
+            Names of partitions that were detached
+        """
+        if not PartitionService.is_partitioned():
+            return []
+
+        cutoff = _add_months(_month_start(datetime.now().date()), -older_than_months)
+        detached = []
+
+        for partition in PartitionService.list_partitions():
+            match = PARTITION_NAME_PATTERN.match(partition['name'])
+            if not match:
+                continue
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if _add_months(month, 1) > cutoff:
+                continue
+
+            name = partition['name']
+            remaining = db.session.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+            if remaining:
+                logger.warning(f"Skipping partition {name}: {remaining} tasks not archived")
+                continue
+
+            db.session.execute(text(f"ALTER TABLE task DETACH PARTITION {name}"))
+            if drop:
+                db.session.execute(text(f"DROP TABLE {name}"))
+            db.session.commit()
+            detached.append(name)
+
+        return detached
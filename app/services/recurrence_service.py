@@ -0,0 +1,230 @@
+"""
+Recurring task service.
+
+A series keeps exactly one pending occurrence as a Task row. Completing
+it creates the next one (un-completing it takes that one back), and later
+occurrences are only computed (never stored) when a date range is viewed.
+"""
+from typing import Callable, List, Optional
+from datetime import datetime
+from sqlalchemy import exists, select, update
+from app import db
+from app.models.tasks import DueTaskView, Task, TaskRecurrence, task_shares
+from app.recurrence import RecurrenceError, RecurrenceRule
+from app.services.counter_service import CounterService
+
+
+class RecurrenceService:
+    """Service for recurring task series"""
+
+    @staticmethod
+    def create_series(title: str, owner_id: int, rule: str, dtstart: datetime,
+                      description: str = None, priority: int = 2) -> TaskRecurrence:
+        """
+        Add a recurring series to the session (the caller creates its first occurrence)
+
+        Args:
+            title: Task title
+            owner_id: ID of the task owner
+            rule: RRULE text or shorthand ('daily', 'weekly', 'monthly')
+            dtstart: Start of the series
+            description: Optional task description
+            priority: Task priority (1=Low, 2=Medium, 3=High)
+
+        Returns:
+            TaskRecurrence instance whose next_due_at is the first occurrence
+
+        Raises:
+            RecurrenceError: If the rule is invalid or never occurs
+        """
+        parsed = RecurrenceRule.parse(rule)
+        first = next(parsed.occurrences(dtstart), None)
+        if first is None:
+            raise RecurrenceError('Rule has no occurrences')
+
+        recurrence = TaskRecurrence(
+            title=title,
+            owner_id=owner_id,
+            description=description,
+            priority=priority,
+            rule=str(parsed),
+            dtstart=dtstart,
+            next_due_at=first
+        )
+        db.session.add(recurrence)
+        db.session.flush()
+        return recurrence
+
+    @staticmethod
+    def has_pending_occurrence(recurrence_id: int) -> bool:
+        """Check if a series already has an uncompleted occurrence"""
+        return db.session.query(
+            exists().where(Task.recurrence_id == recurrence_id, Task.completed == False)
+        ).scalar()
+
+    @staticmethod
+    def materialize_next(recurrence: TaskRecurrence) -> Optional[Task]:
+        """
+        Create the next occurrence of a series inside the current transaction
+
+        Does nothing if the rule has ended or an occurrence is still pending.
+        The caller commits and notifies.
+
+        Returns:
+            The new Task, or None
+        """
+        if recurrence.next_due_at is None or RecurrenceService.has_pending_occurrence(recurrence.id):
+            return None
+
+        task = Task(
+            title=recurrence.title,
+            owner_id=recurrence.owner_id,
+            description=recurrence.description,
+            due_date=recurrence.next_due_at,
+            priority=recurrence.priority,
+            completed=False,
+            recurrence_id=recurrence.id
+        )
+        db.session.add(task)
+        CounterService.adjust(recurrence.owner_id, total=1)
+
+        rule = RecurrenceRule.parse(recurrence.rule)
+        recurrence.next_due_at = rule.after(recurrence.dtstart, recurrence.next_due_at)
+        return task
+
+    @staticmethod
+    def unmaterialize_next(recurrence: TaskRecurrence, task: Task) -> Optional[int]:
+        """
+        Undo materialize_next after `task` was un-completed, inside the current transaction
+
+        Deletes the occurrence that completing `task` created and rewinds
+        next_due_at to it, so the series is back to one pending occurrence.
+        An occurrence that has since been edited, shared or completed is
+        kept. The caller commits and notifies.
+
+        Returns:
+            ID of the deleted Task, or None
+        """
+        if task.due_date is None:
+            return None
+        rule = RecurrenceRule.parse(recurrence.rule)
+        next_task = db.session.scalars(
+            select(Task).where(
+                Task.recurrence_id == recurrence.id,
+                Task.completed == False,
+                Task.id != task.id,
+                Task.due_date == rule.after(recurrence.dtstart, task.due_date)
+            )
+        ).first()
+        if next_task is None:
+            return None
+        edited = (next_task.title, next_task.description, next_task.priority) != \
+            (recurrence.title, recurrence.description, recurrence.priority)
+        shared = db.session.query(exists().where(task_shares.c.task_id == next_task.id)).scalar()
+        if edited or shared:
+            return None
+
+        next_task_id = next_task.id
+        recurrence.next_due_at = next_task.due_date
+        db.session.delete(next_task)
+        CounterService.adjust(recurrence.owner_id, total=-1)
+        return next_task_id
+
+    @staticmethod
+    def materialize_completed(batch_size: int = 500,
+                              progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Create next occurrences for every series without a pending one
+
+        Catches up series whose occurrence was completed outside
+        TaskService.complete_task (or whose rule was just created). Each
+        batch is committed in its own transaction.
+
+        Args:
+            batch_size: Number of series handled per transaction
+            progress: Optional callback receiving the running total after each batch
+
+        Returns:
+            Number of occurrences created
+        """
+        from app.services.task_service import TaskService
+
+        pending = exists().where(Task.recurrence_id == TaskRecurrence.id, Task.completed == False)
+        total = 0
+        last_id = 0
+
+        while True:
+            recurrences = db.session.scalars(
+                select(TaskRecurrence)
+                .where(TaskRecurrence.id > last_id, TaskRecurrence.next_due_at.isnot(None), ~pending)
+                .order_by(TaskRecurrence.id)
+                .limit(batch_size)
+            ).all()
+            if not recurrences:
+                break
+            last_id = recurrences[-1].id
+
+            created = [task for task in map(RecurrenceService.materialize_next, recurrences) if task]
+            db.session.commit()
+            for task in created:
+                TaskService._task_changed([task.owner_id], 'created', task.to_dict())
+
+            total += len(created)
+            if progress:
+                progress(total)
+
+        return total
+
+    @staticmethod
+    def expand(user_id: int, start: datetime, end: datetime) -> List[DueTaskView]:
+        """
+        Compute a user's upcoming occurrences in a window without storing them
+
+        Only occurrences after each series' pending Task are included, so
+        nothing is listed twice.
+
+        Args:
+            user_id: Owner ID
+            start: Start of the window
+            end: End of the window (exclusive)
+
+        Returns:
+            DueTaskView rows with id None, in no particular order
+        """
+        recurrences = db.session.execute(RecurrenceService.expand_statement(user_id, end)).all()
+        return RecurrenceService.expand_rows(recurrences, user_id, start, end)
+
+    @staticmethod
+    def expand_statement(user_id: int, end: datetime):
+        """Build the query for a user's series with occurrences before `end`"""
+        return (
+            select(TaskRecurrence.id, TaskRecurrence.title, TaskRecurrence.priority,
+                   TaskRecurrence.rule, TaskRecurrence.dtstart, TaskRecurrence.next_due_at)
+            .where(TaskRecurrence.owner_id == user_id,
+                   TaskRecurrence.next_due_at.isnot(None),
+                   TaskRecurrence.next_due_at < end)
+        )
+
+    @staticmethod
+    def expand_rows(recurrences, user_id: int, start: datetime, end: datetime) -> List[DueTaskView]:
+        """Compute the occurrences of expand_statement rows inside a window"""
+        occurrences = []
+        for recurrence in recurrences:
+            rule = RecurrenceRule.parse(recurrence.rule)
+            # Occurrences before next_due_at already exist as Task rows
+            window_start = max(start, recurrence.next_due_at)
+            for due_date in rule.occurrences(recurrence.dtstart, window_start, end):
+                occurrences.append(DueTaskView(None, recurrence.title, False, recurrence.priority,
+                                               due_date, user_id, recurrence.id))
+        return occurrences
+
+    @staticmethod
+    def stop_series(recurrence_id: int) -> None:
+        """End a series inside the current transaction, keeping its past occurrences"""
+        db.session.execute(
+            update(Task).where(Task.recurrence_id == recurrence_id).values(recurrence_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            TaskRecurrence.__table__.delete().where(TaskRecurrence.id == recurrence_id)
+        )
@@ -1,27 +1,35 @@
 """
-SMS notification service using Twilio.
+SMS notification service.
+
+Messages go out through the providers configured in SMS_PROVIDERS (see
+app.sms_providers), with failover between them.
 """
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
 from flask import current_app
+from app.sms_providers import SMSProviders, SMSResult
+from app.tracing import SPAN_KIND_CLIENT, current_span, traced
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class SMSService:
-    """Service for sending SMS notifications via Twilio"""
+    """Service for sending SMS notifications"""
 
-    def __init__(self, client=None, from_number=None):
+    def __init__(self, providers: Optional[SMSProviders] = None):
         """
         Initialize SMS service
 
         Args:
-            client: Twilio client instance (optional, uses app config if not provided)
-            from_number: Twilio phone number (optional, uses app config if not provided)
+            providers: SMSProviders to send through (optional, uses the app's if not provided)
         """
-        self.client = client
-        self.from_number = from_number
+        self.providers = providers
+
+    def _get_providers(self) -> SMSProviders:
+        return self.providers or current_app.extensions['sms_providers']
 
+    @traced('SMSService.send_sms', kind=SPAN_KIND_CLIENT)
     def send_sms(self, to_number: str, message: str) -> Optional[str]:
         """
         Send an SMS message
@@ -33,26 +41,82 @@ class SMSService:
         Returns:
             Message SID if successful, None if failed
         """
-        # Check if Twilio is enabled
-        if not current_app.config.get('TWILIO_ENABLED', False):
-            logger.warning("Twilio is not enabled. SMS not sent.")
+        providers = self._get_providers()
+        if not providers.enabled:
+            logger.warning("No SMS provider is configured. SMS not sent.")
             return None
 
-        try:
-            from app import client, TWILIO_PHONE_NUMBER
+        result = providers.send(to_number, message)
+        span = current_span()
+        if span is not None:
+            span.set_attribute('sms.provider', result.provider)
+            span.set_attribute('sms.ok', result.ok)
+        if result.ok:
+            logger.info(f"SMS sent successfully to {to_number} via {result.provider}. SID: {result.sid}")
+        else:
+            logger.error(f"Failed to send SMS to {to_number}: {result.error}")
+        return result.sid
 
-            message_obj = client.messages.create(
-                body=message,
-                from_=TWILIO_PHONE_NUMBER,
-                to=to_number
-            )
-            logger.info(f"SMS sent successfully to {to_number}. SID: {message_obj.sid}")
-            return message_obj.sid
+    @traced('SMSService.send_sms_async', kind=SPAN_KIND_CLIENT)
+    async def send_sms_async(self, to_number: str, message: str) -> Optional[str]:
+        """
+        Send an SMS message without blocking the event loop
 
-        except Exception as e:
-            logger.error(f"Failed to send SMS to {to_number}: {str(e)}")
+        Args:
+            to_number: Recipient phone number in E.164 format
+            message: Message text to send
+
+        Returns:
+            Message SID if successful, None if failed
+        """
+        providers = self._get_providers()
+        if not providers.enabled:
+            logger.warning("No SMS provider is configured. SMS not sent.")
             return None
 
+        result = await providers.send_async(to_number, message)
+        span = current_span()
+        if span is not None:
+            span.set_attribute('sms.provider', result.provider)
+            span.set_attribute('sms.ok', result.ok)
+        if result.ok:
+            logger.info(f"SMS sent successfully to {to_number} via {result.provider}. SID: {result.sid}")
+        else:
+            logger.error(f"Failed to send SMS to {to_number}: {result.error}")
+        return result.sid
+
+    def send_batch(self, messages: Iterable[Tuple[str, str]],
+                   concurrency: Optional[int] = None) -> List[SMSResult]:
+        """
+        Send many messages concurrently over pooled keep-alive connections
+
+        Sends are spread over `concurrency` threads. Each provider's rate
+        limit and circuit breaker are shared across batches, so a provider
+        that fails or slows down mid-batch is skipped in favour of the next.
+
+        Args:
+            messages: (phone number in E.164 format, message text) pairs
+            concurrency: Maximum parallel sends (defaults to SMS_BATCH_CONCURRENCY)
+
+        Returns:
+            One SMSResult per message, in input order
+        """
+        messages = list(messages)
+        providers = self._get_providers()
+        if not providers.enabled:
+            logger.warning(f"No SMS provider is configured. Batch of {len(messages)} SMS not sent.")
+            return [SMSResult(to_number, error='No SMS provider is configured') for to_number, _ in messages]
+        if not messages:
+            return []
+
+        concurrency = min(concurrency or current_app.config.get('SMS_BATCH_CONCURRENCY', 8), len(messages))
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='sms') as pool:
+            results = list(pool.map(lambda message: providers.send(*message), messages))
+
+        failed = sum(1 for result in results if not result.ok)
+        logger.info(f"SMS batch sent: {len(results) - failed} accepted, {failed} failed")
+        return results
+
     def send_verification_code(self, phone_number: str, code: str) -> bool:
         """
         Send a verification code via SMS
@@ -68,6 +132,21 @@ class SMSService:
         sid = self.send_sms(phone_number, message)
         return sid is not None
 
+    async def send_verification_code_async(self, phone_number: str, code: str) -> bool:
+        """
+        Send a verification code via SMS from async views
+
+        Args:
+            phone_number: Recipient phone number
+            code: Verification code to send
+
+        Returns:
+            True if successful, False otherwise
+        """
+        message = f"Your do2done verification code is: {code}"
+        sid = await self.send_sms_async(phone_number, message)
+        return sid is not None
+
     def send_task_reminder(self, phone_number: str, task_title: str, due_date: str = None) -> bool:
         """
         Send a task reminder via SMS
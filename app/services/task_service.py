@@ -1,15 +1,68 @@
 """
 Task management service.
 """
-from typing import List, Optional
-from datetime import datetime
-from app import db
-from app.models.tasks import Task
+from typing import Iterable, Iterator, List, Optional, Sequence
+from datetime import date, datetime, time
+from sqlalchemy import exists, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from app import db, events, fragment_cache
+from app.models.tasks import PRIORITY_LABELS, CalendarDay, DueTaskView, Task, TaskRecurrence, TaskView, \
+    task_shares
+from app.services.counter_service import CounterService
+from app.services.recurrence_service import RecurrenceService
+from app.tracing import trace_methods
 
+# Column order of the row tuples consumed by TaskService.serialize_many
+SERIALIZED_COLUMNS = (Task.id, Task.title, Task.description, Task.completed, Task.completed_at,
+                      Task.priority, Task.due_date, Task.created_at, Task.updated_at, Task.owner_id,
+                      Task.recurrence_id)
 
+# Columns loaded into TaskView for the task list
+TASK_VIEW_COLUMNS = (Task.id, Task.title, Task.completed, Task.owner_id)
+
+_numpy = None
+
+
+def _get_numpy():
+    """Import NumPy on first use; None when it is not installed"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def _isoformat_column(values: Sequence[Optional[datetime]]) -> List[Optional[str]]:
+    return [value.isoformat() if value is not None else None for value in values]
+
+
+@trace_methods
 class TaskService:
     """Service for task operations"""
 
+    @staticmethod
+    def event_channel(user_id: int) -> str:
+        """Get the event channel name for a user's task changes"""
+        return f'tasks:{user_id}'
+
+    @staticmethod
+    def get_task_audience(task: Task) -> List[int]:
+        """Get IDs of every user who can see a task (owner first, then sharees)"""
+        shared_with = db.session.execute(
+            select(task_shares.c.user_id).where(task_shares.c.task_id == task.id)
+        ).scalars().all()
+        return [task.owner_id] + list(shared_with)
+
+    @staticmethod
+    def _task_changed(user_ids: Iterable[int], event_type: str, data: dict) -> None:
+        """Invalidate cached task fragments and notify live subscribers"""
+        for user_id in user_ids:
+            fragment_cache.bump_tasks_version(user_id)
+            events.publish(TaskService.event_channel(user_id), event_type, data)
+
     @staticmethod
     def create_task(title: str, owner_id: int, description: str = None,
                    due_date: datetime = None, priority: int = 2) -> Task:
@@ -35,37 +88,309 @@ class TaskService:
             completed=False
         )
         db.session.add(task)
+        CounterService.adjust(owner_id, total=1)
         db.session.commit()
+        TaskService._task_changed([owner_id], 'created', task.to_dict())
         return task
 
     @staticmethod
-    def get_user_tasks(user_id: int, include_completed: bool = True,
-                      order_by: str = 'created_at') -> List[Task]:
+    def create_recurring_task(title: str, owner_id: int, rule: str, dtstart: datetime = None,
+                              description: str = None, priority: int = 2) -> Task:
         """
-        Get all tasks for a user
+        Create a recurring task series and its first occurrence
 
         Args:
-            user_id: User ID
-            include_completed: Whether to include completed tasks
-            order_by: Field to order by (created_at, due_date, priority)
+            title: Task title
+            owner_id: ID of the task owner
+            rule: RRULE text or shorthand ('daily', 'weekly', 'monthly')
+            dtstart: Start of the series (default: now)
+            description: Optional task description
+            priority: Task priority (1=Low, 2=Medium, 3=High)
 
         Returns:
-            List of Task instances
+            Task instance for the first occurrence
+
+        Raises:
+            RecurrenceError: If the rule is invalid or never occurs
         """
-        query = Task.query.filter_by(owner_id=user_id)
+        recurrence = RecurrenceService.create_series(title, owner_id, rule, dtstart or datetime.now(),
+                                                     description=description, priority=priority)
+        task = RecurrenceService.materialize_next(recurrence)
+        db.session.commit()
+        TaskService._task_changed([owner_id], 'created', task.to_dict())
+        return task
+
+    @staticmethod
+    def _next_occurrence(task: Task) -> Optional[Task]:
+        """Create the next occurrence after a recurring task was completed (caller commits)"""
+        recurrence = db.session.get(TaskRecurrence, task.recurrence_id) if task.recurrence_id else None
+        if recurrence is None:
+            return None
+        db.session.flush()
+        return RecurrenceService.materialize_next(recurrence)
+
+    @staticmethod
+    def _remove_next_occurrence(task: Task) -> Optional[int]:
+        """Delete the occurrence created when a recurring task was completed, now that it isn't (caller commits)"""
+        recurrence = db.session.get(TaskRecurrence, task.recurrence_id) if task.recurrence_id else None
+        if recurrence is None:
+            return None
+        db.session.flush()
+        return RecurrenceService.unmaterialize_next(recurrence, task)
+
+    @staticmethod
+    def _filter_tasks(statement, user_id: int, include_completed: bool = True,
+                      order_by: str = None, include_shared: bool = False,
+                      created_after: datetime = None):
+        """Apply the shared task list filters and ordering to a select statement"""
+        if include_shared:
+            # One query for owned and shared tasks, whoever the owners are
+            shared_ids = select(task_shares.c.task_id).where(task_shares.c.user_id == user_id)
+            statement = statement.where(or_(Task.owner_id == user_id, Task.id.in_(shared_ids)))
+        else:
+            statement = statement.where(Task.owner_id == user_id)
 
         if not include_completed:
-            query = query.filter_by(completed=False)
+            statement = statement.where(Task.completed == False)
+
+        if created_after is not None:
+            statement = statement.where(Task.created_at >= created_after)
 
         # Order by
         if order_by == 'due_date':
-            query = query.order_by(Task.due_date.asc().nullslast())
+            statement = statement.order_by(Task.due_date.asc().nullslast())
         elif order_by == 'priority':
-            query = query.order_by(Task.priority.desc())
+            statement = statement.order_by(Task.priority.desc())
+        elif order_by == 'id':
+            statement = statement.order_by(Task.id)
         else:  # default: created_at
-            query = query.order_by(Task.created_at.desc())
+            statement = statement.order_by(Task.created_at.desc())
+
+        return statement
+
+    @staticmethod
+    def get_user_tasks(user_id: int, include_completed: bool = True,
+                      order_by: str = 'created_at', include_shared: bool = False,
+                      created_after: datetime = None) -> List[Task]:
+        """
+        Get all tasks for a user
 
-        return query.all()
+        Args:
+            user_id: User ID
+            include_completed: Whether to include completed tasks
+            order_by: Field to order by (created_at, due_date, priority, id)
+            include_shared: Whether to include tasks other users shared with this user
+            created_after: Only include tasks created at or after this time. On a
+                partitioned task table this lets PostgreSQL skip older partitions.
+
+        Returns:
+            List of Task instances
+        """
+        statement = TaskService._filter_tasks(select(Task), user_id, include_completed,
+                                              order_by, include_shared, created_after)
+        return db.session.scalars(statement).all()
+
+    @staticmethod
+    def get_task_views(user_id: int, include_completed: bool = True,
+                       order_by: str = 'created_at', include_shared: bool = False,
+                       created_after: datetime = None) -> List[TaskView]:
+        """
+        Get a user's tasks as lightweight read-only rows
+
+        Selects only TASK_VIEW_COLUMNS into TaskView tuples, skipping ORM
+        instance construction, change tracking and the identity map. Use
+        get_user_tasks when the tasks will be modified.
+
+        Args:
+            user_id: User ID
+            include_completed: Whether to include completed tasks
+            order_by: Field to order by (created_at, due_date, priority, id)
+            include_shared: Whether to include tasks other users shared with this user
+            created_after: Only include tasks created at or after this time
+
+        Returns:
+            List of TaskView tuples
+        """
+        statement = TaskService._filter_tasks(select(*TASK_VIEW_COLUMNS), user_id, include_completed,
+                                              order_by, include_shared, created_after)
+        return [TaskView._make(row) for row in db.session.execute(statement)]
+
+    @staticmethod
+    def get_calendar(user_id: int, start: date, end: date, per_day: int = 5) -> List[CalendarDay]:
+        """
+        Get a user's dated tasks bucketed by day
+
+        A range scan on ix_task_owner_due_date; grouping and ranking happen
+        in SQL, so only the first `per_day` tasks of each day are fetched
+        (pending first, then by priority) along with each day's full count.
+
+        Args:
+            user_id: Owner ID
+            start: First day of the range
+            end: Day after the last day of the range
+            per_day: Maximum number of tasks returned per day
+
+        Returns:
+            CalendarDay tuples for days that have tasks, in date order. Upcoming
+            occurrences of recurring tasks are included with id None.
+        """
+        rows = db.session.execute(TaskService.calendar_statement(user_id, start, end, per_day))
+        occurrences = RecurrenceService.expand(user_id, datetime.combine(start, time.min),
+                                               datetime.combine(end, time.min))
+        return TaskService.build_calendar(rows, occurrences, per_day)
+
+    @staticmethod
+    def calendar_statement(user_id: int, start: date, end: date, per_day: int = 5):
+        """
+        Build the ranked per-day query behind get_calendar
+
+        Shared with the async views, which execute it on the asyncio engine.
+        """
+        day = func.date(Task.due_date)
+        ranked = select(
+            Task.id, Task.title, Task.completed, Task.priority, Task.due_date, Task.owner_id,
+            Task.recurrence_id, day.label('day'),
+            func.row_number().over(
+                partition_by=day,
+                order_by=(Task.completed, Task.priority.desc(), Task.due_date, Task.id)
+            ).label('position'),
+            func.count().over(partition_by=day).label('day_total')
+        ).where(
+            Task.owner_id == user_id,
+            Task.due_date >= datetime.combine(start, time.min),
+            Task.due_date < datetime.combine(end, time.min)
+        ).subquery()
+
+        return (
+            select(ranked)
+            .where(ranked.c.position <= per_day)
+            .order_by(ranked.c.day, ranked.c.position)
+        )
+
+    @staticmethod
+    def build_calendar(rows, occurrences: List[DueTaskView], per_day: int = 5) -> List[CalendarDay]:
+        """
+        Bucket calendar_statement rows by day and merge in recurring occurrences
+
+        Args:
+            rows: Result rows of calendar_statement
+            occurrences: Upcoming occurrences from RecurrenceService.expand
+            per_day: Maximum number of tasks kept per day
+
+        Returns:
+            CalendarDay tuples in date order
+        """
+        days = {}
+        for row in rows:
+            # SQLite returns date() as an ISO string
+            row_day = row.day if isinstance(row.day, date) else date.fromisoformat(row.day)
+            if row_day not in days:
+                days[row_day] = CalendarDay(row_day, row.day_total, [])
+            days[row_day].tasks.append(DueTaskView(row.id, row.title, row.completed, row.priority,
+                                                   row.due_date, row.owner_id, row.recurrence_id))
+
+        # Merge in upcoming occurrences of recurring tasks, keeping the same
+        # per-day order and limit
+        for occurrence in occurrences:
+            occurrence_day = occurrence.due_date.date()
+            day_entry = days.get(occurrence_day) or CalendarDay(occurrence_day, 0, [])
+            day_entry.tasks.append(occurrence)
+            days[occurrence_day] = day_entry._replace(total=day_entry.total + 1)
+        if occurrences:
+            for day_entry in days.values():
+                day_entry.tasks.sort(key=lambda task: (task.completed, -(task.priority or 0),
+                                                       task.due_date, task.id is None, task.id or 0))
+                del day_entry.tasks[per_day:]
+
+        return [days[key] for key in sorted(days)]
+
+    @staticmethod
+    def iter_task_rows(user_id: int, include_shared: bool = False,
+                       chunk_size: int = 1000) -> Iterator[List[tuple]]:
+        """
+        Stream a user's tasks as plain row tuples, a chunk at a time
+
+        Args:
+            user_id: User ID
+            include_shared: Whether to include tasks shared with the user
+            chunk_size: Number of rows per chunk
+
+        Yields:
+            Lists of tuples in SERIALIZED_COLUMNS order, oldest task first
+        """
+        statement = TaskService._filter_tasks(select(*SERIALIZED_COLUMNS), user_id,
+                                              order_by='id', include_shared=include_shared) \
+            .execution_options(yield_per=chunk_size)
+        for partition in db.session.execute(statement).partitions():
+            yield [tuple(row) for row in partition]
+
+    @staticmethod
+    def _overdue_flags(due_dates: Sequence[Optional[datetime]], completed: Sequence[Optional[bool]],
+                       now: datetime, use_numpy: bool = False) -> List[bool]:
+        """Compute is_overdue for whole columns against one reference time"""
+        numpy = _get_numpy() if use_numpy else None
+        if numpy is not None:
+            # None becomes NaT, and NaT compares False
+            due = numpy.array(due_dates, dtype='datetime64[us]')
+            done = numpy.array(completed, dtype=bool)
+            return ((due < numpy.datetime64(now, 'us')) & ~done).tolist()
+        return [due is not None and not done and now > due
+                for due, done in zip(due_dates, completed)]
+
+    @staticmethod
+    def serialize_many(rows: Iterable[tuple], now: datetime = None,
+                       use_numpy: bool = False) -> List[dict]:
+        """
+        Serialize many tasks at once, producing the same dicts as Task.to_dict
+
+        Works column by column on plain row tuples: one reference time for
+        every overdue check, a shared priority label table and no ORM
+        instances.
+
+        Args:
+            rows: Tuples in SERIALIZED_COLUMNS order
+            now: Reference time for is_overdue (default: now)
+            use_numpy: Compare due dates with NumPy arrays if it is installed.
+                Converting datetime objects to datetime64 usually costs more
+                than the comparison saves; see `flask cli benchmark-serializer`.
+
+        Returns:
+            List of task dictionaries
+        """
+        rows = list(rows)
+        if not rows:
+            return []
+
+        (ids, titles, descriptions, completed, completed_at, priorities,
+         due_dates, created_at, updated_at, owner_ids, recurrence_ids) = zip(*rows)
+
+        overdue = TaskService._overdue_flags(due_dates, completed, now or datetime.now(), use_numpy)
+        get_label = PRIORITY_LABELS.get
+        labels = [get_label(priority, 'Medium') for priority in priorities]
+
+        return [
+            {
+                'id': task_id,
+                'title': title,
+                'description': description,
+                'completed': done,
+                'completed_at': done_at,
+                'priority': priority,
+                'priority_label': label,
+                'due_date': due,
+                'is_overdue': is_overdue,
+                'created_at': created,
+                'updated_at': updated,
+                'owner_id': owner_id,
+                'recurrence_id': recurrence_id
+            }
+            for (task_id, title, description, done, done_at, priority, label, due, is_overdue,
+                 created, updated, owner_id, recurrence_id) in zip(
+                ids, titles, descriptions, completed, _isoformat_column(completed_at), priorities,
+                labels, _isoformat_column(due_dates), overdue, _isoformat_column(created_at),
+                _isoformat_column(updated_at), owner_ids, recurrence_ids
+            )
+        ]
 
     @staticmethod
     def get_task_by_id(task_id: int) -> Optional[Task]:
@@ -92,67 +417,194 @@ class TaskService:
             task.title = title
         if description is not None:
             task.description = description
-        if due_date is not None:
-            task.due_date = due_date
         if priority is not None:
             task.priority = priority
+        if due_date is not None and due_date != task.due_date:
+            task.due_date = due_date
+            # Counts are unchanged but the overdue snapshot is stale
+            CounterService.adjust(task.owner_id)
 
         db.session.commit()
+        TaskService._task_changed(TaskService.get_task_audience(task), 'updated', task.to_dict())
         return task
 
     @staticmethod
     def toggle_task_completion(task: Task) -> Task:
         """Toggle task completion status"""
         task.completed = not task.completed
+        task.completed_at = datetime.now() if task.completed else None
+        CounterService.adjust(task.owner_id, completed=1 if task.completed else -1)
+        next_task = TaskService._next_occurrence(task) if task.completed else None
+        removed_id = TaskService._remove_next_occurrence(task) if not task.completed else None
         db.session.commit()
+        TaskService._task_changed(TaskService.get_task_audience(task),
+                                  'completed' if task.completed else 'updated', task.to_dict())
+        if next_task:
+            TaskService._task_changed([next_task.owner_id], 'created', next_task.to_dict())
+        if removed_id:
+            TaskService._task_changed([task.owner_id], 'deleted', {'id': removed_id})
         return task
 
     @staticmethod
     def complete_task(task: Task) -> Task:
-        """Mark a task as completed"""
+        """
+        Mark a task as completed
+
+        Completing an occurrence of a recurring task creates the next one.
+        """
+        was_completed = task.completed
         task.completed = True
+        task.completed_at = datetime.now()
+        next_task = None
+        if not was_completed:
+            CounterService.adjust(task.owner_id, completed=1)
+            next_task = TaskService._next_occurrence(task)
         db.session.commit()
+        TaskService._task_changed(TaskService.get_task_audience(task), 'completed', task.to_dict())
+        if next_task:
+            TaskService._task_changed([next_task.owner_id], 'created', next_task.to_dict())
         return task
 
     @staticmethod
     def uncomplete_task(task: Task) -> Task:
-        """Mark a task as not completed"""
+        """
+        Mark a task as not completed
+
+        Un-completing an occurrence of a recurring task removes the next one
+        its completion created, unless that one has been changed since.
+        """
+        was_completed = task.completed
         task.completed = False
+        task.completed_at = None
+        removed_id = None
+        if was_completed:
+            CounterService.adjust(task.owner_id, completed=-1)
+            removed_id = TaskService._remove_next_occurrence(task)
         db.session.commit()
+        TaskService._task_changed(TaskService.get_task_audience(task), 'updated', task.to_dict())
+        if removed_id:
+            TaskService._task_changed([task.owner_id], 'deleted', {'id': removed_id})
         return task
 
     @staticmethod
     def delete_task(task: Task) -> None:
-        """Delete a task"""
+        """
+        Delete a task and its shares
+
+        Deleting the pending occurrence of a recurring task ends the series.
+        """
+        audience, task_id = TaskService.get_task_audience(task), task.id
+        if task.recurrence_id is not None and not task.completed:
+            RecurrenceService.stop_series(task.recurrence_id)
+        db.session.execute(task_shares.delete().where(task_shares.c.task_id == task_id))
         db.session.delete(task)
+        CounterService.adjust(task.owner_id, total=-1, completed=-1 if task.completed else 0)
         db.session.commit()
+        TaskService._task_changed(audience, 'deleted', {'id': task_id})
 
     @staticmethod
     def get_task_stats(user_id: int) -> dict:
         """
         Get task statistics for a user
 
+        Reads the denormalized user_task_counters row instead of counting
+        the task table.
+
         Returns:
             Dictionary with task counts
         """
-        total = Task.query.filter_by(owner_id=user_id).count()
-        completed = Task.query.filter_by(owner_id=user_id, completed=True).count()
-        pending = total - completed
-
-        overdue = Task.query.filter(
-            Task.owner_id == user_id,
-            Task.completed == False,
-            Task.due_date < datetime.now()
-        ).count()
-
+        counters = CounterService.get_counters(user_id)
         return {
-            'total': total,
-            'completed': completed,
-            'pending': pending,
-            'overdue': overdue
+            'total': counters.total,
+            'completed': counters.completed,
+            'pending': counters.pending,
+            'overdue': counters.overdue
         }
 
     @staticmethod
     def is_task_owner(task: Task, user_id: int) -> bool:
         """Check if user is the owner of the task"""
         return task.owner_id == user_id
+
+    @staticmethod
+    def can_access_task(task: Task, user_id: int) -> bool:
+        """Check if user owns the task or it has been shared with them"""
+        if task.owner_id == user_id:
+            return True
+        return TaskService.is_shared_with(task.id, user_id)
+
+    @staticmethod
+    def is_shared_with(task_id: int, user_id: int) -> bool:
+        """Check if a task is shared with a user (a single primary key EXISTS lookup)"""
+        return db.session.query(
+            exists().where(task_shares.c.task_id == task_id, task_shares.c.user_id == user_id)
+        ).scalar()
+
+    @staticmethod
+    def share_task(task: Task, user_id: int) -> bool:
+        """
+        Share a task with another user
+
+        Args:
+            task: Task instance to share
+            user_id: ID of the user to share with
+
+        Returns:
+            True if the task was newly shared, False if already shared or owned
+        """
+        if task.owner_id == user_id or TaskService.is_shared_with(task.id, user_id):
+            return False
+
+        try:
+            db.session.execute(task_shares.insert().values(task_id=task.id, user_id=user_id))
+            db.session.commit()
+        except IntegrityError:
+            # Shared by a concurrent request since the check
+            db.session.rollback()
+            return False
+        TaskService._task_changed([user_id], 'created', task.to_dict())
+        return True
+
+    @staticmethod
+    def unshare_task(task: Task, user_id: int) -> bool:
+        """
+        Stop sharing a task with a user
+
+        Args:
+            task: Task instance
+            user_id: ID of the user to remove
+
+        Returns:
+            True if a share was removed, False if it did not exist
+        """
+        result = db.session.execute(task_shares.delete().where(
+            task_shares.c.task_id == task.id,
+            task_shares.c.user_id == user_id
+        ))
+        db.session.commit()
+        if not result.rowcount:
+            return False
+
+        TaskService._task_changed([user_id], 'deleted', {'id': task.id})
+        return True
+
+    @staticmethod
+    def unshare_owned_tasks(owner_id: int) -> int:
+        """
+        Stop sharing every task a user owns
+
+        Used before deleting an account: its tasks go with it (ON DELETE
+        CASCADE), but a partitioned task table can't cascade to task_shares.
+
+        Returns:
+            Number of shares removed
+        """
+        owned = select(Task.id).where(Task.owner_id == owner_id)
+        shares = db.session.execute(
+            select(task_shares.c.task_id, task_shares.c.user_id).where(task_shares.c.task_id.in_(owned))
+        ).all()
+        db.session.execute(task_shares.delete().where(task_shares.c.task_id.in_(owned)))
+        db.session.commit()
+        for task_id, user_id in shares:
+            TaskService._task_changed([user_id], 'deleted', {'id': task_id})
+        return len(shares)
@@ -0,0 +1,190 @@
+"""
+User administration service.
+
+Backs the user directory commands of `flask cli`. Listing streams rows
+from the database (yield_per) instead of loading every user, and the bulk
+operations walk the matching users in id order, updating or deleting one
+batch per transaction with set-based statements, so they work the same on
+a hundred users or on millions and can be interrupted and re-run.
+"""
+import re
+from typing import Callable, Dict, Iterator, List, Optional
+from datetime import datetime, timedelta
+from sqlalchemy import case, delete, exists, func, or_, select, update
+from sqlalchemy.engine import Row
+from app import db
+from app.models.tasks import Task, TaskArchive, TaskRecurrence, UserTaskCounters
+from app.models.users import User
+
+
+class UserAdminService:
+    """Service for the user directory"""
+
+    @staticmethod
+    def phone_prefix(text: str) -> str:
+        """Normalize a phone number prefix to the stored E.164 form (country code first)"""
+        return '+' + re.sub(r'\D', '', text)
+
+    @staticmethod
+    def filters(phone_prefix: Optional[str] = None, name_prefix: Optional[str] = None,
+                verified: Optional[bool] = None, older_than_days: Optional[int] = None) -> List:
+        """
+        Build the WHERE conditions shared by the directory commands
+
+        Args:
+            phone_prefix: Numbers starting with this, e.g. '+1555' or '1555'
+            name_prefix: First or last names starting with this (case-insensitive)
+            verified: Only verified (True) or unverified (False) users
+            older_than_days: Only accounts created at least this many days ago
+        """
+        conditions = []
+        if phone_prefix:
+            prefix = UserAdminService.phone_prefix(phone_prefix)
+            # The range lets the phone number index serve the prefix match
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            conditions += [User.phone_number >= prefix, User.phone_number < upper,
+                           User.phone_number.startswith(prefix, autoescape=True)]
+        if name_prefix:
+            name = name_prefix.lower()
+            conditions.append(or_(func.lower(User.first_name).startswith(name, autoescape=True),
+                                  func.lower(User.last_name).startswith(name, autoescape=True)))
+        if verified is True:
+            conditions.append(User.verified == True)
+        elif verified is False:
+            # NULL (never set) counts as unverified
+            conditions.append(User.verified.is_not(True))
+        if older_than_days is not None:
+            conditions.append(User.created_at < datetime.now() - timedelta(days=older_than_days))
+        return conditions
+
+    @staticmethod
+    def iter_users(conditions: List, after_id: int = 0, limit: Optional[int] = None,
+                   batch_size: int = 1000) -> Iterator[Row]:
+        """
+        Stream matching users in id order
+
+        Rows are fetched batch_size at a time (a server-side cursor on
+        PostgreSQL), so memory use doesn't grow with the number of users.
+
+        Args:
+            conditions: Conditions from filters()
+            after_id: Start after this user id (keyset pagination)
+            limit: Maximum number of users, or None for all
+            batch_size: Rows fetched per round trip
+
+        Yields:
+            Rows with id, first_name, last_name, phone_number, verified,
+            created_at and task_count (from the task counters)
+        """
+        query = (
+            select(User.id, User.first_name, User.last_name, User.phone_number, User.verified,
+                   User.created_at, func.coalesce(UserTaskCounters.total, 0).label('task_count'))
+            .outerjoin(UserTaskCounters, UserTaskCounters.user_id == User.id)
+            .where(User.id > after_id, *conditions)
+            .order_by(User.id)
+            .limit(limit)
+            .execution_options(yield_per=batch_size)
+        )
+        yield from db.session.execute(query)
+
+    @staticmethod
+    def count_by_status(conditions: Optional[List] = None) -> Dict[str, int]:
+        """
+        Count matching users by verification status
+
+        Returns:
+            Dict with 'verified' and 'unverified' counts
+        """
+        status = case((User.verified == True, 'verified'), else_='unverified')
+        counts = {'verified': 0, 'unverified': 0}
+        for label, count in db.session.execute(
+            select(status, func.count(User.id)).where(*(conditions or [])).group_by(status)
+        ):
+            counts[label] = count
+        return counts
+
+    @staticmethod
+    def _id_batches(conditions: List, batch_size: int) -> Iterator[List[int]]:
+        """Ids of matching users, one batch at a time, resuming after the last id seen"""
+        last_id = 0
+        while True:
+            user_ids = db.session.scalars(
+                select(User.id).where(User.id > last_id, *conditions).order_by(User.id).limit(batch_size)
+            ).all()
+            if not user_ids:
+                return
+            last_id = user_ids[-1]
+            yield user_ids
+
+    @staticmethod
+    def bulk_verify(conditions: List, batch_size: int = 1000,
+                    progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Mark matching unverified users as verified
+
+        Args:
+            conditions: Conditions from filters()
+            batch_size: Users updated per transaction
+            progress: Optional callback receiving the running total after each batch
+
+        Returns:
+            Number of users verified
+        """
+        conditions = conditions + [User.verified.is_not(True)]
+        total = 0
+        for user_ids in UserAdminService._id_batches(conditions, batch_size):
+            total += db.session.execute(
+                update(User).where(User.id.in_(user_ids), *conditions)
+                .values(verified=True, verification_code=None, verification_attempts=0)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if progress:
+                progress(total)
+        return total
+
+    @staticmethod
+    def stale_unverified_conditions(older_than_days: int) -> List:
+        """
+        Unverified accounts created at least N days ago that own no tasks
+
+        Archived tasks and recurring series count too. Accounts with any of
+        them are left for a person to look at, since deleting the account
+        would delete them with it.
+        """
+        return UserAdminService.filters(verified=False, older_than_days=older_than_days) + [
+            ~exists().where(Task.owner_id == User.id),
+            ~exists().where(TaskArchive.owner_id == User.id),
+            ~exists().where(TaskRecurrence.owner_id == User.id),
+        ]
+
+    @staticmethod
+    def delete_unverified(older_than_days: int, batch_size: int = 1000,
+                          progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Delete unverified accounts created at least N days ago that own no tasks
+
+        Only accounts matching stale_unverified_conditions() are deleted; their
+        counters, shares and idempotency keys go with them (ON DELETE CASCADE).
+
+        Args:
+            older_than_days: Minimum account age in days
+            batch_size: Users deleted per transaction
+            progress: Optional callback receiving the running total after each batch
+
+        Returns:
+            Number of users deleted
+        """
+        conditions = UserAdminService.stale_unverified_conditions(older_than_days)
+        total = 0
+        for user_ids in UserAdminService._id_batches(conditions, batch_size):
+            # Re-check the conditions: a user may have verified since the batch was read
+            deleted = db.session.execute(
+                delete(User).where(User.id.in_(user_ids), *conditions)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            total += deleted
+            if progress:
+                progress(total)
+        return total
@@ -0,0 +1,385 @@
+"""
+Session storage for do2done application.
+
+By default the session is Flask's signed cookie. SESSION_BACKEND moves it
+server side ('memory', 'database' or 'redis'): the cookie then carries only
+a signed random session id, and the data stays in the store. Server-side
+sessions are written back only when they change or half of their lifetime
+has passed, and get a new id when a user logs in or out.
+
+Either way, sessions are compacted when they are opened and saved:
+- the signup verification and password recovery keys (FLOW_KEYS) are
+  dropped SESSION_FLOW_LIFETIME after they were set, so abandoned flows
+  expire on their own;
+- the locale lives in the `lang` cookie only, so copies left in the
+  session are dropped.
+Server-side sessions without a logged-in user are kept for
+SESSION_ANONYMOUS_LIFETIME rather than PERMANENT_SESSION_LIFETIME.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Session keys of the multi-step signup and recovery flows
+FLOW_KEYS = ('user_id', 'reset_phone', 'recovery_phone')
+FLOW_STARTED_KEY = '_flow_at'
+
+# Keys no longer kept in the session (the locale is in the `lang` cookie)
+DROPPED_KEYS = ('lang',)
+
+
+def compact_session(session, flow_lifetime: timedelta) -> None:
+    """
+    Drop expired and redundant keys from a session
+
+    Stamps the time a flow key first appeared, and removes the flow keys
+    once that is older than flow_lifetime. Reads go to the underlying dict,
+    so compacting doesn't mark the session accessed (which would add
+    `Vary: Cookie` to every response, cacheable static files included);
+    only an actual change does.
+    """
+    for key in DROPPED_KEYS:
+        if key in session:
+            session.pop(key)
+
+    flow_keys = [key for key in FLOW_KEYS if key in session]
+    started = dict.get(session, FLOW_STARTED_KEY)
+    now = int(time.time())
+    if not flow_keys:
+        if started is not None:
+            session.pop(FLOW_STARTED_KEY)
+    elif started is None:
+        session[FLOW_STARTED_KEY] = now
+    elif started + flow_lifetime.total_seconds() <= now:
+        for key in flow_keys + [FLOW_STARTED_KEY]:
+            session.pop(key)
+
+
+class CompactCookieSessionInterface(SecureCookieSessionInterface):
+    """Flask's signed cookie session, compacted on open and save"""
+
+    def open_session(self, app, request):
+        session = super().open_session(app, request)
+        if session is not None:
+            compact_session(session, app.config.get('SESSION_FLOW_LIFETIME', timedelta(minutes=30)))
+        return session
+
+    def save_session(self, app, session, response):
+        compact_session(session, app.config.get('SESSION_FLOW_LIFETIME', timedelta(minutes=30)))
+        super().save_session(app, session, response)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """
+    Session whose data is kept in a server-side store
+
+    Tracks `accessed` like Flask's cookie session (SessionMixin's default is
+    always True), so responses that never read the session don't vary on
+    the cookie.
+    """
+
+    def __init__(self, initial=None, sid: str = None, new: bool = False, expires_at: Optional[int] = None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.expires_at = expires_at
+        self.initial_user_id = dict.get(self, '_user_id')
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class MemorySessionBackend:
+    """
+    In-process LRU session store
+
+    Sessions are only visible to the worker process that created them; use
+    the database or Redis backend when running several workers.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Initialize memory backend
+
+        Args:
+            max_entries: Maximum number of stored sessions (least recently used are evicted)
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return entry[1]
+
+    def save(self, sid: str, payload: str, ttl: int) -> None:
+        with self._lock:
+            self._entries[sid] = (time.time() + ttl, payload)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def purge(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (expires, _) in self._entries.items() if expires <= now]
+            for sid in expired:
+                del self._entries[sid]
+        return len(expired)
+
+
+class DatabaseSessionBackend:
+    """
+    Session store in the server_session table
+
+    Shared by every worker. Uses its own connection, so saving a session
+    never commits or rolls back the request's db.session.
+    """
+
+    def load(self, sid: str) -> Optional[str]:
+        from sqlalchemy import select
+        from app import db
+        from app.models.sessions import ServerSession as SessionRow
+
+        with db.engine.connect() as connection:
+            return connection.scalar(select(SessionRow.data).where(
+                SessionRow.sid == sid, SessionRow.expires_at > datetime.now()
+            ))
+
+    def save(self, sid: str, payload: str, ttl: int) -> None:
+        from sqlalchemy import insert, update
+        from app import db
+        from app.models.sessions import ServerSession as SessionRow
+
+        expires_at = datetime.now() + timedelta(seconds=ttl)
+        with db.engine.begin() as connection:
+            result = connection.execute(
+                update(SessionRow).where(SessionRow.sid == sid).values(data=payload, expires_at=expires_at)
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(SessionRow).values(sid=sid, data=payload, expires_at=expires_at))
+
+    def delete(self, sid: str) -> None:
+        from sqlalchemy import delete
+        from app import db
+        from app.models.sessions import ServerSession as SessionRow
+
+        with db.engine.begin() as connection:
+            connection.execute(delete(SessionRow).where(SessionRow.sid == sid))
+
+    def purge(self) -> int:
+        from sqlalchemy import delete
+        from app import db
+        from app.models.sessions import ServerSession as SessionRow
+
+        with db.engine.begin() as connection:
+            return connection.execute(delete(SessionRow).where(SessionRow.expires_at <= datetime.now())).rowcount
+
+
+class RedisSessionBackend:
+    """Session store in Redis; keys expire with their session"""
+
+    def __init__(self, client, prefix: str = 'session:'):
+        """
+        Initialize Redis backend
+
+        Args:
+            client: redis.Redis client (or FakeRedis)
+            prefix: Prefix for session keys
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def load(self, sid: str) -> Optional[str]:
+        payload = self.client.get(f'{self.prefix}{sid}')
+        return payload.decode('utf-8') if payload is not None else None
+
+    def save(self, sid: str, payload: str, ttl: int) -> None:
+        self.client.set(f'{self.prefix}{sid}', payload, ex=ttl)
+
+    def delete(self, sid: str) -> None:
+        self.client.delete(f'{self.prefix}{sid}')
+
+    def purge(self) -> int:
+        # Redis expires keys itself
+        return 0
+
+
+def redis_client(url: str):
+    """Create a Redis client, or an in-process FakeRedis for fake:// URLs"""
+    if url.startswith('fake://'):
+        from app.fake_redis import FakeRedis
+        return FakeRedis()
+    import redis
+    return redis.Redis.from_url(url)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data in a backend, and a signed session id in the cookie"""
+
+    salt = 'do2done-session-id'
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_signer(self, app) -> Optional[Signer]:
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt=self.salt, key_derivation='hmac')
+
+    def get_lifetime(self, app, session) -> timedelta:
+        """How long the store keeps a session after it was last saved"""
+        if '_user_id' in session:
+            return app.permanent_session_lifetime
+        return app.config.get('SESSION_ANONYMOUS_LIFETIME', timedelta(hours=1))
+
+    def open_session(self, app, request):
+        signer = self.get_signer(app)
+        if signer is None:
+            return None
+
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = signer.unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            stored = self._load(sid) if sid else None
+            if stored is not None:
+                session = ServerSession(stored['data'], sid=sid, expires_at=stored['expires'])
+                compact_session(session, app.config.get('SESSION_FLOW_LIFETIME', timedelta(minutes=30)))
+                return session
+
+        # Ids are only ever generated here, never taken from the client
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def _load(self, sid: str) -> Optional[dict]:
+        payload = self.backend.load(sid)
+        if payload is None:
+            return None
+        try:
+            return self.serializer.loads(payload)
+        except ValueError:
+            logger.warning('Discarding unreadable session data')
+            return None
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        compact_session(session, app.config.get('SESSION_FLOW_LIFETIME', timedelta(minutes=30)))
+        if not session:
+            if not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        if not session.new and dict.get(session, '_user_id') != session.initial_user_id:
+            # Logged in or out: an id known before the switch must not carry over
+            self.backend.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.new = True
+
+        ttl = int(self.get_lifetime(app, session).total_seconds())
+        now = time.time()
+        stale = session.expires_at is not None and session.expires_at - now < ttl / 2
+        if not (session.new or session.modified or stale):
+            return
+
+        expires = int(now + ttl)
+        self.backend.save(session.sid, self.serializer.dumps({'expires': expires, 'data': dict(session)}), ttl)
+        session.expires_at = expires
+        response.set_cookie(
+            name,
+            self.get_signer(app).sign(session.sid).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite,
+        )
+        response.vary.add('Cookie')
+
+
+class SessionStore:
+    """Flask extension installing the configured session interface"""
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the session from SESSION_BACKEND
+
+        'cookie' (default) keeps Flask's signed cookie; 'memory', 'database'
+        and 'redis' store sessions server side. Uses SESSION_MAX_ENTRIES
+        (memory) and SESSION_REDIS_URL (redis).
+        """
+        backend_type = app.config.get('SESSION_BACKEND', 'cookie')
+        if backend_type == 'memory':
+            self.backend = MemorySessionBackend(app.config.get('SESSION_MAX_ENTRIES', 10000))
+        elif backend_type == 'database':
+            self.backend = DatabaseSessionBackend()
+        elif backend_type == 'redis':
+            self.backend = RedisSessionBackend(redis_client(app.config['SESSION_REDIS_URL']))
+        else:
+            self.backend = None
+
+        if self.backend is None:
+            app.session_interface = CompactCookieSessionInterface()
+        else:
+            app.session_interface = ServerSideSessionInterface(self.backend)
+        app.extensions['session_store'] = self
+
+    def purge(self) -> int:
+        """Delete expired server-side sessions; returns how many were removed"""
+        return self.backend.purge() if self.backend is not None else 0
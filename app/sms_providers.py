@@ -0,0 +1,687 @@
+"""
+SMS provider backends for do2done application.
+
+Providers are tried in SMS_PROVIDERS order. Each one has a circuit
+breaker: once too many of its recent sends fail or are slower than
+SMS_BREAKER_LATENCY, it is skipped (failing fast to the next provider)
+until SMS_BREAKER_RESET_TIMEOUT has passed and a trial send succeeds.
+Send latency and outcomes are tracked per provider.
+
+Available providers:
+    twilio  Twilio Messages API over a pooled keep-alive session
+    http    Generic JSON-over-HTTP gateway (SMS_HTTP_PROVIDER_URL)
+    log     Writes messages to the log and optionally SMS_LOG_FILE (development)
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SMSProviderError(Exception):
+    """A provider failed to accept a message"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: bool = True):
+        """
+        Args:
+            message: Error description
+            status_code: HTTP status returned by the provider, if any
+            retryable: False if the message itself was rejected (e.g. an
+                       invalid number), so other providers won't do better
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class SMSResult(NamedTuple):
+    """Outcome of sending one message"""
+    to_number: str
+    sid: Optional[str] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    provider: Optional[str] = None
+
+    @property
+    def ok(self):
+        """Check if a provider accepted the message"""
+        return self.sid is not None
+
+
+def http_error(status_code: int, message: str) -> SMSProviderError:
+    """Classify an HTTP error reply: 4xx rejections (other than 408/429) are final"""
+    retryable = status_code >= 500 or status_code in (401, 403, 408, 429)
+    return SMSProviderError(message, status_code=status_code, retryable=retryable)
+
+
+class RateLimiter:
+    """Token bucket shared by every thread sending to one provider"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Initialize rate limiter
+
+        Args:
+            rate: Messages per second (0 or less disables the limit)
+            burst: Messages that may be sent at once after an idle period
+                   (defaults to one second's worth)
+        """
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token if one is available, else return the seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        """Block until a message may be sent"""
+        if self.rate <= 0:
+            return
+        while (wait := self._reserve()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Wait without blocking the event loop until a message may be sent"""
+        if self.rate <= 0:
+            return
+        while (wait := self._reserve()) > 0:
+            await asyncio.sleep(wait)
+
+
+class BreakerTicket(NamedTuple):
+    """Permission for one send, handed back with its outcome"""
+    generation: int
+    trial: bool = False
+
+
+class CircuitBreaker:
+    """
+    Tracks a provider's recent sends and stops using it while it is unhealthy
+
+    Closed: sends go through. Open: the provider is skipped. Half-open
+    (after reset_timeout): one trial send decides whether to close again.
+
+    Every state change starts a new generation. Outcomes of sends allowed
+    in an earlier generation are ignored, so a slow send that started
+    while the circuit was closed can't close (or reopen) it later; only
+    the trial's own outcome decides a half-open circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str = 'sms', error_rate: float = 0.5, latency_threshold: float = 5.0,
+                 window: int = 20, min_calls: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize circuit breaker
+
+        Args:
+            name: Provider name, for logging
+            error_rate: Fraction of failed sends in the window that opens the circuit
+            latency_threshold: Seconds after which a successful send still counts as failed
+            window: Number of recent sends considered
+            min_calls: Sends needed in the window before the circuit can open
+            reset_timeout: Seconds to stay open before allowing a trial send
+        """
+        self.name = name
+        self.error_rate = error_rate
+        self.latency_threshold = latency_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = None
+        self.trial_running = False
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> Optional[BreakerTicket]:
+        """A ticket if a send may go to the provider now, otherwise None"""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return BreakerTicket(self.generation)
+            if state == self.HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return BreakerTicket(self.generation, trial=True)
+            return None
+
+    def _open(self) -> None:
+        self.opened_at = time.monotonic()
+        self.generation += 1
+
+    def record(self, ticket: BreakerTicket, success: bool, latency: float) -> None:
+        """Record the outcome of a send allowed with `ticket`"""
+        failed = not success or latency > self.latency_threshold
+        with self._lock:
+            if ticket.generation != self.generation:
+                return
+            if ticket.trial:
+                self.trial_running = False
+                if failed:
+                    self._open()
+                else:
+                    self.opened_at = None
+                    self.generation += 1
+                    self.outcomes.clear()
+                    logger.info(f'SMS circuit for {self.name} closed after a successful trial send')
+                return
+
+            self.outcomes.append(failed)
+            failures = sum(self.outcomes)
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.error_rate:
+                self._open()
+                logger.warning(f'SMS circuit for {self.name} opened after {failures} of {len(self.outcomes)} sends failed')
+
+    def cancel(self, ticket: BreakerTicket) -> None:
+        """Give a ticket back without an outcome (the send was cancelled)"""
+        with self._lock:
+            if ticket.trial and ticket.generation == self.generation:
+                self.trial_running = False
+
+
+class ProviderMetrics:
+    """Send counts and recent latencies of one provider"""
+
+    def __init__(self, window: int = 500):
+        """
+        Args:
+            window: Number of recent latencies kept for percentiles
+        """
+        self.sent = 0
+        self.failed = 0
+        self.rejected = 0
+        self.skipped = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, outcome: str) -> None:
+        """Record a send; outcome is 'sent', 'failed' or 'rejected'"""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.latencies.append(latency)
+
+    def record_skip(self) -> None:
+        """Record a send skipped because the circuit was open"""
+        with self._lock:
+            self.skipped += 1
+
+    def snapshot(self) -> dict:
+        """Counts plus p50/p95/max latency in milliseconds over the recent window"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            counts = {'sent': self.sent, 'failed': self.failed, 'rejected': self.rejected,
+                      'skipped': self.skipped}
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000, 1)
+
+        return {**counts, 'p50_ms': percentile(0.5), 'p95_ms': percentile(0.95),
+                'max_ms': round(latencies[-1] * 1000, 1) if latencies else None}
+
+
+class SMSProvider:
+    """
+    Base class for providers; subclasses implement send (and optionally send_async)
+
+    send makes one attempt; rate limiting and retries of rate-limited (429)
+    sends are done around it by SMSProviders, outside the timed call.
+    """
+
+    name = None
+    max_retries = 0
+
+    def __init__(self, rate_limit: float = 0, breaker: Optional[CircuitBreaker] = None):
+        self.limiter = RateLimiter(rate_limit)
+        self.breaker = breaker or CircuitBreaker(self.name or 'sms')
+        self.metrics = ProviderMetrics()
+
+    def send(self, to_number: str, body: str) -> str:
+        """
+        Send one message
+
+        Returns:
+            Provider message ID
+
+        Raises:
+            SMSProviderError: If the provider did not accept the message
+        """
+        raise NotImplementedError
+
+    async def send_async(self, to_number: str, body: str) -> str:
+        """Send one message from async code (runs send on a thread unless overridden)"""
+        return await asyncio.to_thread(self.send, to_number, body)
+
+    def close(self) -> None:
+        pass
+
+    async def close_async(self) -> None:
+        pass
+
+
+class HTTPSMSProvider(SMSProvider):
+    """Shared plumbing for providers reached over HTTP"""
+
+    def __init__(self, timeout: float = 10, pool_size: int = 8, **kwargs):
+        """
+        Args:
+            timeout: Seconds to wait for the provider
+            pool_size: Keep-alive connections kept open (and the most used at once)
+        """
+        super().__init__(**kwargs)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._async_session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Keep-alive requests session; blocks rather than exceed pool_size connections"""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def async_session(self):
+        """aiohttp session for the running event loop"""
+        import aiohttp
+        loop = asyncio.get_running_loop()
+        if self._async_session is None or self._async_session[0] is not loop \
+                or self._async_session[1].closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._async_session = (loop, aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ))
+        return self._async_session[1]
+
+    def request(self, url: str, **kwargs) -> dict:
+        """POST with the pooled session and return the JSON reply"""
+        import requests
+        try:
+            response = self.session.post(url, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise SMSProviderError(str(e))
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        if not response.ok:
+            raise http_error(response.status_code, payload.get('message') or response.reason)
+        return payload
+
+    async def request_async(self, url: str, **kwargs) -> dict:
+        """POST with the aiohttp session and return the JSON reply"""
+        import aiohttp
+        try:
+            async with self.async_session().post(url, **kwargs) as response:
+                try:
+                    payload = await response.json(content_type=None)
+                except ValueError:
+                    payload = {}
+                if response.status >= 400:
+                    raise http_error(response.status, (payload or {}).get('message') or response.reason)
+                return payload or {}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise SMSProviderError(str(e) or type(e).__name__)
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    async def close_async(self) -> None:
+        if self._async_session is not None and not self._async_session[1].closed:
+            await self._async_session[1].close()
+        self._async_session = None
+
+
+class TwilioProvider(HTTPSMSProvider):
+    """Twilio Messages API"""
+
+    name = 'twilio'
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: Optional[str] = None,
+                 messaging_service_sid: Optional[str] = None, base_url: str = 'https://api.twilio.com',
+                 max_retries: int = 2, **kwargs):
+        """
+        Args:
+            account_sid: Twilio account SID
+            auth_token: Twilio auth token
+            from_number: Sender phone number
+            messaging_service_sid: Messaging Service to send through instead of from_number
+            base_url: API base URL (a local fake server in development)
+            max_retries: Retries of rate-limited (429) sends
+        """
+        super().__init__(**kwargs)
+        self.url = f"{base_url.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.auth = (account_sid, auth_token)
+        self.sender = ({'MessagingServiceSid': messaging_service_sid} if messaging_service_sid
+                       else {'From': from_number})
+        self.max_retries = max_retries
+
+    @staticmethod
+    def _sid(reply: dict) -> str:
+        if not reply.get('sid'):
+            raise SMSProviderError('Reply has no message SID')
+        return reply['sid']
+
+    def send(self, to_number: str, body: str) -> str:
+        data = {'To': to_number, 'Body': body, **self.sender}
+        return self._sid(self.request(self.url, data=data, auth=self.auth))
+
+    async def send_async(self, to_number: str, body: str) -> str:
+        import aiohttp
+        data = {'To': to_number, 'Body': body, **self.sender}
+        return self._sid(await self.request_async(self.url, data=data, auth=aiohttp.BasicAuth(*self.auth)))
+
+
+class GenericHTTPProvider(HTTPSMSProvider):
+    """
+    Any gateway that accepts a JSON POST of {"to", "from", "body"}
+
+    The reply must be JSON with the message ID in "id", "sid" or
+    "message_id".
+    """
+
+    name = 'http'
+
+    def __init__(self, url: str, token: Optional[str] = None, from_number: Optional[str] = None, **kwargs):
+        """
+        Args:
+            url: Endpoint to POST messages to
+            token: Optional bearer token
+            from_number: Sender phone number or ID
+        """
+        super().__init__(**kwargs)
+        self.url = url
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+        self.from_number = from_number
+
+    def _payload(self, to_number: str, body: str) -> dict:
+        return {'to': to_number, 'from': self.from_number, 'body': body}
+
+    @staticmethod
+    def _message_id(reply: dict) -> str:
+        message_id = reply.get('id') or reply.get('sid') or reply.get('message_id')
+        if not message_id:
+            raise SMSProviderError('Reply has no message ID')
+        return str(message_id)
+
+    def send(self, to_number: str, body: str) -> str:
+        return self._message_id(self.request(self.url, json=self._payload(to_number, body),
+                                             headers=self.headers))
+
+    async def send_async(self, to_number: str, body: str) -> str:
+        return self._message_id(await self.request_async(self.url, json=self._payload(to_number, body),
+                                                         headers=self.headers))
+
+
+class LogProvider(SMSProvider):
+    """Development sink: logs messages and appends them as JSON lines to a file"""
+
+    name = 'log'
+
+    def __init__(self, path: Optional[str] = None, **kwargs):
+        """
+        Args:
+            path: File to append messages to (log only if None)
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, to_number: str, body: str) -> str:
+        sid = f'LOG{uuid.uuid4().hex}'
+        logger.info(f'SMS to {to_number}: {body}')
+        if self.path:
+            line = json.dumps({'sid': sid, 'to': to_number, 'body': body,
+                               'sent_at': datetime.now().isoformat()})
+            with self._lock, open(self.path, 'a', encoding='utf-8') as log_file:
+                log_file.write(line + '\n')
+        return sid
+
+    async def send_async(self, to_number: str, body: str) -> str:
+        return self.send(to_number, body)
+
+
+def build_provider(name: str, config) -> Optional[SMSProvider]:
+    """
+    Create a provider from the app config
+
+    Returns:
+        The provider, or None if it is unknown or not configured
+    """
+    breaker = CircuitBreaker(
+        name=name,
+        error_rate=config.get('SMS_BREAKER_ERROR_RATE', 0.5),
+        latency_threshold=config.get('SMS_BREAKER_LATENCY', 5.0),
+        window=config.get('SMS_BREAKER_WINDOW', 20),
+        min_calls=config.get('SMS_BREAKER_MIN_CALLS', 5),
+        reset_timeout=config.get('SMS_BREAKER_RESET_TIMEOUT', 30)
+    )
+    http_options = {'timeout': config.get('SMS_HTTP_TIMEOUT', 10),
+                    'pool_size': config.get('SMS_BATCH_CONCURRENCY', 8), 'breaker': breaker}
+
+    if name == 'twilio':
+        if not config.get('TWILIO_ENABLED'):
+            logger.warning('Twilio SMS provider is disabled (missing credentials)')
+            return None
+        return TwilioProvider(
+            config['TWILIO_ACCOUNT_SID'], config['TWILIO_AUTH_TOKEN'],
+            from_number=config.get('TWILIO_PHONE_NUMBER'),
+            messaging_service_sid=config.get('TWILIO_MESSAGING_SERVICE_SID'),
+            base_url=config.get('TWILIO_API_BASE_URL', 'https://api.twilio.com'),
+            max_retries=config.get('SMS_MAX_RETRIES', 2),
+            rate_limit=config.get('SMS_RATE_LIMIT', 10),
+            **http_options
+        )
+    if name == 'http':
+        if not config.get('SMS_HTTP_PROVIDER_URL'):
+            logger.warning('HTTP SMS provider is disabled (SMS_HTTP_PROVIDER_URL not set)')
+            return None
+        return GenericHTTPProvider(
+            config['SMS_HTTP_PROVIDER_URL'], token=config.get('SMS_HTTP_PROVIDER_TOKEN'),
+            from_number=config.get('SMS_HTTP_PROVIDER_FROM'),
+            rate_limit=config.get('SMS_HTTP_RATE_LIMIT', 0),
+            **http_options
+        )
+    if name == 'log':
+        return LogProvider(config.get('SMS_LOG_FILE'), breaker=breaker)
+
+    logger.error(f'Unknown SMS provider {name!r}')
+    return None
+
+
+class SMSProviders:
+    """Flask extension sending SMS through the configured providers, with failover"""
+
+    def __init__(self, app=None):
+        self.providers: List[SMSProvider] = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Create the providers listed in SMS_PROVIDERS (comma-separated, in failover order)
+
+        Providers that are not configured are left out.
+        """
+        self.close()
+        names = [name.strip() for name in app.config.get('SMS_PROVIDERS', '').split(',') if name.strip()]
+        self.providers = [provider for provider in (build_provider(name, app.config) for name in names)
+                          if provider is not None]
+        app.extensions['sms_providers'] = self
+        if self.providers:
+            app.logger.info(f"SMS providers: {', '.join(provider.name for provider in self.providers)}")
+        else:
+            app.logger.warning('No SMS provider is configured; SMS will not be sent')
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.providers)
+
+    def _candidates(self):
+        """Providers whose circuit lets a send through, with their tickets, in failover order"""
+        for provider in self.providers:
+            ticket = provider.breaker.allow()
+            if ticket is not None:
+                yield provider, ticket
+            else:
+                provider.metrics.record_skip()
+
+    @staticmethod
+    def _record(provider: SMSProvider, ticket: BreakerTicket, latency: float,
+                error: Optional[BaseException] = None) -> None:
+        if error is not None and not isinstance(error, Exception):
+            # Cancelled (or interrupted): no verdict on the provider
+            provider.breaker.cancel(ticket)
+            return
+        # A rejected message says nothing about the provider's health
+        rejected = isinstance(error, SMSProviderError) and not error.retryable
+        provider.breaker.record(ticket, error is None or rejected, latency)
+        provider.metrics.record(latency, 'sent' if error is None else 'rejected' if rejected else 'failed')
+
+    @staticmethod
+    def _as_provider_error(error: Exception) -> SMSProviderError:
+        if isinstance(error, SMSProviderError):
+            return error
+        logger.exception(f'Unexpected SMS provider error: {error}')
+        return SMSProviderError(f'{type(error).__name__}: {error}')
+
+    @staticmethod
+    def _send_with(provider: SMSProvider, ticket: BreakerTicket, to_number: str, body: str) -> str:
+        """
+        Send through one provider and record the outcome on its breaker
+
+        Only the provider call is timed: waiting for the rate limiter and
+        backing off after a 429 are our own doing, not provider latency.
+        """
+        latency = 0.0
+        error = None
+        try:
+            for attempt in range(provider.max_retries + 1):
+                provider.limiter.acquire()
+                started = time.perf_counter()
+                try:
+                    return provider.send(to_number, body)
+                except SMSProviderError as e:
+                    if e.status_code != 429 or attempt == provider.max_retries:
+                        raise
+                finally:
+                    latency = time.perf_counter() - started
+                time.sleep(2 ** attempt)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            SMSProviders._record(provider, ticket, latency, error)
+
+    @staticmethod
+    async def _send_with_async(provider: SMSProvider, ticket: BreakerTicket, to_number: str, body: str) -> str:
+        """Async version of _send_with"""
+        latency = 0.0
+        error = None
+        try:
+            for attempt in range(provider.max_retries + 1):
+                await provider.limiter.acquire_async()
+                started = time.perf_counter()
+                try:
+                    return await provider.send_async(to_number, body)
+                except SMSProviderError as e:
+                    if e.status_code != 429 or attempt == provider.max_retries:
+                        raise
+                finally:
+                    latency = time.perf_counter() - started
+                await asyncio.sleep(2 ** attempt)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            SMSProviders._record(provider, ticket, latency, error)
+
+    def send(self, to_number: str, body: str) -> SMSResult:
+        """
+        Send a message with the first healthy provider that accepts it
+
+        Returns:
+            SMSResult naming the provider used, or carrying every provider's error
+        """
+        errors = []
+        for provider, ticket in self._candidates():
+            try:
+                sid = self._send_with(provider, ticket, to_number, body)
+            except Exception as error:
+                e = self._as_provider_error(error)
+                logger.warning(f'SMS provider {provider.name} failed for {to_number}: {e}')
+                if not e.retryable:
+                    return SMSResult(to_number, error=str(e), status_code=e.status_code, provider=provider.name)
+                errors.append(f'{provider.name}: {e}')
+                continue
+            return SMSResult(to_number, sid=sid, provider=provider.name)
+        return SMSResult(to_number, error='; '.join(errors) or 'No SMS provider available')
+
+    async def send_async(self, to_number: str, body: str) -> SMSResult:
+        """Async version of send, for the ASGI views"""
+        errors = []
+        for provider, ticket in self._candidates():
+            try:
+                sid = await self._send_with_async(provider, ticket, to_number, body)
+            except Exception as error:
+                e = self._as_provider_error(error)
+                logger.warning(f'SMS provider {provider.name} failed for {to_number}: {e}')
+                if not e.retryable:
+                    return SMSResult(to_number, error=str(e), status_code=e.status_code, provider=provider.name)
+                errors.append(f'{provider.name}: {e}')
+                continue
+            return SMSResult(to_number, sid=sid, provider=provider.name)
+        return SMSResult(to_number, error='; '.join(errors) or 'No SMS provider available')
+
+    def status(self) -> List[dict]:
+        """Circuit state and metrics of each provider, in failover order"""
+        return [{'name': provider.name, 'state': provider.breaker.state, **provider.metrics.snapshot()}
+                for provider in self.providers]
+
+    def close(self) -> None:
+        """Close the providers' pooled connections"""
+        for provider in self.providers:
+            provider.close()
+
+    async def close_async(self) -> None:
+        """Close the providers' async sessions (call from the event loop that used them)"""
+        for provider in self.providers:
+            await provider.close_async()
@@ -1,8 +1,167 @@
 document.addEventListener('DOMContentLoaded', () => {
     const burger = document.querySelector('.burger-menu');
     const nav = document.querySelector('.nav-links');
-    
+
     burger.addEventListener('click', () => {
         nav.classList.toggle('active');
     });
+
+    const taskList = document.querySelector('.task-list[data-stream-url]');
+    if (taskList) {
+        enhanceTaskForms(taskList);
+        if (window.EventSource) {
+            subscribeToTaskEvents(taskList);
+        }
+    }
 });
+
+// Live task updates: apply server-sent deltas to the list instead of reloading
+
+function findTaskItem(taskList, id) {
+    return taskList.querySelector(`.task-item[data-task-id="${id}"]`);
+}
+
+function renderTaskItem(taskList, task) {
+    const template = document.getElementById('task-item-template');
+    const item = template.content.querySelector('.task-item').cloneNode(true);
+    item.dataset.taskId = task.id;
+    item.querySelectorAll('[action], [formaction]').forEach((element) => {
+        const attribute = element.hasAttribute('action') ? 'action' : 'formaction';
+        element.setAttribute(attribute, element.getAttribute(attribute).replace(/\/0$/, `/${task.id}`));
+    });
+    item.querySelector('h3').textContent = task.title;
+
+    // The blank item carries both owner and sharee controls; keep the right set
+    const owned = String(task.owner_id) === taskList.dataset.userId;
+    item.querySelectorAll(owned ? '.shared-only, .shared-label' : '.owner-only').forEach((element) => {
+        element.remove();
+    });
+
+    item.classList.toggle('completed', task.completed);
+    if (task.completed) {
+        item.querySelector('.complete-form').remove();
+    }
+    return item;
+}
+
+function applyTaskEvent(taskList, type, task) {
+    const existing = findTaskItem(taskList, task.id);
+    if (type === 'deleted') {
+        if (existing) {
+            existing.remove();
+        }
+    } else if (existing) {
+        existing.replaceWith(renderTaskItem(taskList, task));
+    } else if (type === 'created') {
+        taskList.prepend(renderTaskItem(taskList, task));
+    }
+}
+
+function reloadTaskList(taskList) {
+    fetch(window.location.pathname, { headers: { 'HX-Request': 'true' } })
+        .then((response) => (response.ok ? response.text() : Promise.reject(response.status)))
+        .then((html) => {
+            const fresh = new DOMParser().parseFromString(html, 'text/html').querySelector('.task-list');
+            if (fresh) {
+                taskList.innerHTML = fresh.innerHTML;
+            }
+        })
+        .catch(() => window.location.reload());
+}
+
+function subscribeToTaskEvents(taskList) {
+    const source = new EventSource(taskList.dataset.streamUrl);
+    // The server ends the stream when this page missed events (and any
+    // reconnect may have missed some), so reload the list on every reopen
+    let connected = false;
+    source.addEventListener('open', () => {
+        if (connected) {
+            reloadTaskList(taskList);
+        }
+        connected = true;
+    });
+    ['created', 'completed', 'updated', 'deleted'].forEach((type) => {
+        source.addEventListener(type, (event) => {
+            applyTaskEvent(taskList, type, JSON.parse(event.data));
+        });
+    });
+}
+
+// Task forms: submit in the background and apply the returned task
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
+function csrfToken() {
+    const meta = document.querySelector('meta[name="csrf-token"]');
+    return meta ? meta.content : '';
+}
+
+function setHiddenField(form, name, value) {
+    let field = form.elements.namedItem(name);
+    if (!field) {
+        field = document.createElement('input');
+        field.type = 'hidden';
+        field.name = name;
+        form.appendChild(field);
+    }
+    field.value = value;
+}
+
+function submitTaskForm(form, action) {
+    // Forms rendered with a key reuse it until the submit succeeds, so a
+    // double-submit or retry is replayed instead of creating a duplicate
+    const keyField = form.elements.namedItem('idempotency_key');
+    form.dataset.idempotencyKey = keyField ? keyField.value : newIdempotencyKey();
+    return fetch(action, {
+        method: 'POST',
+        body: new FormData(form),
+        headers: {
+            'Accept': 'application/json',
+            'X-CSRFToken': csrfToken(),
+            'Idempotency-Key': form.dataset.idempotencyKey,
+        },
+    }).then((response) => {
+        if (!response.ok) {
+            throw new Error(`Task request failed: ${response.status}`);
+        }
+        return response.json();
+    });
+}
+
+function enhanceTaskForms(taskList) {
+    const handleSubmit = (event) => {
+        const form = event.target;
+        if (!(form instanceof HTMLFormElement)) {
+            return;
+        }
+        event.preventDefault();
+        const action = event.submitter ? event.submitter.formAction : form.action;
+        submitTaskForm(form, action)
+            .then((result) => {
+                applyTaskEvent(taskList, result.event, result.task);
+                form.reset();
+                const keyField = form.elements.namedItem('idempotency_key');
+                if (keyField) {
+                    keyField.value = newIdempotencyKey();
+                }
+            })
+            .catch(() => {
+                // Plain submit: the form needs the token and key the headers carried
+                setHiddenField(form, 'csrf_token', csrfToken());
+                setHiddenField(form, 'idempotency_key', form.dataset.idempotencyKey);
+                form.action = action;
+                form.submit();
+            });
+    };
+
+    const addForm = document.querySelector('.add-task-form');
+    if (addForm) {
+        addForm.addEventListener('submit', handleSubmit);
+    }
+    taskList.addEventListener('submit', handleSubmit);
+}
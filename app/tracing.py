@@ -0,0 +1,402 @@
+"""
+Request tracing for do2done application.
+
+A sampled request gets a root span, and everything it does underneath is
+recorded as child spans: service methods (classes decorated with
+trace_methods), functions decorated with traced, and every SQL statement.
+The current span is kept in a context variable, so spans nest correctly in
+worker threads and in the ASGI app's event loop alike; outside a sampled
+request the decorators cost one context variable lookup.
+
+Finished traces are appended to TRACING_FILE, one OTLP/JSON
+`resourceSpans` document per line (the format of the OpenTelemetry
+Collector's file exporter), by a background thread. Requests are sampled
+at TRACING_SAMPLE_RATE. A sampled request with a W3C `traceparent` header
+continues the caller's trace; the caller's own sampling decision is only
+followed with TRACING_TRUST_PARENT, since any client can send the header.
+"""
+import atexit
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+from flask import g, request
+import logging
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+TRACEPARENT = re.compile(r'^00-(?P<trace_id>[0-9a-f]{32})-(?P<span_id>[0-9a-f]{16})-(?P<flags>[0-9a-f]{2})$')
+MAX_STATEMENT_LENGTH = 2000
+
+_current_span = ContextVar('current_span', default=None)
+
+
+class Trace:
+    """The spans recorded so far for one sampled request"""
+
+    def __init__(self, trace_id: str, max_spans: int):
+        self.trace_id = trace_id
+        self.max_spans = max_spans
+        self.spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span: 'Span') -> None:
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ('name', 'trace', 'span_id', 'parent_span_id', 'kind', 'attributes',
+                 'start_ns', 'end_ns', 'status', 'status_message')
+
+    def __init__(self, name: str, trace: Trace, parent_span_id: Optional[str] = None,
+                 kind: int = SPAN_KIND_INTERNAL, attributes: Optional[dict] = None):
+        self.name = name
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = None
+        self.status_message = None
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f'{type(error).__name__}: {error}'
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+        self.trace.add(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': otlp_value(value)} for key, value in self.attributes.items()
+                           if value is not None],
+            'status': {'code': self.status or STATUS_OK},
+        }
+        if self.parent_span_id:
+            span['parentSpanId'] = self.parent_span_id
+        if self.status_message:
+            span['status']['message'] = self.status_message
+        return span
+
+
+def otlp_value(value) -> dict:
+    """Wrap an attribute value in its OTLP/JSON AnyValue form"""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def current_span() -> Optional[Span]:
+    """The innermost active span, or None outside a sampled trace"""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+    """
+    Record a child span of the current span
+
+    Does nothing (and yields None) outside a sampled trace.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.trace, parent.span_id, kind, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def traced(name: Optional[str] = None, kind: int = SPAN_KIND_INTERNAL) -> Callable:
+    """
+    Decorator recording each call as a span
+
+    Args:
+        name: Span name (defaults to the function's qualified name)
+        kind: OTLP span kind
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await func(*args, **kwargs)
+                with span(span_name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_methods(cls):
+    """
+    Class decorator tracing every method and staticmethod
+
+    Generator methods are left alone: their work happens while the caller
+    iterates, outside any span the call could open.
+    """
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('__'):
+            continue
+        if isinstance(value, staticmethod):
+            func = value.__func__
+            wrap = staticmethod
+        elif inspect.isfunction(value):
+            func = value
+            wrap = None
+        else:
+            continue
+        if inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func):
+            continue
+        traced_func = traced(f'{cls.__name__}.{attr}')(func)
+        setattr(cls, attr, wrap(traced_func) if wrap else traced_func)
+    return cls
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is None:
+        return
+    child = Span('db.query', parent.trace, parent.span_id, SPAN_KIND_CLIENT, {
+        'db.system': conn.dialect.name,
+        'db.statement': statement[:MAX_STATEMENT_LENGTH],
+    })
+    if executemany:
+        child.set_attribute('db.executemany', True)
+    context._trace_span = child
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    child = getattr(context, '_trace_span', None)
+    if child is not None:
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            child.set_attribute('db.rowcount', cursor.rowcount)
+        child.end()
+        context._trace_span = None
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    child = getattr(context, '_trace_span', None) if context is not None else None
+    if child is not None:
+        child.record_error(exception_context.original_exception)
+        child.end()
+        context._trace_span = None
+
+
+_statement_listeners_installed = False
+
+
+def install_statement_listeners() -> None:
+    """Record SQL statements of every engine (sync and async) as spans; done once per process"""
+    global _statement_listeners_installed
+    if _statement_listeners_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _statement_listeners_installed = True
+
+
+class FileSpanExporter:
+    """Appends finished traces to a file from a background thread"""
+
+    def __init__(self, path: str, service_name: str = 'do2done', max_queue: int = 1000):
+        """
+        Initialize exporter
+
+        Args:
+            path: File to append OTLP/JSON lines to
+            service_name: `service.name` resource attribute
+            max_queue: Traces waiting to be written; more are dropped
+        """
+        self.path = path
+        self.service_name = service_name
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def to_otlp(self, trace: Trace) -> dict:
+        return {'resourceSpans': [{
+            'resource': {'attributes': [
+                {'key': 'service.name', 'value': {'stringValue': self.service_name}},
+                {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}},
+            ]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [span.to_otlp() for span in trace.spans],
+            }],
+        }]}
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(self.to_otlp(trace)) + '\n')
+            except OSError as e:
+                logger.warning(f'Failed to export trace {trace.trace_id}: {e}')
+
+    def shutdown(self) -> None:
+        """Write the queued traces and stop the thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+class Tracer:
+    """Flask extension starting a root span for sampled requests"""
+
+    def __init__(self, app=None):
+        self.exporter = None
+        self.sample_rate = 0.0
+        self.max_spans = 1000
+        self.trust_parent = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Enable tracing when TRACING_ENABLED is set
+
+        Uses TRACING_FILE, TRACING_SAMPLE_RATE, TRACING_TRUST_PARENT and TRACING_MAX_SPANS.
+        """
+        app.extensions['tracer'] = self
+        if not app.config.get('TRACING_ENABLED'):
+            return
+
+        self.sample_rate = app.config.get('TRACING_SAMPLE_RATE', 0.01)
+        self.max_spans = app.config.get('TRACING_MAX_SPANS', 1000)
+        self.trust_parent = app.config.get('TRACING_TRUST_PARENT', False)
+        self.exporter = FileSpanExporter(app.config.get('TRACING_FILE', 'logs/traces.jsonl'))
+        install_statement_listeners()
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._end_request)
+
+    def _sampled(self):
+        """Trace id and remote parent span id, if this request is sampled"""
+        match = TRACEPARENT.match(request.headers.get('traceparent', ''))
+        if match and self.trust_parent:
+            if int(match.group('flags'), 16) & 1:
+                return match.group('trace_id'), match.group('span_id')
+            return None
+        if not (self.sample_rate >= 1 or random.random() < self.sample_rate):
+            return None
+        if match:
+            return match.group('trace_id'), match.group('span_id')
+        return secrets.token_hex(16), None
+
+    def _start_request(self):
+        sampled = self._sampled()
+        if sampled is None:
+            return
+        trace_id, parent_span_id = sampled
+        root = Span(f'{request.method} {request.url_rule or request.path}', Trace(trace_id, self.max_spans),
+                    parent_span_id, SPAN_KIND_SERVER, {
+                        'http.request.method': request.method,
+                        'url.path': request.path,
+                        'http.route': str(request.url_rule) if request.url_rule else None,
+                        'flask.endpoint': request.endpoint,
+                        'request.id': g.get('request_id'),
+                    })
+        g._trace_root = root
+        g._trace_token = _current_span.set(root)
+
+    def _record_status(self, response):
+        root = g.get('_trace_root')
+        if root is not None:
+            root.set_attribute('http.response.status_code', response.status_code)
+            if response.status_code >= 500:
+                root.status = STATUS_ERROR
+        return response
+
+    def _end_request(self, error=None):
+        root = g.pop('_trace_root', None)
+        if root is None:
+            return
+        try:
+            _current_span.reset(g.pop('_trace_token'))
+        except ValueError:
+            # Torn down in another context (e.g. a streamed response)
+            _current_span.set(None)
+        if error is not None:
+            root.record_error(error)
+        user = g.get('_login_user')
+        root.set_attribute('enduser.id', getattr(user, 'id', None))
+        if root.trace.dropped:
+            root.set_attribute('trace.dropped_spans', root.trace.dropped)
+        root.end()
+        self.exporter.export(root.trace)
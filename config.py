@@ -20,6 +20,17 @@ class Config:
         'pool_recycle': 300,
     }
 
+    # asyncio engine for the ASGI app's async views; defaults to
+    # SQLALCHEMY_DATABASE_URI with its async driver (asyncpg or aiosqlite)
+    ASYNC_DATABASE_URI = os.environ.get('ASYNC_DATABASE_URL')
+
+    # Convert the task table to monthly partitions on created_at during
+    # `flask db upgrade` (PostgreSQL only)
+    TASK_PARTITIONING = os.environ.get('TASK_PARTITIONING', 'False').lower() == 'true'
+
+    # Seconds an overdue count in user_task_counters is reused before recounting
+    TASK_COUNTERS_OVERDUE_TTL = int(os.environ.get('TASK_COUNTERS_OVERDUE_TTL', 60))
+
     # Twilio SMS
     TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
     TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
@@ -29,6 +40,39 @@ class Config:
         os.environ.get('TWILIO_AUTH_TOKEN'),
         os.environ.get('TWILIO_PHONE_NUMBER')
     ])
+    # Send through a Messaging Service (Twilio picks the sender and queues
+    # messages) instead of from TWILIO_PHONE_NUMBER
+    TWILIO_MESSAGING_SERVICE_SID = os.environ.get('TWILIO_MESSAGING_SERVICE_SID')
+    # Point at a local fake server (`flask cli fake-twilio`) for development
+    TWILIO_API_BASE_URL = os.environ.get('TWILIO_API_BASE_URL', 'https://api.twilio.com')
+
+    # SMS providers, in failover order: 'twilio', 'http' (generic gateway)
+    # and 'log' (development sink). Unconfigured providers are skipped.
+    SMS_PROVIDERS = os.environ.get('SMS_PROVIDERS', 'twilio')
+    SMS_HTTP_PROVIDER_URL = os.environ.get('SMS_HTTP_PROVIDER_URL')
+    SMS_HTTP_PROVIDER_TOKEN = os.environ.get('SMS_HTTP_PROVIDER_TOKEN')
+    SMS_HTTP_PROVIDER_FROM = os.environ.get('SMS_HTTP_PROVIDER_FROM')
+    SMS_LOG_FILE = os.environ.get('SMS_LOG_FILE')
+
+    # Sending: connections kept per provider (and batch concurrency),
+    # per-provider rate limits in messages per second (0 for no limit)
+    SMS_BATCH_CONCURRENCY = int(os.environ.get('SMS_BATCH_CONCURRENCY', 8))
+    SMS_RATE_LIMIT = float(os.environ.get('SMS_RATE_LIMIT', 10))
+    SMS_HTTP_RATE_LIMIT = float(os.environ.get('SMS_HTTP_RATE_LIMIT', 0))
+    SMS_HTTP_TIMEOUT = float(os.environ.get('SMS_HTTP_TIMEOUT', 10))
+    SMS_MAX_RETRIES = int(os.environ.get('SMS_MAX_RETRIES', 2))  # Retries of rate-limited (429) sends
+
+    # Circuit breaker: a provider is skipped for SMS_BREAKER_RESET_TIMEOUT
+    # seconds once SMS_BREAKER_ERROR_RATE of its last SMS_BREAKER_WINDOW
+    # sends failed or took longer than SMS_BREAKER_LATENCY seconds
+    SMS_BREAKER_ERROR_RATE = float(os.environ.get('SMS_BREAKER_ERROR_RATE', 0.5))
+    SMS_BREAKER_LATENCY = float(os.environ.get('SMS_BREAKER_LATENCY', 5))
+    SMS_BREAKER_WINDOW = 20
+    SMS_BREAKER_MIN_CALLS = 5
+    SMS_BREAKER_RESET_TIMEOUT = float(os.environ.get('SMS_BREAKER_RESET_TIMEOUT', 30))
+
+    # Phone numbers entered without a country code belong to this region
+    PHONE_DEFAULT_REGION = os.environ.get('PHONE_DEFAULT_REGION', 'US')
 
     # Internationalization
     LANGUAGES = ['en', 'es']
@@ -41,13 +85,92 @@ class Config:
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     PERMANENT_SESSION_LIFETIME = timedelta(days=int(os.environ.get('PERMANENT_SESSION_LIFETIME', 30)))
+    # 'cookie' (signed cookie), or server side: 'memory' (per worker), 'database'
+    # or 'redis' (SESSION_REDIS_URL; fake:// for an in-process fake)
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cookie')
+    SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL', 'redis://localhost:6379/1')
+    SESSION_MAX_ENTRIES = 10000
+    # Abandoned signup verification / password recovery state is dropped after this
+    SESSION_FLOW_LIFETIME = timedelta(minutes=int(os.environ.get('SESSION_FLOW_LIFETIME', 30)))
+    # Server-side sessions without a logged-in user
+    SESSION_ANONYMOUS_LIFETIME = timedelta(hours=1)
 
     # Pagination
     ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE', 20))
 
+    # Fragment cache ('filesystem', 'memory' or 'null'). The filesystem cache
+    # and its version counters are shared by every worker on the host;
+    # 'memory' is per process and only safe with a single worker
+    FRAGMENT_CACHE_TYPE = os.environ.get('FRAGMENT_CACHE_TYPE', 'filesystem')
+    FRAGMENT_CACHE_DIR = os.environ.get('FRAGMENT_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+    FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+    # Static assets and compression
+    STATIC_MANIFEST_ENABLED = True
+    STATIC_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'True').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIMETYPES = ('text/html', 'application/json', 'text/css', 'application/javascript')
+
+    # Jinja bytecode cache (precompile with `flask cli precompile-templates`)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR',
+                                              os.path.join(BASE_DIR, 'cache', 'jinja'))
+
+    # Live task events ('local' for a single worker, 'redis' to share across workers)
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'local')
+    EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL', 'redis://localhost:6379/0')
+    EVENTS_MAX_PENDING = 100
+    EVENTS_KEEPALIVE_SECONDS = 15
+
+    # N+1 query detection (opt-in, for tests and development)
+    NPLUSONE_ENABLED = os.environ.get('NPLUSONE_ENABLED', 'False').lower() == 'true'
+    NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', 2))
+    NPLUSONE_RAISE = os.environ.get('NPLUSONE_RAISE', 'False').lower() == 'true'
+
+    # Idempotency keys for task writes ('memory' per worker, 'database' shared).
+    # Responses are kept for IDEMPOTENCY_TTL seconds; a request still in
+    # progress holds its key for IDEMPOTENCY_LEASE seconds, after which a
+    # retry takes over (e.g. when the worker died mid-request)
+    IDEMPOTENCY_BACKEND = os.environ.get('IDEMPOTENCY_BACKEND', 'memory')
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 3600))
+    IDEMPOTENCY_LEASE = int(os.environ.get('IDEMPOTENCY_LEASE', 60))
+    IDEMPOTENCY_MAX_ENTRIES = 10000
+
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.environ.get('LOG_FILE', 'logs/do2done.log')
+    LOG_MAX_BYTES = 10240000  # 10MB, rotation by the log writer
+    LOG_BACKUP_COUNT = 10
+    # Unix socket of the host's log writer (`flask cli log-writer`); without
+    # it each worker process appends to LOG_FILE, which is left to logrotate
+    LOG_SOCKET = os.environ.get('LOG_SOCKET')
+    LOG_QUEUE_SIZE = 10000
+    LOG_REQUESTS = os.environ.get('LOG_REQUESTS', 'True').lower() == 'true'
+    LOG_404_SAMPLE_RATE = float(os.environ.get('LOG_404_SAMPLE_RATE', 0.1))
+
+    # Request tracing: sampled requests are written to TRACING_FILE as OTLP/JSON
+    TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'False').lower() == 'true'
+    TRACING_FILE = os.environ.get('TRACING_FILE', 'logs/traces.jsonl')
+    TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', 0.01))
+    # Follow the sampled flag of an incoming traceparent instead of TRACING_SAMPLE_RATE;
+    # only for deployments where the header is set by a trusted proxy, not by clients
+    TRACING_TRUST_PARENT = os.environ.get('TRACING_TRUST_PARENT', 'False').lower() == 'true'
+    TRACING_MAX_SPANS = 1000  # Per request
+
+    # Load balancer probes, answered before sessions, translations and logging:
+    # /healthz (process up) and /readyz (database pool checkout and SMS
+    # circuits), whose result is reused for HEALTH_CACHE_SECONDS. Readiness
+    # fails when a checkout takes longer than HEALTH_DB_LATENCY_THRESHOLD
+    # seconds, and on open SMS circuits only if HEALTH_SMS_REQUIRED is set
+    HEALTH_CACHE_SECONDS = float(os.environ.get('HEALTH_CACHE_SECONDS', 5))
+    HEALTH_DB_LATENCY_THRESHOLD = float(os.environ.get('HEALTH_DB_LATENCY_THRESHOLD', 1.0))
+    HEALTH_SMS_REQUIRED = os.environ.get('HEALTH_SMS_REQUIRED', 'False').lower() == 'true'
+
+    # Admin endpoints (/admin/profile) require `Authorization: Bearer <ADMIN_TOKEN>`
+    # and are disabled when it isn't set
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    PROFILER_MAX_SECONDS = 60
 
     # Security
     WTF_CSRF_ENABLED = True
@@ -64,6 +187,8 @@ class DevelopmentConfig(Config):
     """Development environment configuration"""
     DEBUG = True
     TESTING = False
+    # Without Twilio credentials, messages (and verification codes) are logged
+    SMS_PROVIDERS = os.environ.get('SMS_PROVIDERS', 'twilio,log')
 
 
 class ProductionConfig(Config):
@@ -71,6 +196,9 @@ class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
     SESSION_COOKIE_SECURE = True
+    IDEMPOTENCY_BACKEND = os.environ.get('IDEMPOTENCY_BACKEND', 'database')
+    # Every worker needs to see every task event
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'redis')
 
     # Require SECRET_KEY in production
     def __init__(self):
@@ -86,6 +214,9 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
     TWILIO_ENABLED = False
+    SMS_PROVIDERS = 'log'
+    JINJA_BYTECODE_CACHE_DIR = None
+    FRAGMENT_CACHE_TYPE = 'memory'
 
 
 # Configuration dictionary
@@ -0,0 +1,57 @@
+"""task sharing indexes
+
+Revision ID: 3f6b2a9d8c41
+Revises: deff53f1accb
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6b2a9d8c41'
+down_revision = 'deff53f1accb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows without both ids were never valid shares, and the table had no
+    # key, so a task may be shared with the same user more than once. Keep
+    # one row per pair (the table has no other columns to choose between).
+    op.execute('CREATE TABLE task_shares_dedup AS SELECT DISTINCT task_id, user_id FROM task_shares '
+               'WHERE task_id IS NOT NULL AND user_id IS NOT NULL')
+    op.execute('DELETE FROM task_shares')
+    op.execute('INSERT INTO task_shares (task_id, user_id) SELECT task_id, user_id FROM task_shares_dedup')
+    op.execute('DROP TABLE task_shares_dedup')
+
+    with op.batch_alter_table('task_shares', schema=None) as batch_op:
+        batch_op.alter_column('task_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_primary_key('pk_task_shares', ['task_id', 'user_id'])
+        batch_op.create_index(batch_op.f('ix_task_shares_user_id'), ['user_id'], unique=False)
+        batch_op.drop_constraint('task_shares_task_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('task_shares_user_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('task_shares_task_id_fkey', 'task', ['task_id'], ['id'],
+                                    ondelete='CASCADE')
+        batch_op.create_foreign_key('task_shares_user_id_fkey', 'user', ['user_id'], ['id'],
+                                    ondelete='CASCADE')
+
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_task_owner_id'), ['owner_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_task_owner_id'))
+
+    with op.batch_alter_table('task_shares', schema=None) as batch_op:
+        batch_op.drop_constraint('task_shares_user_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('task_shares_task_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('task_shares_task_id_fkey', 'task', ['task_id'], ['id'])
+        batch_op.create_foreign_key('task_shares_user_id_fkey', 'user', ['user_id'], ['id'])
+        batch_op.drop_index(batch_op.f('ix_task_shares_user_id'))
+        batch_op.drop_constraint('pk_task_shares', type_='primary')
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('task_id', existing_type=sa.Integer(), nullable=True)
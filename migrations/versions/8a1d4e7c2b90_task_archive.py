@@ -0,0 +1,53 @@
+"""task archive
+
+Revision ID: 8a1d4e7c2b90
+Revises: 3f6b2a9d8c41
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a1d4e7c2b90'
+down_revision = '3f6b2a9d8c41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('completed_at', sa.DateTime(), nullable=True))
+
+    # Best available completion time for tasks completed before this column existed
+    op.execute('UPDATE task SET completed_at = updated_at WHERE completed = true')
+
+    op.create_index('ix_task_owner_pending', 'task', ['owner_id', 'due_date'], unique=False,
+                    postgresql_where=sa.text('completed = false'),
+                    sqlite_where=sa.text('completed = 0'))
+
+    op.create_table('task_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('priority', sa.Integer(), nullable=True),
+    sa.Column('due_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_task_archive_owner_completed', 'task_archive', ['owner_id', 'completed_at'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_task_archive_owner_completed', table_name='task_archive')
+    op.drop_table('task_archive')
+    op.drop_index('ix_task_owner_pending', table_name='task')
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_column('completed_at')
@@ -0,0 +1,30 @@
+"""user phone number covering index
+
+Revision ID: a6d2c9e4b7f3
+Revises: f3b8d1c6a9e4
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2c9e4b7f3'
+down_revision = 'f3b8d1c6a9e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_phone_number', 'user', ['phone_number'], unique=True,
+                    postgresql_include=['id'])
+    # The index enforces uniqueness now; SQLite keeps its unnamed constraint
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('user_phone_number_key', 'user', type_='unique')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_unique_constraint('user_phone_number_key', 'user', ['phone_number'])
+    op.drop_index('ix_user_phone_number', table_name='user')
@@ -0,0 +1,38 @@
+"""user created_at
+
+Revision ID: b3e7d5a1f9c2
+Revises: e8b4f2a7c1d6
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e7d5a1f9c2'
+down_revision = 'e8b4f2a7c1d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing accounts get the migration time, so none of them look older than
+    # they might be. It is taken from the application's clock, which sets
+    # created_at from now on; a constant default fills the rows without
+    # rewriting the table on PostgreSQL and is dropped again afterwards.
+    migrated_at = datetime.now().replace(microsecond=0)
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=False,
+                                      server_default=sa.text(f"'{migrated_at.isoformat(sep=' ')}'")))
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=None)
+    op.create_index('ix_user_unverified', 'user', ['id', 'created_at'], unique=False,
+                    postgresql_where=sa.text('verified IS NOT TRUE'))
+
+
+def downgrade():
+    op.drop_index('ix_user_unverified', table_name='user')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('created_at')
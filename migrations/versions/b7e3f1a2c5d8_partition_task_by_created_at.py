@@ -0,0 +1,113 @@
+"""partition task by created_at
+
+Optional: only runs on PostgreSQL when TASK_PARTITIONING is enabled.
+Converts the task table into monthly range partitions on created_at with
+a default partition for out-of-range rows. Partitioned tables need the
+partition key in every unique constraint, so the primary key becomes
+(id, created_at) and task_shares can no longer reference task.id by
+foreign key; share rows are cleaned up by TaskService and ArchiveService.
+
+Revision ID: b7e3f1a2c5d8
+Revises: 8a1d4e7c2b90
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from datetime import date, datetime
+from alembic import op
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3f1a2c5d8'
+down_revision = '8a1d4e7c2b90'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def _add_months(value, months):
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _is_partitioned(bind):
+    return bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'task')"
+    )).scalar()
+
+
+def _create_indexes(owner_index):
+    # ix_task_owner_due_date (d1f6b8a3e2c7) makes the single-column owner
+    # index redundant, so only the unpartitioned table gets it back
+    if owner_index:
+        op.execute('CREATE INDEX ix_task_owner_id ON task (owner_id)')
+    op.execute('CREATE INDEX ix_task_owner_pending ON task (owner_id, due_date) '
+               'WHERE completed = false')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not current_app.config.get('TASK_PARTITIONING'):
+        return
+    if _is_partitioned(bind):
+        return
+
+    op.execute('UPDATE task SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL')
+    op.execute('ALTER TABLE task_shares DROP CONSTRAINT IF EXISTS task_shares_task_id_fkey')
+
+    # Move the old table aside, freeing up its index and constraint names
+    op.execute('ALTER TABLE task RENAME TO task_unpartitioned')
+    op.execute('ALTER TABLE task_unpartitioned RENAME CONSTRAINT task_pkey TO task_unpartitioned_pkey')
+    op.execute('DROP INDEX IF EXISTS ix_task_owner_id')
+    op.execute('DROP INDEX IF EXISTS ix_task_owner_pending')
+
+    op.execute('CREATE TABLE task (LIKE task_unpartitioned INCLUDING DEFAULTS) '
+               'PARTITION BY RANGE (created_at)')
+    op.execute('ALTER TABLE task ALTER COLUMN created_at SET NOT NULL')
+    op.execute('ALTER TABLE task ADD CONSTRAINT task_pkey PRIMARY KEY (id, created_at)')
+    op.execute('ALTER TABLE task ADD CONSTRAINT task_owner_id_fkey '
+               'FOREIGN KEY (owner_id) REFERENCES "user" (id)')
+    op.execute('CREATE TABLE task_default PARTITION OF task DEFAULT')
+
+    # Monthly partitions from the oldest task up to a few months ahead
+    oldest = bind.execute(sa.text('SELECT min(created_at) FROM task_unpartitioned')).scalar()
+    today = datetime.now().date()
+    month = date((oldest or today).year, (oldest or today).month, 1)
+    last = _add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        next_month = _add_months(month, 1)
+        op.execute(f"CREATE TABLE task_p{month.year:04d}_{month.month:02d} PARTITION OF task "
+                   f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')")
+        month = next_month
+
+    op.execute('INSERT INTO task SELECT * FROM task_unpartitioned')
+    op.execute('ALTER SEQUENCE task_id_seq OWNED BY task.id')
+    op.execute('DROP TABLE task_unpartitioned')
+    _create_indexes(owner_index=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not _is_partitioned(bind):
+        return
+
+    op.execute('ALTER TABLE task RENAME TO task_partitioned')
+    op.execute('ALTER TABLE task_partitioned RENAME CONSTRAINT task_pkey TO task_partitioned_pkey')
+    op.execute('DROP INDEX IF EXISTS ix_task_owner_id')
+    op.execute('DROP INDEX IF EXISTS ix_task_owner_pending')
+
+    op.execute('CREATE TABLE task (LIKE task_partitioned INCLUDING DEFAULTS)')
+    op.execute('ALTER TABLE task ADD CONSTRAINT task_pkey PRIMARY KEY (id)')
+    op.execute('ALTER TABLE task ADD CONSTRAINT task_owner_id_fkey '
+               'FOREIGN KEY (owner_id) REFERENCES "user" (id)')
+    op.execute('INSERT INTO task SELECT * FROM task_partitioned')
+    op.execute('ALTER SEQUENCE task_id_seq OWNED BY task.id')
+    op.execute('DROP TABLE task_partitioned CASCADE')
+    _create_indexes(owner_index=True)
+
+    op.execute('DELETE FROM task_shares WHERE task_id NOT IN (SELECT id FROM task)')
+    op.execute('ALTER TABLE task_shares ADD CONSTRAINT task_shares_task_id_fkey '
+               'FOREIGN KEY (task_id) REFERENCES task (id) ON DELETE CASCADE')
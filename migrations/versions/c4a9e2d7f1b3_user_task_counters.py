@@ -0,0 +1,42 @@
+"""user task counters
+
+Revision ID: c4a9e2d7f1b3
+Revises: b7e3f1a2c5d8
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9e2d7f1b3'
+down_revision = 'b7e3f1a2c5d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_task_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('pending', sa.Integer(), nullable=False),
+    sa.Column('overdue', sa.Integer(), nullable=False),
+    sa.Column('overdue_as_of', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill from the task table; overdue is computed on first read
+    op.execute(
+        'INSERT INTO user_task_counters (user_id, total, completed, pending, overdue) '
+        'SELECT id, total, completed, total - completed, 0 FROM ('
+        'SELECT u.id, count(t.id) AS total, '
+        'coalesce(sum(CASE WHEN t.completed THEN 1 ELSE 0 END), 0) AS completed '
+        'FROM "user" u LEFT JOIN task t ON t.owner_id = u.id GROUP BY u.id) AS counts'
+    )
+
+
+def downgrade():
+    op.drop_table('user_task_counters')
@@ -0,0 +1,30 @@
+"""task owner cascade
+
+Revision ID: c7d2e9f4a1b6
+Revises: b3e7d5a1f9c2
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e9f4a1b6'
+down_revision = 'b3e7d5a1f9c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # User.tasks leaves deleting an account's tasks to the database
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_constraint('task_owner_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('task_owner_id_fkey', 'user', ['owner_id'], ['id'],
+                                    ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_constraint('task_owner_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('task_owner_id_fkey', 'user', ['owner_id'], ['id'])
@@ -0,0 +1,28 @@
+"""task owner due date index
+
+Revision ID: d1f6b8a3e2c7
+Revises: c4a9e2d7f1b3
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f6b8a3e2c7'
+down_revision = 'c4a9e2d7f1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_task_owner_due_date', 'task', ['owner_id', 'due_date'], unique=False)
+    # It leads with owner_id, so it serves every lookup the single-column
+    # index did (a partitioned task table was created without that one)
+    op.execute('DROP INDEX IF EXISTS ix_task_owner_id')
+
+
+def downgrade():
+    op.create_index('ix_task_owner_id', 'task', ['owner_id'], unique=False)
+    op.drop_index('ix_task_owner_due_date', table_name='task')
@@ -0,0 +1,50 @@
+"""task recurrence
+
+Revision ID: e5c2a7b9d4f1
+Revises: d1f6b8a3e2c7
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c2a7b9d4f1'
+down_revision = 'd1f6b8a3e2c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('task_recurrence',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('priority', sa.Integer(), nullable=True),
+    sa.Column('rule', sa.String(length=200), nullable=False),
+    sa.Column('dtstart', sa.DateTime(), nullable=False),
+    sa.Column('next_due_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_task_recurrence_owner_next', 'task_recurrence', ['owner_id', 'next_due_at'],
+                    unique=False)
+
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('recurrence_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_task_recurrence_id', ['recurrence_id'], unique=False)
+        batch_op.create_foreign_key('task_recurrence_id_fkey', 'task_recurrence',
+                                    ['recurrence_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_constraint('task_recurrence_id_fkey', type_='foreignkey')
+        batch_op.drop_index('ix_task_recurrence_id')
+        batch_op.drop_column('recurrence_id')
+
+    op.drop_index('ix_task_recurrence_owner_next', table_name='task_recurrence')
+    op.drop_table('task_recurrence')
@@ -0,0 +1,31 @@
+"""server sessions
+
+Revision ID: e8b4f2a7c1d6
+Revises: a6d2c9e4b7f3
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b4f2a7c1d6'
+down_revision = 'a6d2c9e4b7f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('server_session',
+    sa.Column('sid', sa.String(length=64), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sid')
+    )
+    op.create_index('ix_server_session_expires_at', 'server_session', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_server_session_expires_at', table_name='server_session')
+    op.drop_table('server_session')